@@ -0,0 +1,303 @@
+
+'''
+Message body codecs. A codec turns a Python object into the bytes of a message
+body, and back again. The ID of the codec is kept in the flags of each message,
+so readers decode every message with the codec that wrote it, with no need for
+configuration. Encoded bodies carry whatever header they need, such as a struct
+format or an array's dtype and shape, so decoding is a matter of slicing.
+
+Any process that can write to a queue chooses the codec of its messages. So a
+reader only decodes codecs that it registered, and Pickle is not registered by
+default. Unpickling runs whatever code the pickle asks for. A process that
+trusts every writer can opt in with register( Pickle( ) ).
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+from abc import ABC , abstractmethod
+from ast import literal_eval
+from math import prod
+import pickle
+import struct
+
+# From pysyncq package
+from pysyncq import header as hdr
+
+# NumPy is optional, and only needed by the Array codec
+try :
+    import  numpy as np
+except  ImportError :
+    np = None
+
+
+#--- GLOBALS ---#
+
+# Codecs that decode message bodies, by codec ID; see register
+codecs = { }
+
+# Packs the lengths in the header of an encoded body
+length = struct.Struct( 'Q' )
+
+
+#--- Supporting functions ---#
+
+def  register ( codec ) :
+
+    '''
+    register( codec )
+    
+    Makes codec decode every message that has its ID, in this process. The ID
+    must be from 0 to 255. IDs up to 127 are reserved for pysyncq. Returns
+    codec.
+    '''
+    
+    if  not 0 <= codec.id <= hdr.fcodec >> hdr.shcodec :
+        raise  ValueError( f'Codec ID must be 0 to 255, {codec.id=}' )
+    
+    codecs[ codec.id ] = codec
+    
+    return  codec
+
+
+def  decode ( flags , body ) :
+
+    '''
+    decode( flags , body )
+    
+    Decodes message body with the codec whose ID is held in message flags.
+    '''
+    
+    cid = ( flags & hdr.fcodec ) >> hdr.shcodec
+    
+    if  cid not in codecs :
+        raise  ValueError( f'Message has unregistered codec ID { cid }, '
+                            'see pysyncq.codec.register' )
+    
+    return  codecs[ cid ].decode( body )
+
+
+def  _short ( bstr ) :
+
+    '''
+    Prefix byte string bstr with its length, in one byte.
+    '''
+    
+    if  len( bstr ) > 255 :
+        raise  ValueError( f'Codec header string too long, {bstr=}' )
+    
+    return  bytes( ( len( bstr ) , ) ) + bstr
+
+
+#--- Codecs ---#
+
+class  Codec ( ABC ) :
+
+    '''
+    class pysyncq.codec.Codec
+    
+    Base class of message body codecs. id is the codec ID. encode( obj ) returns
+    a list of bytes-like objects that are written one after the other as the
+    message body, so that large buffers need not be joined first. decode( body )
+    returns the object from a bytes-like body. pop( ) gives decode a copy of
+    the body, but Lease.decode( ) gives it a memoryview of shared memory. Then
+    any views of body that are returned must not be used after the lease is
+    released.
+    '''
+    
+    id = None
+    
+    @abstractmethod
+    def  encode ( self , obj ) : ...
+    
+    @abstractmethod
+    def  decode ( self , body ) : ...
+
+
+class  Text ( Codec ) :
+
+    '''
+    class pysyncq.codec.Text( )
+    
+    The default codec. Bytes are written as they are, anything else is cast to
+    str and encoded with UTF-8. Bodies are decoded to str.
+    '''
+    
+    id = 0
+    
+    def  encode ( self , obj ) :
+        
+        return  [ hdr.tobytes( obj ) ]
+    
+    def  decode ( self , body ) :
+        
+        return  str( body , 'utf-8' )
+
+
+class  Raw ( Codec ) :
+
+    '''
+    class pysyncq.codec.Raw( )
+    
+    Writes any C-contiguous bytes-like object as it is, without a header.
+    Bodies are returned undecoded.
+    '''
+    
+    id = 1
+    
+    def  encode ( self , obj ) :
+        
+        return  [ memoryview( obj ).cast( 'B' ) ]
+    
+    def  decode ( self , body ) :
+        
+        return  body
+
+
+class  Record ( Codec ) :
+
+    '''
+    class pysyncq.codec.Record( fmt = None )
+    
+    Packs a tuple of values with struct format string fmt, as in
+    struct.pack( fmt , *values ). The body starts with fmt, so any reader can
+    unpack it. Bodies are decoded to a tuple of values. fmt is only needed to
+    encode.
+    '''
+    
+    id = 2
+    
+    def  __init__ ( self , fmt = None ) :
+        
+        self.struct = None  if  fmt is None  else  struct.Struct( fmt )
+        self.head   = None  if  fmt is None  else  \
+                      _short( self.struct.format.encode( ) )
+        
+        # Decoding structs by body header
+        self.structs = { }
+    
+    def  encode ( self , obj ) :
+        
+        if  self.struct is None :
+            raise  ValueError( 'Record needs fmt to encode' )
+        
+        return  [ self.head , self.struct.pack( *obj ) ]
+    
+    def  decode ( self , body ) :
+        
+        # Header, the length of fmt and fmt. Make its struct once.
+        n = body[ 0 ] + 1
+        k = bytes( body[ : n ] )
+        if  k not in self.structs :
+            self.structs[ k ] = struct.Struct( k[ 1 : ].decode( ) )
+        
+        return  self.structs[ k ].unpack_from( body , n )
+
+
+class  Pickle ( Codec ) :
+
+    '''
+    class pysyncq.codec.Pickle( )
+    
+    Pickles any object with protocol 5. Objects that support out-of-band
+    buffers, such as NumPy arrays and pickle.PickleBuffer, are written after
+    the pickle without being copied into it. On decoding, they are rebuilt on
+    top of the body. Unpickling can run any code, so only register a Pickle to
+    decode messages if every process that writes to the queue is trusted. Any
+    process can encode with it.
+    '''
+    
+    id = 3
+    
+    def  encode ( self , obj ) :
+        
+        # Collect out-of-band buffers
+        bufs = [ ]
+        data = pickle.dumps( obj , protocol = 5 ,
+                             buffer_callback = bufs.append )
+        bufs = [ b.raw( ) for b in bufs ]
+        
+        # Header has the number of buffers, then the length of the pickle and
+        # of each buffer
+        head = struct.pack( f'{ len( bufs ) + 2 }Q' , len( bufs ) ,
+                            len( data ) , *( len( b ) for b in bufs ) )
+        
+        return  [ head , data , *bufs ]
+    
+    def  decode ( self , body ) :
+        
+        # Read header
+        body = memoryview( body )
+        ( n , ) = length.unpack_from( body )
+        L = struct.unpack_from( f'{ n + 1 }Q' , body , length.size )
+        
+        # Slice out the pickle and its buffers
+        b = ( n + 2 ) * length.size
+        V = [ ]
+        for  l in L :
+            V.append( body[ b : b + l ] )
+            b += l
+        
+        return  pickle.loads( V[ 0 ] , buffers = V[ 1 : ] )
+
+
+class  Array ( Codec ) :
+
+    '''
+    class pysyncq.codec.Array( )
+    
+    Writes a NumPy array as its raw data, after a header with its dtype and
+    shape. Bodies are decoded to arrays by np.frombuffer, so they are views of
+    the body. Arrays of Python objects are not supported. Data may not be
+    aligned in the body, which NumPy allows at some cost in speed. Needs NumPy.
+    '''
+    
+    id = 4
+    
+    def  __init__ ( self ) :
+        
+        if  np is None : raise  ImportError( 'Array codec needs NumPy' )
+        
+        # Decoding dtypes by body header
+        self.dtypes = { }
+    
+    def  encode ( self , obj ) :
+        
+        a = np.ascontiguousarray( obj )
+        
+        if  a.dtype.hasobject :
+            raise  TypeError( f'Can\'t encode array with {a.dtype=}' )
+        
+        # Header has the dtype, the number of dimensions, and the shape
+        dtype = _short( repr( np.lib.format.dtype_to_descr( a.dtype ) )
+                        .encode( ) )
+        shape = struct.pack( f'=B{ a.ndim }Q' , a.ndim , *a.shape )
+        
+        data  = memoryview( a.reshape( -1 ).view( np.uint8 ) )
+        
+        return  [ dtype , shape , data ]
+    
+    def  decode ( self , body ) :
+        
+        # dtype. Make it once.
+        n = body[ 0 ] + 1
+        k = bytes( body[ : n ] )
+        if  k not in self.dtypes :
+            self.dtypes[ k ] = np.lib.format.descr_to_dtype(
+                                   literal_eval( k[ 1 : ].decode( ) ) )
+        
+        # Shape
+        ndim  = body[ n ]
+        shape = struct.unpack_from( f'={ ndim }Q' , body , n + 1 )
+        n    += 1 + ndim * length.size
+        
+        return  np.frombuffer( body , self.dtypes[ k ] , count = prod( shape ) ,
+                               offset = n ).reshape( shape )
+
+
+# Register the built-in codecs. Array, only if NumPy can be had. Not Pickle,
+# which readers must opt in to.
+register( Text( ) )
+register( Raw( ) )
+register( Record( ) )
+if  np is not None : register( Array( ) )
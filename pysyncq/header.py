@@ -6,8 +6,18 @@ Collects important constants together into a common namespace.
 #--- IMPORT BLOCK ---#
 
 from os import name as osname
-if  osname == 'posix' : import  resource
+if  osname == 'posix' :
+    import  resource , mmap , _posixshmem
+    from os import kill , fstat , ftruncate , O_CREAT , O_EXCL , O_RDWR
+from sys import version_info
+from platform import machine
+from multiprocessing import resource_tracker , util
+import multiprocessing.shared_memory as sm
+import multiprocessing.synchronize   as sync
+import _multiprocessing
 from ctypes import c_uint , c_ulonglong , sizeof
+from struct import Struct
+from collections import namedtuple
 
 
 #--- GLOBALS ---#
@@ -19,6 +29,18 @@ if  osname == 'posix' :
 else :
     defsize = 4096
 
+# Names of the shared memory blocks that the resource tracker of this process
+# tracks for the process that made them. The tracker is shared with every
+# process that this one started, and it keeps one entry per name. So a block in
+# here must not be untracked just because this process attached it again; see
+# shmuntrack.
+tracked = set( )
+
+# Default number of bytes in a message body, above which append copies the body
+# into the queue without holding the lock. Smaller bodies are cheaper to copy
+# than a second acquisition of the lock.
+defbulk = 2 ** 16
+
 # Format string of numeric type used for counting. Unsigned long long.
 # See https://docs.python.org/3/library/struct.html#module-struct
 fmtqueuehead = 'Q'
@@ -35,21 +57,68 @@ maxqueuehead = 2 ** ( nbytequeuehead * 8 ) - 1
 maxmsghead   = 2 ** ( nbytemsghead   * 8 ) - 1
 
 # Number of counters in queue header:
-#   [ processes , free bytes , head , tail , serial number ]
-lenqueuehead = 5
+#   [ processes , free bytes , head , tail , serial number ,
+#     reservation tail , reservations , sequence number ,
+#     head serial number , active reader slots , reader slots ,
+#     detached reader slots , interned strings , interning table entries ,
+#     subscribed reader slots , reader slots with a message wake-up FIFO ,
+#     reader slots with a free space wake-up FIFO , newest generation ,
+#     message header counters ]
+lenqueuehead = 19
+
+# And number of counters in message header, all in bytes except reads and flags
+# [ reads , flags , sender string , type string , message body ]
+lenmsghead = 5
 
-# And number of counters in message header, all in bytes except reads
-# [ reads , sender string , type string , message body ]
-lenmsghead = 4
+# Messages of a queue that was made with a time to live have more counters,
+# after those of the message header. The time to live in milliseconds, and the
+# time that the message was published in nanoseconds, which takes two counters,
+# low half first.
+# [ time to live , time published , ... ]
+lenmsgtime = 3
 
-# Size of queue and message header counters, in bytes
+# Max number of message types that one reader slot can subscribe to
+maxsubs = 8
+
+# And number of counters in each reader slot, all of the queue counter type
+# [ process ID , read position , read serial number , open serial number ,
+#   last activity time in nanoseconds , missed messages , subscribed types ,
+#   CRC-32 of subscribed type 1 , ... , CRC-32 of subscribed type maxsubs ]
+lenslot = 7 + maxsubs
+
+# And number of counters in the header of a PySyncMultiQ, which is followed by
+# one queue per channel. Of the queue counter type.
+# [ processes , channels , waiting processes , wake-up generation ]
+lengrouphead = 4
+
+# Size of queue and message header counters, and of the time counters, of one
+# reader slot, and of the PySyncMultiQ header, in bytes
 sizequeuehead = lenqueuehead * nbytequeuehead
 sizemsghead   =   lenmsghead * nbytemsghead
+sizemsgtime   =   lenmsgtime * nbytemsghead
+sizeslot      =      lenslot * nbytequeuehead
+sizegrouphead = lengrouphead * nbytequeuehead
+
+# Size of one interning table entry, in bytes. The first byte gives the length
+# of the interned string, which fills the rest of the entry, at most.
+sizeintern = 32
+maxintern  = sizeintern - 1
 
-# Max size of shared memory is size of queue header + minimum length message
-# size times max value of the queue header serial number counter. The smallest
-# message has no sender, type, or body string; only message header counters.
-maxshmemory = sizequeuehead + maxqueuehead * sizemsghead
+# A sender or type counter with this bit set holds the ID of an interned string,
+# in the lower bits, instead of a byte count. The string is not written into the
+# message, but is found in the interning table.
+finterned = 1 << ( nbytemsghead * 8 - 1 )
+
+# The reads counter of each message is a bit mask with one bit per reader slot.
+# Hence, the max number of reader slots is the number of bits in the counter.
+maxreaders = nbytemsghead * 8
+
+# Max size of shared memory is size of queue header + reader slots + minimum
+# length message size times max value of the queue header serial number counter.
+# The smallest message has no sender, type, or body string; only message header
+# counters.
+maxshmemory = sizequeuehead + maxreaders * sizeslot + \
+              maxqueuehead * sizemsghead
 
 # Ordinal index of each queue header counter with symbolic name
 iproc = 0
@@ -57,19 +126,139 @@ ifree = 1
 ihead = 2
 itail = 3
 islno = 4
+ires  = 5
+inres = 6
+iseq  = 7
+ihsln = 8
+iact  = 9
+islot = 10
+idet  = 11
+iistr = 12
+iitab = 13
+isub  = 14
+iwmsg = 15
+iwspc = 16
+igrow = 17
+imsgh = 18
 
 # Ordinal index of each message header counter with symbolic name
 iread = 0
-isend = 1
-itype = 2
-ibody = 3
+iflag = 1
+isend = 2
+itype = 3
+ibody = 4
+ittl  = 5
+itime = 6
+
+# Ordinal index of each reader slot counter with symbolic name
+spid  = 0
+spos  = 1
+sslno = 2
+sopen = 3
+stime = 4
+smiss = 5
+snsub = 6
+ssubs = 7
+
+# Ordinal index of each PySyncMultiQ header counter with symbolic name
+gproc = 0
+gchan = 1
+gwait = 2
+ggen  = 3
 
 # Pack index for sender and type strings in a tuple for easy zipping
 mcnti = ( isend , itype )
 
 # Create a message header counter slice that returns byte counts, but not reads
+# and flags. Beware of interned strings, see msgbytes.
 mbcnt = slice( isend , ibody + 1 )
 
+# Packs a complete set of message header counters straight into the queue body.
+# Or those and the time counters together. And a single counter, such as reads.
+msghead = Struct( lenmsghead * fmtmsghead )
+msgfull = Struct( ( lenmsghead + lenmsgtime ) * fmtmsghead )
+msgword = Struct( fmtmsghead )
+
+# Packs the time counters. And the time that a message was published, in two
+# counters.
+msgttl   = Struct( lenmsgtime * fmtmsghead )
+msgstamp = Struct( 2 * fmtmsghead )
+
+# Special values of the reads counter of a message that has been reserved but
+# not yet published. Reserved messages are still being written. Committed
+# messages are ready, but must wait for earlier reservations to be published.
+reserved  = maxmsghead
+committed = maxmsghead - 1
+
+# Message flags. A void message was reserved and then aborted before it could be
+# withdrawn from the queue. Readers skip over void messages. While a message is
+# reserved, its flags hold the process ID of the process that reserved it.
+fvoid = 1
+
+# The ID of the codec that encoded the body of a committed message sits in the
+# second byte of its flags; see pysyncq.codec. Zero is the default text codec.
+shcodec = 8
+fcodec  = 0xff << shcodec
+
+# A spilled message keeps its body in a separate block of shared memory. The
+# body in the queue is a descriptor that packs the number of bytes in the block,
+# followed by the block's name.
+fspill    = 2
+spillhead = Struct( '=Q' )
+
+# A work message is read by exactly one process. The first reader to claim it
+# clears the bits of all other readers, then frees the message when it is done.
+fwork = 4
+
+
+# Overflow policies. What a writer does when there is not enough free space in
+# the queue for its message.
+#   block - Raise MemoryError, or wait for free space if blocking.
+#   drop - Drop the new message.
+#   overwrite - Free the oldest messages, even if readers hold them.
+#   detach - Detach readers that hold the oldest message, if they lag too far.
+overflows = ( 'block' , 'drop' , 'overwrite' , 'detach' )
+
+# Reader slot details, as returned by PySyncQ.readers( )
+Reader = namedtuple( 'Reader' ,
+             ( 'slot' , 'pid' , 'pos' , 'slno' , 'lag' , 'head' , 'idle' ) )
+
+# PySyncPipe header counters, in three cache lines of eight counters each. Only
+# the writer writes to the first line, and only the reader to the second. So
+# neither invalidates the line that the other one keeps writing. The third line
+# only changes on open and close, with the lock.
+#   ptail - Bytes that the writer has published, ever.
+#   pwspc - Non-zero while the writer waits for free space.
+#   phead - Bytes that the reader has freed, ever.
+#   prmsg - Non-zero while the reader waits for a message.
+#   pproc - Number of processes that have the pipe open.
+#   pwpid , prpid - Process IDs of the writer and the reader, or zero.
+lenline = 8
+ptail   = 0
+pwspc   = 1
+phead   = 1 * lenline
+prmsg   = 1 * lenline + 1
+pproc   = 2 * lenline
+pwpid   = 2 * lenline + 1
+prpid   = 2 * lenline + 2
+lenpipehead  = 3 * lenline
+sizepipehead = lenpipehead * nbytequeuehead
+
+# PySyncPipe message header. Packs the number of bytes in the body, the message
+# flags, and the number of bytes in the type, which follows. Then the body. Each
+# message starts on a counter boundary, so the header is never split by the end
+# of the pipe body. A message that won't fit before the end starts over at the
+# beginning. The bytes skipped at the end get a header of their own, with the
+# void flag.
+pipemsg = Struct( '=IHH' )
+sizepipemsg = pipemsg.size
+maxpipetype = 2 ** 16 - 1
+
+# True if the processor keeps stores in program order, and likewise loads, as
+# x86 processors do. Then a process that sees a counter change also sees what
+# was written before the change. Otherwise, PySyncPipe needs memory barriers.
+tso = machine( ).lower( ) in ( 'x86_64' , 'amd64' , 'i386' , 'i686' , 'x86' )
+
 
 #--- EXCEPTIONS ---#
 
@@ -84,6 +273,330 @@ class  ScreenedMessage ( Exception ) :
     pass
 
 
+class  Detached ( Exception ) :
+
+    '''
+    Raised by a PySyncQ instance that was detached from the queue by a writer,
+    under the detach overflow policy, because it lagged too far behind. The
+    instance is no longer registered with the queue. It may call open( ) to
+    register again, and carry on from the tail of the queue.
+    '''
+    
+    pass
+
+
+#--- Supporting functions ---#
+
+def  tobytes ( arg ) :
+
+    '''
+    tobytes( arg )
+    
+    Guarantee that arg is returned as a byte string. If arg is already of type
+    bytes then it is returned directly. Otherwise, arg is cast to str and then
+    encoded with the default format e.g. UTF-8.
+    '''
+    
+    return  arg  if  type( arg ) is bytes  else  str( arg ).encode( )
+
+
+def  slnodiff ( a , b ) :
+
+    '''
+    slnodiff( a , b )
+    
+    Returns the number of messages from serial number b up to serial number a,
+    modulo the max value of the queue header serial number counter, which wraps
+    around to zero.
+    '''
+    
+    return  ( a - b )  %  ( maxqueuehead + 1 )
+
+
+def  slnoafter ( a , b ) :
+
+    '''
+    slnoafter( a , b )
+    
+    Returns True if serial number a comes after serial number b. That is, if a
+    is up to half the range of the queue header serial number counter ahead of
+    b, allowing for wrap around.
+    '''
+    
+    return  0  <  slnodiff( a , b )  <=  maxqueuehead // 2
+
+
+def  msgbytes ( h ) :
+
+    '''
+    msgbytes( h )
+    
+    Returns the number of bytes taken by the sender, type, and body strings of
+    the message with header counters h. Interned strings take none.
+    '''
+    
+    return  ( h[ isend ]  if  h[ isend ] < finterned  else  0 )  +  \
+            ( h[ itype ]  if  h[ itype ] < finterned  else  0 )  +  h[ ibody ]
+
+
+def  msgtime ( h ) :
+
+    '''
+    msgtime( h )
+    
+    Returns the time that the message with header counters h was published, in
+    nanoseconds; see time.monotonic_ns.
+    '''
+    
+    return  h[ itime ]  |  h[ itime + 1 ] << nbytemsghead * 8
+
+
+def  expired ( h , now ) :
+
+    '''
+    expired( h , now )
+    
+    Returns True if the message with header counters h has a time to live, and
+    it ran out before time now, in nanoseconds; see time.monotonic_ns.
+    '''
+    
+    return  bool( h[ ittl ] )  and  now - msgtime( h ) > h[ ittl ] * 1_000_000
+
+
+def  pidalive ( pid ) :
+
+    '''
+    pidalive( pid )
+    
+    Returns False if process ID pid is known to belong to a process that has
+    ended, and True otherwise. A zombie process, which has ended but has not
+    been joined by its parent, counts as ended if /proc is available e.g. on
+    Linux. Only supported on POSIX systems. Elsewhere, True is returned.
+    '''
+    
+    if  osname != 'posix' : return  True
+    
+    # Send no signal, but check that the process exists
+    try :
+        kill( pid , 0 )
+    except  ProcessLookupError :
+        return  False
+    except  PermissionError :
+        return  True
+    
+    # Look for zombies. The process state follows the parenthesised name.
+    try :
+        with  open( f'/proc/{ pid }/stat' ) as f : stat = f.read( )
+    except  OSError :
+        return  True
+    
+    return  stat[ stat.rindex( ')' ) + 2 ]  not in  'ZX'
+
+
+def  shmopen ( name = None , size = 0 , create = None ) :
+
+    '''
+    shmopen( name = None , size = 0 , create = None )
+    
+    Returns a new SharedMemory block of size bytes if name is None, or else
+    attaches the named block. Unless create is True, in which case the named
+    block is made. Either way, the block is hidden from this process's resource
+    tracker, which would otherwise unlink it when the process ends, while other
+    processes still need it. See shmunlink.
+    
+    Before Python 3.13, SharedMemory always registers the block with the
+    tracker. Unregistering it straight after is not enough. The tracker keeps
+    one entry per name for every process that shares it, so two processes that
+    open the same block at once, such as two readers of a spilled message, can
+    unregister it twice. So the block is opened as SharedMemory would open it,
+    but without the tracker.
+    '''
+    
+    if  create is None : create = name is None
+    
+    # Python 3.13 can say so directly
+    if  version_info >= ( 3 , 13 ) :
+        return  sm.SharedMemory( name , create , size , track = False )
+    
+    # No resource tracker
+    if  osname != 'posix' : return  sm.SharedMemory( name , create , size )
+    
+    shm   = sm.SharedMemory.__new__( sm.SharedMemory )
+    flags = O_CREAT | O_EXCL | O_RDWR  if  create  else  O_RDWR
+    
+    # Open the block. A new block with no name gets a random one that is free.
+    while  True :
+        shm._name = sm._make_filename( )  if  name is None  else  f'/{ name }'
+        try :
+            shm._fd = _posixshmem.shm_open( shm._name , flags , mode = 0o600 )
+            break
+        except  FileExistsError :
+            if  name is not None : raise
+    
+    # Size and map it, as SharedMemory does
+    try :
+        if  create : ftruncate( shm._fd , size )
+        shm._size = fstat( shm._fd ).st_size
+        shm._mmap = mmap.mmap( shm._fd , shm._size )
+    except  OSError :
+        shm.close( )
+        if  create : _posixshmem.shm_unlink( shm._name )
+        raise
+    
+    shm._buf = memoryview( shm._mmap )
+    
+    return  shm
+
+
+def  shmuntrack ( shm ) :
+
+    '''
+    shmuntrack( shm )
+    
+    Hides SharedMemory block shm from this process's resource tracker, as for
+    shmopen. Needed when shm was unpickled, which attaches the block anew.
+    Unless the block is in tracked, for the process that made it. Discard it
+    from tracked first, to stop tracking it. Returns shm.
+    '''
+    
+    if  osname == 'posix'  and  shm._name not in tracked :
+        resource_tracker.unregister( shm._name , 'shared_memory' )
+    
+    return  shm
+
+
+def  shmunlink ( name ) :
+
+    '''
+    shmunlink( name )
+    
+    Unlinks the named SharedMemory block, if it still exists. If the block is
+    in tracked, then it is discarded from there, and the resource tracker must
+    stop tracking it. The block is attached first, so that the tracker sees a
+    matching register and unregister, even if another process that shares the
+    tracker untracked it already. Otherwise, the tracker is left alone; see
+    shmopen.
+    '''
+    
+    if  osname == 'posix'  and  f'/{ name }' not in tracked :
+        try :
+            _posixshmem.shm_unlink( f'/{ name }' )
+        except  FileNotFoundError :
+            pass
+        return
+    
+    tracked.discard( f'/{ name }' )
+    
+    try :
+        shm = sm.SharedMemory( name )
+    except  FileNotFoundError :
+        return
+    
+    shm.close( )
+    shm.unlink( )
+
+
+def  semopen ( cls , name , create = False ) :
+
+    '''
+    semopen( cls , name , create = False )
+    
+    Returns a multiprocessing RLock or Semaphore, as given by class cls from
+    multiprocessing.synchronize, that is a named POSIX semaphore. So any
+    process can open it by name, not only those that inherit it. A new one is
+    made if create is True, unlocked or with a count of zero. Otherwise, the
+    named semaphore is opened. Either way, it is not unlinked when the process
+    ends, unless it is tracked; see semtrack and semunlink. POSIX only.
+    
+    multiprocessing has no public way to name a semaphore, or to open one by
+    name. So this builds the object as multiprocessing does when it unpickles a
+    semaphore in a spawned child, with _multiprocessing.SemLock.
+    '''
+    
+    ( kind , value , maxvalue ) = ( sync.RECURSIVE_MUTEX , 1 , 1 )  \
+        if  cls is sync.RLock  else  ( sync.SEMAPHORE , 0 , sync.SEM_VALUE_MAX )
+    
+    obj = cls.__new__( cls )
+    
+    if  create :
+        obj._semlock = _multiprocessing.SemLock( kind , value , maxvalue ,
+                                                 name , False )
+    else :
+        obj._semlock = _multiprocessing.SemLock._rebuild( 0 , kind , maxvalue ,
+                                                          name )
+    
+    # Finish off as multiprocessing does. Pickling by name is allowed.
+    obj._is_fork_ctx = False
+    obj._make_methods( )
+    util.register_after_fork( obj , lambda o : o._semlock._after_fork( ) )
+    
+    return  obj
+
+
+def  semcond ( lock , names , create = False ) :
+
+    '''
+    semcond( lock , names , create = False )
+    
+    Returns a multiprocessing Condition that uses lock, and is made of the
+    three named POSIX semaphores in names; see semopen. So any process can
+    wait on it, or notify it, by name. POSIX only.
+    '''
+    
+    S = [ semopen( sync.Semaphore , name , create ) for name in names ]
+    
+    # Build the condition variable as multiprocessing would unpickle it
+    cond = sync.Condition.__new__( sync.Condition )
+    cond.__setstate__( ( lock , *S ) )
+    
+    return  cond
+
+
+def  semtrack ( name ) :
+
+    '''
+    semtrack( name )
+    
+    Hands the named POSIX semaphore to this process's resource tracker, which
+    unlinks it when the process ends, unless semuntrack is called first. As
+    for SharedMemory, and a semaphore that multiprocessing names itself.
+    '''
+    
+    resource_tracker.register( name , 'semaphore' )
+
+
+def  semuntrack ( name ) :
+
+    '''
+    semuntrack( name )
+    
+    Takes the named POSIX semaphore back from this process's resource tracker;
+    see semtrack.
+    '''
+    
+    resource_tracker.unregister( name , 'semaphore' )
+
+
+def  semunlink ( name ) :
+
+    '''
+    semunlink( name )
+    
+    Unlinks the named POSIX semaphore, if it still exists. It is tracked first,
+    as shmunlink does, so that the resource tracker sees a matching register
+    and unregister, whether or not this process tracked it before.
+    '''
+    
+    semtrack( name )
+    
+    try :
+        _multiprocessing.sem_unlink( name )
+    except  FileNotFoundError :
+        pass
+    finally :
+        semuntrack( name )
+
+
 #--- Supporting classes ---#
 
 class  qset ( set ) :
@@ -97,10 +610,17 @@ class  qset ( set ) :
     To screen new messages by sender or message type, then, one only need to
     compare the raw byte string taken from the queue body against the qsets that
     store screened sender and type byte strings.
+    
+    A qset also keeps an index of its elements by length; see bylength. Then a
+    byte string in shared memory need only be compared against elements of the
+    same length, and it need not be copied at all if there are none.
     '''
     
     def  __init__ ( self , iterable = ( ) ) :
         
+        # Index by length is built on demand
+        self.index = None
+        
         for i in iterable : self.add( i )
 
     
@@ -115,7 +635,166 @@ class  qset ( set ) :
         string using str( element ) before encoding.
         '''
     
-        b = elem if type( elem ) is bytes else str( elem ).encode( )
-        super( ).add( b )
+        super( ).add( tobytes( elem ) )
+        self.index = None
+    
+    
+    def  discard ( self , elem ) :
+    
+        'discard( element ) converts element as for add, then discards it.'
+        
+        super( ).discard( tobytes( elem ) )
+        self.index = None
+    
+    
+    def  remove ( self , elem ) :
+    
+        'remove( element ) converts element as for add, then removes it.'
+        
+        super( ).remove( tobytes( elem ) )
+        self.index = None
+    
+    
+    def  pop ( self ) :
+        
+        self.index = None
+        return  super( ).pop( )
+    
+    
+    def  clear ( self ) :
+        
+        super( ).clear( )
+        self.index = None
+    
+    
+    def  update ( self , *others ) :
+    
+        'update( *others ) adds every element of each iterable, as for add.'
+        
+        for  other in others :
+            for  elem in other : self.add( elem )
+    
+    
+    def  difference_update ( self , *others ) :
+        
+        super( ).difference_update( *( qset( o ) for o in others ) )
+        self.index = None
+    
+    
+    def  intersection_update ( self , *others ) :
+        
+        super( ).intersection_update( *( qset( o ) for o in others ) )
+        self.index = None
+    
+    
+    def  symmetric_difference_update ( self , other ) :
+        
+        super( ).symmetric_difference_update( qset( other ) )
+        self.index = None
+    
+    
+    # In-place operators must not bypass the index, either
+    
+    def  __ior__ ( self , other ) :
+        self.update( other )
+        return  self
+    
+    def  __isub__ ( self , other ) :
+        self.difference_update( other )
+        return  self
+    
+    def  __iand__ ( self , other ) :
+        self.intersection_update( other )
+        return  self
+    
+    def  __ixor__ ( self , other ) :
+        self.symmetric_difference_update( other )
+        return  self
+    
+    
+    def  bylength ( self ) :
+    
+        '''
+        bylength( )
+        
+        Returns a dict that maps each length of byte string in the qset to a
+        tuple of the elements with that length.
+        '''
+        
+        if  self.index is None :
+            
+            self.index = { }
+            
+            for  elem in self :
+                self.index[ len( elem ) ] = \
+                    self.index.get( len( elem ) , ( ) )  +  ( elem , )
+        
+        return  self.index
+
+
+
 
+class  countlock :
 
+    '''
+    countlock( lock )
+    
+    Wraps multiprocessing RLock lock, and counts how many times it is held, in
+    attribute depth. So a process can release it in full, and then take it back
+    as many times; see PySyncQ._spin. Otherwise it is used just as lock is,
+    including by multiprocessing Condition objects. Only the thread that holds
+    the lock changes depth, so depth is how often that thread holds it.
+    '''
+    
+    def  __init__ ( self , lock ) :
+        
+        self.lock  = lock
+        self.depth = 0
+    
+    
+    # A spawned child process does not hold the lock
+    
+    def  __getstate__ ( self ) :
+        return  self.lock
+    
+    def  __setstate__ ( self , lock ) :
+        ( self.lock , self.depth ) = ( lock , 0 )
+    
+    
+    @property
+    def  _semlock ( self ) :
+    
+        'The semaphore of lock, which Condition.wait inspects.'
+        
+        return  self.lock._semlock
+    
+    
+    def  acquire ( self , block = True , timeout = None ) :
+        
+        if  ( got := self.lock.acquire( block , timeout ) ) : self.depth += 1
+        
+        return  got
+    
+    
+    def  release ( self ) :
+        
+        # Count down first, while the lock is still held
+        self.depth -= 1
+        
+        try :
+            self.lock.release( )
+        except  Exception :
+            self.depth += 1
+            raise
+    
+    
+    # As acquire and release, but a call shorter, since the queue lock is taken
+    # this way most often
+    
+    def  __enter__ ( self ) :
+        self.lock.acquire( )
+        self.depth += 1
+    
+    def  __exit__ ( self , *args ) :
+        self.depth -= 1
+        self.lock.release( )
@@ -6,12 +6,27 @@ Python Synchronisation Queue
 #--- IMPORT BLOCK ---#
 
 # Standard library
-from time import time
+from time import time , sleep , monotonic_ns
+from os import name as osname
+from zlib import crc32
+from math import ceil
+from tempfile import gettempdir
+from threading import Lock
+import os
+import asyncio
 import multiprocessing               as mp
 import multiprocessing.shared_memory as sm
+import multiprocessing.synchronize   as sync
+
+# Give up the rest of this process's time slice. Windows has no sched_yield.
+if  osname == 'posix' :
+    from os import sched_yield
+else :
+    sched_yield = lambda : sleep( 0 )
 
 # From pysyncq package
 from pysyncq import header as hdr
+from pysyncq import codec  as cdc
 
 
 #--- PRINCIPAL API ---#
@@ -20,17 +35,39 @@ class  PySyncQ :
 
     '''
     class pysyncq.PySyncQ( name = None , create = True , size = <Page Size> ,
-                           start = None )
-
-    Creates a synchronisation queue. name is a str that names the shared memory
-    that is the backbone of the queue, and to which all processes will connect.
-    create is a bool that signals whether to create new shared memory (True) or
-    to use existing shared memory (False). size is an int of 0 or greater giving
-    the number of bytes to request for the shared memory. start names the start
-    method that will be used to create child processes. Hence, this must be a
-    valid start method string as returned by the multiprocessing module's
-    get_all_start_methods(). If start is None then multiprocessing's 
-    get_start_method() is called to determine the start method string.
+                           start = None , readers = 32 ,
+                           overflow = 'block' , maxlag = None ,
+                           maxlagbytes = None , intern = 0 ,
+                           spin = 0 , yields = 0 , codec = None ,
+                           spill = None , grow = None , bulk = <64KiB> ,
+                           work = None , ttl = None ,
+                           group = None , offset = 0 )
+
+    Creates a synchronisation queue. Arguments in brief, which docs/dev.rst
+    explains under PySyncQ arguments:
+    
+    name        - str naming the shared memory that all processes connect to.
+    create      - True makes new shared memory, False attaches; see attach.
+    size        - Bytes of queue body, 0 or greater.
+    start       - Start method of child processes, or None for the default.
+    readers     - Reader slots, 1 to 32. Max processes with the queue open.
+    overflow    - 'block', 'drop', 'overwrite' or 'detach' when out of space.
+    maxlag      - Messages behind the tail before 'detach' applies, or None.
+    maxlagbytes - Bytes behind the tail before 'detach' applies, or None.
+    intern      - Entries in the sender and type interning table, 0 for none.
+    spin        - Seconds to poll without the lock before sleeping.
+    yields      - Times to give up the processor and poll again, after spin.
+    codec       - Codec of appended bodies, see pysyncq.codec. None for text.
+    spill       - Bodies of more bytes go in shared memory of their own.
+    grow        - Max bytes that a full queue may grow to, or None.
+    bulk        - Bodies of more bytes are copied without the lock, or None.
+    work        - True, or message types, that are read by one process only.
+    ttl         - Seconds to live, 0 for ever. None: no time counters at all.
+    group       - PySyncMultiQ that holds this queue as a channel, or None.
+    offset      - First byte of the channel in group's shared memory.
+    
+    spin, yields, codec, work and ttl are also attributes, which each process
+    can change at any time.
     
     Each process that wishes to read/write on the queue must make a separate
     call to the .open( ) method, in order to register itself with the queue as
@@ -40,17 +77,63 @@ class  PySyncQ :
     #-- Double underscore methods --#
 
     def  __init__ ( self , name = None , create = True , size = hdr.defsize ,
-                           start = None ) :
+                           start = None , readers = hdr.maxreaders ,
+                           overflow = 'block' , maxlag = None ,
+                           maxlagbytes = None , intern = 0 ,
+                           spin = 0 , yields = 0 , codec = None ,
+                           spill = None , grow = None ,
+                           bulk = hdr.defbulk , work = None , ttl = None ,
+                           group = None , offset = 0 ) :
     
         # Size must not allow more messages than a queue header counter max val.
         if  size > hdr.maxshmemory :
             raise  MemoryError( f'Queue size can\'t exceed { hdr.maxshmemory }')
         
+        # One bit of the message reads counter per reader slot
+        if  not 1 <= readers <= hdr.maxreaders :
+            raise  ValueError( f'readers must be 1 to {hdr.maxreaders}, '
+                               f'{readers=}' )
+        
+        # Check validity of overflow policy
+        if  overflow not in hdr.overflows :
+            raise  ValueError( f'Not a valid overflow policy, {overflow=}' )
+        
+        # Spilled blocks must outlive the process that made them
+        if  spill is not None  and  osname != 'posix' :
+            raise  NotImplementedError( 'spill needs a POSIX system' )
+        
+        # A channel has a fixed share of the group's shared memory
+        if  grow is not None  and  group is not None :
+            raise  ValueError( 'A channel of a PySyncMultiQ can\'t grow' )
+        
+        # Attaching needs named semaphores
+        if  not create  and  osname != 'posix' :
+            raise  NotImplementedError( 'attach needs a POSIX system' )
+        
         # Remember initialisation parameters, size is especially important
         self.name = name
         self.create = create
         self.size = size
         self.start = start
+        self.slots = readers
+        self.overflow = overflow
+        self.maxlag = maxlag
+        self.maxlagbytes = maxlagbytes
+        self.nintern = intern
+        self.spin = spin
+        self.yields = yields
+        self.codec = cdc.Text( )  if  codec is None  else  codec
+        self.spill = spill
+        self.grow = grow
+        self.bulk = bulk
+        self.work = work  if  work in ( None , True )  else  hdr.qset( work )
+        self.ttl = ttl
+        self.group = group
+        self.offset = offset
+        
+        # Messages have time counters only if the queue is made with a time to
+        # live, even zero. An attached queue's header says whether they do.
+        self.timed = ttl is not None
         
         # Get default start method
         if  self.start is None : self.start = mp.get_start_method( )
@@ -59,6 +142,9 @@ class  PySyncQ :
         if  self.start not in mp.get_all_start_methods( ) :
             raise  ValueError( f'Not a valid start method, {start=}' )
         
+        # Check validity of time to live
+        self._ttl( ttl )
+        
         # Sender string and is uninitialised. Instance read position is
         # initialised to first byte of queue body. The serial number of the
         # latest read done by this instance is initialised to zero.
@@ -66,46 +152,127 @@ class  PySyncQ :
         self.i      = 0
         self.slno   = 0
         
+        # Reader slot of this instance, and its bit in message reads counters.
+        # Both are assigned by open( ), as is the ID of the process that opened
+        # this instance.
+        self.slot = None
+        self.bit  = 0
+        self.pid  = None
+        
+        # ID of the process that made the queue, if it was this one. Its
+        # resource tracker tracks the shared memory.
+        self.maker = mp.current_process( ).pid  if  create  else  None
+        
+        # Sets of message leases and write reservations that this instance has
+        # handed out, but which have not been released or committed yet
+        self.leases       = set( )
+        self.reservations = set( )
+        
+        # Wake-up FIFOs of this instance's reader slot, which map queue header
+        # counter index hdr.iwmsg or hdr.iwspc to a tuple of read and write
+        # file descriptors. And the FIFOs of other slots that this instance
+        # has written into, which map ( index , slot ) to a tuple of the slot's
+        # ( process ID , open serial number ) and a write file descriptor.
+        self.wakefds = { }
+        self.fifos   = { }
+        
+        # Local copy of the interning table, which lists interned byte strings
+        # by ID, and a dict that maps each one back to its ID
+        self.interned = [ ]
+        self.ids      = { }
+        
         # Prepare screening sets for message sender and message type. Pack them
         # together in a tuple for easy zipping.
         self.scrnsend = hdr.qset( )
         self.scrntype = hdr.qset( )
         self.scrns = ( self.scrnsend , self.scrntype )
         
-        # Create a new condition variable that will govern all access to the
-        # shared memory.
-        self.cond = mp.Condition( )
+        # Message types that this instance subscribes to. All, if empty.
+        self.subs = hdr.qset( )
         
-        # Create the shared memory
-        self.shm = sm.SharedMemory( name , create , size )
+        # Create the shared memory, with room for the reader slots and the
+        # interning table
+        if  group is None  and  create :
+            
+            self.shm = sm.SharedMemory( name , create ,
+                                        size + readers * hdr.sizeslot +
+                                               intern * hdr.sizeintern )
+            hdr.tracked.add( self.shm._name )
+            
+            # Guarantee that it is initialised to zeros. Has effect of setting
+            # queue header process count and head and tail positions to zero,
+            # as well as the message or write serial number. All reader slots
+            # are inactive.
+            self.shm.buf[:] = bytes( self.shm.size )
         
-        # Guarantee that it is initialised to zeros. Has effect of setting queue
-        # header process count and head and tail positions to zero, as well as
-        # the message or write serial number.
-        self.shm.buf[:] = bytes( size )
+        # Or attach to an existing queue's shared memory. Its header gives the
+        # number of reader slots and interning table entries, which are only
+        # set once the queue is ready.
+        elif  group is None :
+            
+            self.shm = hdr.shmopen( name )
+            
+            h = self.shm.buf[ : hdr.sizequeuehead ].cast( hdr.fmtqueuehead )
+            ( self.slots , self.nintern ) = ( h[ hdr.islot ] , h[ hdr.iitab ] )
+            h.release( )
+            
+            if  not self.slots :
+                self.shm.close( )
+                raise  FileNotFoundError( f'Queue {name} is not ready' )
+            
+            self.size = self.shm.size - hdr.sizequeuehead - \
+                        self.slots   * hdr.sizeslot       - \
+                        self.nintern * hdr.sizeintern
         
-        # Make a memoryview that sees only the queue header. Each indexed unit
-        # is of the queue's counter type e.g. unsigned long long integer.
-        self.h = self.shm.buf[ : hdr.sizequeuehead ].cast( hdr.fmtqueuehead )
+        # Or use the group's shared memory, which it initialised to zeros
+        else :
+            
+            self.shm = group.shm
         
-        # Another memoryview sees only the queue body, where the messages go.
-        # Since we will have no idea how long each message will be, we need the
-        # index granularity to be at the level of each byte.
-        self.b = self.shm.buf[ hdr.sizequeuehead : ]
+        # Name of the first block of shared memory, from which the queue's later
+        # generations are named. The generation of the block that this instance
+        # has memoryviews of, and those of other generations, by generation.
+        self.base = self.shm.name
+        self.gen  = 0
+        self.segs = { }
         
-        # Set number of free bytes in the queue main body.
-        self.h[ hdr.ifree ] = len( self.b )
+        # Create a new lock that will govern all access to the shared memory.
+        # Two condition variables share it. Readers wait on cond for new
+        # messages, while writers wait on space for free bytes. Hence, each
+        # kind of process is only woken when the queue changes in the way that
+        # it is waiting for. On POSIX systems they are named, so that other
+        # processes can attach. Even those of a channel of a PySyncMultiQ.
+        if  osname == 'posix' :
+            ( self.lock , self.cond , self.space ) = self._sync( create )
+        else :
+            self.lock  = hdr.countlock( mp.RLock( ) )
+            self.cond  = mp.Condition( self.lock )
+            self.space = mp.Condition( self.lock )
+        
+        # Make memoryviews of the queue header, reader slots, and queue body
+        self._map( )
+        
+        # Set number of free bytes in the queue main body, interning table
+        # entries, and reader slots. Unless attaching. The number of reader
+        # slots goes last, as it says that the queue is ready.
+        if  create :
+            self.h[ hdr.ifree ] = len( self.b )
+            self.h[ hdr.iitab ] = intern
+            self.h[ hdr.imsgh ] = hdr.lenmsghead  +  \
+                                  ( hdr.lenmsgtime  if  self.timed  else  0 )
+            self.h[ hdr.islot ] = readers
+        
+        # Bytes of counters at the start of every message, and how to pack them
+        self.timed   = self.h[ hdr.imsgh ] > hdr.lenmsghead
+        self.sizemsg = self.h[ hdr.imsgh ] * hdr.nbytemsghead
+        self.msghead = hdr.msgfull  if  self.timed  else  hdr.msghead
         
         # Child processes will be spawned rather than forked. A memoryview is
         # not pickleable as of Python 3.11.4. Release un-pickleable resources.
         # NB! Shared memory is closed but NOT unlinked. All resources will be
         # recovered in the call to open( ). Although the Condition object is not
         # pickleable, this can nevertheless be inhereted by the child process.
-        if  self.start == 'spawn' :
-            self.h.release( )
-            self.b.release( )
-            self.h = None
-            self.b = None
+        if  self.start == 'spawn' : self._unmap( )
     
     
     def  __call__ ( self , *args , **kargs ) :
@@ -127,456 +294,4389 @@ class  PySyncQ :
         'Returns iterator using default pop() input arguments.'
     
         return  self( )
+    
+    
+    def  __aiter__ ( self ) :
+    
+        'Returns asynchronous iterator using default pop_async() arguments.'
+        
+        return  self.iter_async( )
 
 
     def  __str__ ( self ) :
         
         return ( f'PySyncQ(name={self.name},size={self.size},'
-                 f'sender={self.sender.decode()},pos={self.i},sn={self.slno})' )
+                 f'sender={self.sender.decode()},slot={self.slot},'
+                 f'pos={self.i},sn={self.slno})' )
     
     
-    #-- Single underscore methods for internal class use --#
+    def  __setstate__ ( self , state ) :
     
-    def  _popred ( self ) :
-        
         '''
-        _popred is a predicate function that returns True when the instance
-        read position does not equal the queue tail position. Or when the read
-        serial number does not equal the write serial number. Either condition
-        signals a message that this instance hasn't read yet.
-        
-        DO NOT USE THIS unless the lock has been acquired, first.
+        Unpickles a PySyncQ that was passed to a spawned child process. That
+        attaches the shared memory again, which only the process that made the
+        queue may track; see header.shmuntrack. The child shares the resource
+        tracker of its parent, so a queue that the parent made stays tracked.
         '''
         
-        # Note, the logical or operator short-circuits. The serial
-        # numbers are only checked if the instance read position sits at
-        # the tail.
-        return  ( self.i    != self.h[ hdr.itail ]  or
-                  self.slno != self.h[ hdr.islno ] )
+        self.__dict__.update( state )
+        
+        if  self.group is not None : return
         
+        if  self.create :
+            hdr.tracked.add( self.shm._name )
+        else :
+            hdr.shmuntrack( self.shm )
     
-    def  _next ( self ) :
+    
+    #-- Single underscore methods for internal class use --#
+    
+    def  _map ( self ) :
     
         '''
-        _next looks for the next message in the queue relative to current read
-        position of this instance in attribute .i. If there is a message to read
-        then the function will yield a tuple containing a memoryview of the
-        message counters and the location of the first byte that is past them,
-        with the format ( memoryview , byte-location ). The instance read
-        position is placed to the first byte past the end of the message body.
-        
-        Therefore, the function returns a generator that can be run in a loop.
-        Once there is no longer any message to read then the function terminates
-        and implicitly triggers a StopIteration exception. 
+        Makes memoryviews of the shared memory. Attribute h sees only the queue
+        header, and s sees only the reader slots. Each indexed unit of these is
+        of the queue's counter type e.g. unsigned long long integer. Attribute t
+        sees only the interning table, in bytes. Attribute b sees only the queue
+        body, where the messages go. Since we will have no idea how long each
+        message will be, we need the index granularity of the queue body to be
+        at the level of each byte.
         '''
         
-        # Generator loop
-        while  True :
-            
-            # Get the queue's lock
-            with  self.cond :
-                
-                # Queue is empty or pop predicate fails. There is no message.
-                if self.h[ hdr.ifree ] == len( self.b ) or not self._popred( ) :
-                    return
-            
-            # Increment instance read serial number, modulo max queue count val.
-            if  self.slno == hdr.maxqueuehead :
-                self.slno  = 0
-            else :
-                self.slno += 1
-            
-            # Cast memoryview of message's counters
-            hmsg = \
-             self.b[ self.i : self.i + hdr.sizemsghead ].cast( hdr.fmtmsghead )
-            
-            # Locate the first byte past the message counters
-            b = ( self.i + hdr.sizemsghead  )  %  len( self.b )
-            
-            # Set read position to first byte past the end of message body
-            self.i = ( b + sum( hmsg[hdr.mbcnt] ) )  %  len( self.b )
-
-            # If the read position is too close to the end of the queue body for
-            # a complete set of message counters to fit then it must skip those
-            # final bytes and go back to the start of the queue body.
-            if  len( self.b ) - self.i  <  hdr.sizemsghead :
-
-                self.i = 0
-            
-            # Generate message details
-            yield  ( hmsg , b )
-            
-
-    def  _read ( self , b , db ) :
+        # First byte of the reader slots, past the queue header
+        i = self.offset  +  hdr.sizequeuehead
         
-        '''
-        Read db bytes from queue body, starting at byte b. If b is less than db
-        bytes from the end of the queue then the read wraps around to the start
-        of the queue body and returns a concatenated result.
+        # First byte of the interning table, past the reader slots. And first
+        # byte of the queue body, past the interning table.
+        n = i  +  self.slots * hdr.sizeslot
+        m = n  +  self.nintern * hdr.sizeintern
         
-        Returns tuple ( bstr , b ). bstr is the byte string that is read from
-        the queue body. b is the first byte past the end of the read, modulo
-        queue body size.
+        # The queue body runs to the end of shared memory. Unless the queue is
+        # one channel of a group, where it has exactly size bytes.
+        e = None  if  self.group is None  else  m + self.size
+        
+        self.h = self.shm.buf[ self.offset : i ].cast( hdr.fmtqueuehead )
+        self.s = self.shm.buf[ i : n ].cast( hdr.fmtqueuehead )
+        self.t = self.shm.buf[ n : m ]
+        self.b = self.shm.buf[ m : e ]
+    
+    
+    def  _unmap ( self ) :
+    
+        'Releases the memoryviews made by _map.'
+        
+        for  v in ( self.h , self.s , self.t , self.b ) : v.release( )
+        self.h = self.s = self.t = self.b = None
+    
+    
+    def  _semnames ( self ) :
+    
+        '''
+        Returns the names of the queue's POSIX semaphores, which are named after
+        the shared memory of its first generation. Or after the group and the
+        channel, for a channel of a PySyncMultiQ, with '+' in place of the '/'
+        that a semaphore name can't contain. The lock goes first. Then three
+        for each condition variable, cond and space.
         '''
         
-        # Number of bytes readable before the end of the queue body
-        n = min( db , len( self.b ) - b )
+        base = self.base  if  self.group is None  else  \
+               self.name.replace( '/' , '+' )
         
-        # Read out bytes
-        bstr = self.b[ b : b + n ].tobytes( )
+        return  [ f'/pysyncq.{ base.lstrip( "/" ) }.{ k }' for k in range( 7 ) ]
+    
+    
+    def  _sync ( self , create ) :
+    
+        '''
+        Returns the tuple ( lock , cond , space ) of the queue's lock and
+        condition variables, made of named POSIX semaphores; see _semnames. So
+        any process can open them. If create is True then they are made, first
+        unlinking any that were left by an earlier queue of the same name that
+        was never closed. Then they are tracked, like the shared memory, by
+        the process that made the queue; see header.semtrack. Otherwise, they
+        are opened.
+        '''
         
-        # Read must wrap around to start of queue body
-        if  n < db : bstr += self.b[ : db - n ].tobytes( )
+        N = self._semnames( )
         
-        # Advance b past the read
-        b = ( b + db )  %  len( self.b )
+        if  create :
+            for  name in N : hdr.semunlink( name )
         
-        # Return the byte string
-        return  bstr , b
-
-
-    def  _free ( self , h ) :
+        lock  = hdr.countlock( hdr.semopen( sync.RLock , N[ 0 ] , create ) )
+        cond  = hdr.semcond( lock , N[ 1 : 4 ] , create )
+        space = hdr.semcond( lock , N[ 4 : ] , create )
         
-        '''
-        Free queue memory that stores message with header counter memoryview h.
-        It is assumed that this message is at the queue head and that its read
-        count is depleted.
+        if  create :
+            for  name in N : hdr.semtrack( name )
         
-        DO NOT USE THIS unless the lock has been acquired, first.
+        return  ( lock , cond , space )
+    
+    
+    def  _unsync ( self , noproc ) :
+    
+        '''
+        Unlinks the queue's named semaphores, if noproc is True because this is
+        the last closure. Otherwise, the resource tracker of the process that
+        made them must not unlink them once that process ends; see _sync.
         '''
         
-        # Bytes in message, including counters and all byte strings
-        n = hdr.sizemsghead  +  sum( h[ hdr.mbcnt ] )
+        if  osname != 'posix' : return
         
-        # Advance head of queue, modulo size of queue body
-        self.h[ hdr.ihead ] = ( self.h[ hdr.ihead ] + n )  %  len( self.b )
+        for  name in self._semnames( ) :
+            if  noproc :
+                hdr.semunlink( name )
+            elif  self.maker == mp.current_process( ).pid :
+                hdr.semuntrack( name )
+    
+    
+    def  _segname ( self , gen ) :
+    
+        'Returns the name of the shared memory of queue generation gen.'
         
-        # Free up those bytes
-        self.h[ hdr.ifree ] += n
+        return  self.base  if  gen == 0  else  f'{ self.base }.{ gen }'
+    
+    
+    def  _root ( self ) :
+    
+        '''
+        Returns the memoryview of the queue header in the first generation's
+        shared memory. It counts every process that uses the queue, and names
+        the newest generation.
+        '''
         
-        # Head is now too close to end of queue body for a full set of message
-        # counters. Wrap around back to the start of queue body and free the
-        # skipped bytes.
-        if  ( n := len( self.b ) - self.h[ hdr.ihead ] )  <  hdr.sizemsghead :
-            
-            self.h[ hdr.ihead ]  = 0
-            self.h[ hdr.ifree ] += n
-
-
-    #-- Principal API methods --#
+        return  self.h  if  self.gen == 0  else  self.segs[ 0 ][ 1 ]
     
-    # Creation / Deletion #
     
-    def  open ( self , sender = None , filtself = True ) :
+    def  _install ( self , gen ) :
     
         '''
-        open( sender = pid , filtself = True ) registers the current process
-        with the queue. sender is a string naming the process in each message
-        that it sends; if set to None, then the current process ID i.e. pid is
-        used as the sender (default). The bool filtself says whether the sender
-        string is automatically added to the scrnsend set; default is True.
+        Makes this instance's shared memory and memoryviews those of queue
+        generation gen. The current ones are kept in self.segs. The shared
+        memory of gen is attached, if need be.
         '''
         
-        # Use the default sender string
-        if  sender is None : sender = str( mp.current_process( ).pid )
+        if  gen == self.gen : return
         
-        # Store sender string as bytes that can go directly into shared memory
-        self.sender = sender.encode( )
+        self.segs[ self.gen ] = ( self.shm , self.h , self.s , self.t , self.b )
         
-        # If true then add local sender name to message filter list
-        if  filtself : self.scrnsend.add( self.sender )
+        if  gen in self.segs :
+            ( self.shm , self.h , self.s , self.t , self.b ) = \
+                self.segs.pop( gen )
+        else :
+            self.shm = hdr.shmopen( self._segname( gen ) )
+            self._map( )
         
-        # Child processes was spawned rather than forked. Recover all un-
-        # pickleable and un-inheritable resources.
-        if  self.start == 'spawn' :
-            self.h = self.shm.buf[ : hdr.sizequeuehead ].cast( hdr.fmtqueuehead)
-            self.b = self.shm.buf[ hdr.sizequeuehead : ]
+        self.gen = gen
+    
+    
+    def  _newest ( self ) :
+    
+        '''
+        with self._newest( ) : ... makes the newest generation's memoryviews
+        this instance's, for writing. On exit, the memoryviews of the generation
+        that this instance reads from are restored, even if the queue grew in
+        the meantime; see _Newest.
         
-        # Get queue lock. Increment the process counter in the queue header. And
-        # set this instance's read or queue position to the tail; read only the
-        # messages that come after this instance/process has registered. The
-        # assignment to attribute i should provoke any necessary copy-on-write.
-        with  self.cond :
-            self.h[ hdr.iproc ] += 1
-            self.i = self.h[ hdr.itail ]
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
         
+        return  _Newest( self )
+    
+    
+    def  _grow ( self , n ) :
     
-    def  close ( self ) :
-        
         '''
-        Closes the shared memory. And unlinks if this is the last closure.
+        Makes a new generation of the queue, with room for an n byte message,
+        and moves this instance's memoryviews on to it. The body doubles in
+        size, and more if need be, up to self.grow bytes. Returns True if the
+        queue grew. It can't while there are unpublished reservations, which
+        must be published where they were made.
+        
+        The new generation starts out empty, and carries on the old one's write
+        serial number. It gets copies of the old one's process count, reader
+        slots, and interning table. Each slot starts at the new head, so every
+        process will read the new generation's messages once it has read the
+        rest of the old one's; see _follow.
+        
+        DO NOT USE THIS unless the lock has been acquired, first. And the
+        memoryviews are the newest generation's; see _newest.
         '''
         
-        # Return immediately if shared memory was already closed
-        if  not self.shm : return
+        # New body size
+        size = 2 * len( self.b )
+        while  size < n : size *= 2
+        size = min( size , self.grow )
         
-        # Get queue lock.
-        with  self.cond :
+        if  size < n  or  size <= len( self.b )  or  self.h[ hdr.inres ] :
+            return  False
         
-            # Scan through any unread messages and decrement the read counter.
-            # Be careful to release memoryviews.
-            for m in self._next( ) :
-                
-                m[ 0 ][ hdr.iread ] -= 1
-                m[ 0 ].release( )
-            
-            # Decrement the process counter
-            if self.h[ hdr.iproc ] : self.h[ hdr.iproc ] -= 1
-            
-            # But remember the counter value, we unlink if all instances closed.
-            noproc = self.h[ hdr.iproc ] == 0
+        # Make the new generation's shared memory, zeroed
+        gen = self.gen + 1
+        shm = hdr.shmopen( self._segname( gen ) ,
+                           size + hdr.sizequeuehead +
+                                  self.slots * hdr.sizeslot +
+                                  self.nintern * hdr.sizeintern , True )
+        shm.buf[:] = bytes( shm.size )
         
-        # Take care to release memoryviews, or else .close raises an exception.
-        self.h.release( )
-        self.b.release( )
+        # Old generation is superseded. Readers that wait on it must look, and
+        # so must writers that wait for space in it.
+        self.h[ hdr.igrow ] = self._root( )[ hdr.igrow ] = gen
+        self.cond.notify_all( )
+        self.space.notify_all( )
+        self._wake( hdr.iwmsg )
+        self._wake( hdr.iwspc )
         
-        # Close local copy of shared memory
-        self.shm.close( )
+        # Move on to the new generation
+        self.segs[ self.gen ] = ( self.shm , self.h , self.s , self.t , self.b )
+        ( old , self.shm , self.gen ) = ( self.h , shm , gen )
+        self._map( )
         
-        # Unlink if this is the last close
-        if  noproc : self.shm.unlink( )
+        # Copy queue header counters. The queue is empty, and its head and tail
+        # are at zero. Every process counts, not just those still reading the
+        # old generation.
+        for  i in ( hdr.iact , hdr.islot , hdr.idet , hdr.iistr , hdr.iitab ,
+                    hdr.isub , hdr.iwmsg , hdr.iwspc , hdr.imsgh ) :
+            self.h[ i ] = old[ i ]
+        self.h[ hdr.iproc ] = self._root( )[ hdr.iproc ]
+        self.h[ hdr.ifree ] = len( self.b )
+        self.h[ hdr.islno ] = self.h[ hdr.ihsln ] = old[ hdr.islno ]
         
-        # Signal that shared memory has been closed by this instance
-        self.shm = None
-
-
-    # Message handling #
+        # Copy reader slots, and point them at the head
+        self.s[:] = self.segs[ gen - 1 ][ 2 ]
+        for  k in range( self.h[ hdr.islot ] ) :
+            self.s[ k*hdr.lenslot + hdr.spos  ] = 0
+            self.s[ k*hdr.lenslot + hdr.sslno ] = self.h[ hdr.islno ]
+        
+        # Copy the interning table
+        self.t[:] = self.segs[ gen - 1 ][ 3 ]
+        
+        return  True
     
-    def  append ( self , msgtype = '' , msg = '' , block = False ,
-                         timer = 0.5 ) :
+    
+    def  _gens ( self ) :
     
         '''
-        append ( self , msgtype = '' , msg = '' , block = False , timer = 0.5 )
-        
-        Adds a new message to the tail of the queue. The message header stores
-        the sender name and msgtype as message type. msg forms the main body of
-        the message. If msgtype or msg are not already str or bytes then they
-        are first cast to str before casting to bytes with the default encoding.
-        
-        If the queue lacks sufficient free space in which to write the message
-        header and body then a MemoryError exception is raised, unless block is
-        True. Then append will wait until there is enough room in the queue.
+        Generator that makes each queue generation's memoryviews this
+        instance's in turn, from the generation that it reads from to the
+        newest, and yields each generation. The memoryviews of the generation
+        that this instance reads from are restored at the end. Reader slots
+        are copied from one generation to the next, so the slot of this
+        instance is the same in each.
         
-        append will wait indefinitely for free space if timer is None. But timer
-        can be a float that specifies the number of seconds to wait for. If the
-        timer expires before the message is appended to the queue then the
-        MemoryError exception is raise.
+        DO NOT USE THIS unless the lock has been acquired, first.
         '''
         
-        # Internally, messages have the format
-        # [ message counters , message sender , message type , message body ]
-        
-        def  argbytes ( arg ) :
-            '''
-            Guarantee that input args are converted to byte strings from the arg
-            cast to str.
-            '''
-            return  arg  if  type( arg ) is bytes  else  str( arg ).encode( )
-        
-        # Cast message type and body to bytes
-        btype = argbytes( msgtype )
-        bmsg  = argbytes(     msg )
-        
-        # Total number of bytes required by the message, including counters
-        n = hdr.sizemsghead + len( self.sender ) + len( btype ) + len( bmsg )
+        g = self.gen
         
-        # Build a predicate function that returns True when there is enough
-        # space in the queue for the message.
-        free = lambda : self.h[ hdr.ifree ] >= n
+        try :
+            for  gen in range( g , max( g , self._root( )[ hdr.igrow ] ) + 1 ):
+                self._install( gen )
+                yield  gen
+        finally :
+            self._install( g )
+    
+    
+    def  _leave ( self , gen ) :
+    
+        '''
+        Moves this instance on to queue generation gen, which is newer than
+        the one that it reads from. Each generation before gen is let go of. Its
+        process counter is decremented, and its shared memory is closed, as
+        well as unlinked if no process uses it any longer. Except for the first
+        generation, which is kept until the queue is unlinked. This instance's
+        reader slot in those generations must be given up, first.
         
-        # Get queue lock, the remainder of append runs with possession of lock
-        with  self.cond :
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
         
-            # The queue is too full
-            if  not ( free( )  or  block  and  
-                                   self.cond.wait_for( free , timer ) ) :
-            
-                raise  MemoryError( f'{ n } byte message > '
-                                    f'{ self.h[ hdr.ifree ] } free bytes.' )
-                
-            # If we got here then there is enough free space in the queue. Get
-            # position of queue's tail, which is where the message write starts.
-            i = self.h[ hdr.itail ]
+        while  self.gen < gen :
             
-            # Create a memoryview for the message header counters
-            hmsg = self.b[ i : i + hdr.sizemsghead ].cast( hdr.fmtmsghead )
+            old = self.gen
             
-            # Load message counters. Number of reads from message must equal the
-            # number of registered processes, one read per process.
-            hmsg[ hdr.iread ] = self.h[ hdr.iproc ]
-            hmsg[ hdr.isend ] = len( self.sender )
-            hmsg[ hdr.itype ] = len( btype )
-            hmsg[ hdr.ibody ] = len( bmsg )
+            if  old  and  self.h[ hdr.iproc ] : self.h[ hdr.iproc ] -= 1
             
-            # Advance the byte index past the message counters
-            i += hdr.sizemsghead
+            self._install( old + 1 )
             
-            # Byte strings
-            for  b  in  ( self.sender , btype , bmsg ) :
-                
-                # Bytes remaining prior to the end of the queue body
-                r = len( self.b ) - i
-                
-                # The string will fit in a contiguous block
-                if  r >= len( b ) :
-                
-                    # Slice assign the entire byte string
-                    self.b[ i : i + len( b ) ] = b
-                    
-                    # Advance write position to next free byte
-                    i += len( b )
-                    
-                # The queue is a circular buffer. Bisect the string between the
-                # end of the queue body and the start.
-                else :
-                    
-                    # Slice assign what we can to the end of the queue body
-                    self.b[ i : ] = b[ : r ]
-                    
-                    # Number of bytes from string that are still unwritten
-                    r = len( b ) - r
-                    
-                    # Cycle to the start of the queue body and write remainder
-                    self.b[ : r ] = b[ -r : ]
-                    
-                    # Write position at next free byte
-                    i = r
+            if  not old : continue
             
-            # Decrement length of message from queue's free space counter
-            self.h[ hdr.ifree ] -= n
+            ( shm , *V ) = self.segs.pop( old )
+            unused = not V[ 0 ][ hdr.iproc ]
+            for  v in V : v.release( )
+            shm.close( )
             
-            # Find next byte past new message, the new tail position.
-            self.h[ hdr.itail ] = i
+            if  unused : hdr.shmunlink( shm.name )
+    
+    
+    def  _follow ( self ) :
+    
+        '''
+        Moves this instance on to the next queue generation, once it has read
+        every message of the generation that it reads from, and a newer one
+        was made; see _grow. Not while it has leases outstanding. Returns True
+        if it moved on. The reader slot of the old generation is given up, and
+        the old generation is let go of; see _leave. Reading resumes where the
+        reader slot of the new generation points.
+        '''
+        
+        # Not superseded, not reading, or a lease holds a message of this
+        # generation
+        if  not self.h[ hdr.igrow ]  or  not self.bit  or  self.leases :
+            return  False
+        
+        with  self.cond :
             
-            # Message counters require contiguous bytes. But the new tail
-            # position is too close to the end of the queue body for that. We
-            # must position the tail at the start of the queue body and discard
-            # the bytes at the end.
-            if  ( r := len( self.b ) - self.h[ hdr.itail ] ) < hdr.sizemsghead :
-                self.h[ hdr.itail ]  = 0
-                self.h[ hdr.ifree ] -= r
+            # Unread messages
+            if  self.i    != self.h[ hdr.itail ]  or  \
+                self.slno != self.h[ hdr.islno ] : return  False
             
-            # Increment the message serial number, modulo max value of counter
-            if  self.h[ hdr.islno ] == hdr.maxqueuehead :
-                self.h[ hdr.islno ]  = 0
-            else :
-                self.h[ hdr.islno ] += 1
+            # Give up the old generation's reader slot
+            self.h[ hdr.iact ] &= ~self.bit
+            self.s[ self.slot * hdr.lenslot + hdr.spid ] = 0
+            self._free( )
             
-            # Wake up any process that is waiting on the state of the queue
-            self.cond.notify_all( )
+            # Read from the next generation
+            self._leave( self.gen + 1 )
+            k = self.slot * hdr.lenslot
+            self.i    = self.s[ k + hdr.spos  ]
+            self.slno = self.s[ k + hdr.sslno ]
         
-        # Dropped out of with statement - queue lock has been released. But the
-        # message counter memoryview remains. It refers to the shared memory,
-        # which cannot close properly until this memoryview has been released.
-        # We do it explicitly, in case the object is not destroyed through
-        # garbage collection before the .close method is invoked.
-        hmsg.release( )
-         
-        
-    def  pop ( self , block = False , timer = 0.5 , decode = True ) :
+        return  True
+    
+    
+    def  _lookup ( self , j ) :
     
         '''
-        pop ( block = False , timer = 0.5 , decode = True )
+        Returns the interned byte string with ID j. The local copy of the
+        interning table is brought up to date, if it does not have j yet. No
+        lock is needed, because table entries never change once they are
+        counted, and a message can only refer to a counted entry.
+        '''
         
-        Reads the next next unread message from the queue and returns the tuple
-        ( sender , type , msg ) ... see append. If the sender or type string is
-        found in the scrnsend or scrntype sets, respectively, then the message
-        is skipped, and pop looks for the next unread message in the queue. If
-        there are no unread and unscreened messages then None is returned,
-        unless block is True.
+        # Read new entries
+        while  len( self.interned ) <= j :
+            
+            k = len( self.interned ) * hdr.sizeintern
+            bstr = self.t[ k + 1 : k + 1 + self.t[ k ] ].tobytes( )
+            
+            self.ids[ bstr ] = len( self.interned )
+            self.interned.append( bstr )
         
-        Then pop will wait until there is a new message to read. Pop will wait
-        indefinitely if timer is None. Otherwise, timer can be a float that
-        gives the number of seconds that pop will wait for. If the timer expires
-        before an unread message becomes available then None will be returned.
+        return  self.interned[ j ]
+    
+    
+    def  _intern ( self , bstr ) :
+    
+        '''
+        Returns the tuple ( c , bstr ) that says how to write byte string bstr
+        into a message. c is the value of the message's counter for bstr, and
+        bstr is what to write into the message. If bstr is interned then c holds
+        its ID, flagged with hdr.finterned, and nothing is written. Otherwise, c
+        is the length of bstr. bstr is added to the interning table if there is
+        room, and if it is not too long.
         
-        By default, messages are decoded from bytes to str with the default
-        encoding. But if decode is False then the raw bytes are returned.
+        DO NOT USE THIS unless the lock has been acquired, first.
         '''
         
-        # Get time at start of function call. We use this to subtract elapsed
-        # time from repeated waits on the condition variable, if frequent
-        # screened messages are appended to the queue by another instance.
-        if  timer : tin = time( )
+        # No interning table
+        if  not self.nintern : return  len( bstr ) , bstr
+        
+        # Already interned
+        if  ( j := self.ids.get( bstr ) ) is not None :
+            return  j | hdr.finterned , b''
+        
+        # Not worth interning, or can't be
+        if  not bstr  or  len( bstr ) > hdr.maxintern :
+            return  len( bstr ) , bstr
+        
+        # Another process may have interned the string. Catch up.
+        if  self.h[ hdr.iistr ] :
+            self._lookup( self.h[ hdr.iistr ] - 1 )
+            if  ( j := self.ids.get( bstr ) ) is not None :
+                return  j | hdr.finterned , b''
+        
+        # Interning table is full
+        if  self.h[ hdr.iistr ] == self.nintern : return  len( bstr ) , bstr
+        
+        # Write a new entry, and then count it
+        k = self.h[ hdr.iistr ] * hdr.sizeintern
+        self.t[ k ] = len( bstr )
+        self.t[ k + 1 : k + 1 + len( bstr ) ] = bstr
+        self.h[ hdr.iistr ] += 1
+        
+        return  self._intern( bstr )
+    
+    
+    def  _msgsize ( self , btype , nbody ) :
+    
+        '''
+        Returns the number of bytes needed by a message from this instance with
+        type btype and an nbody byte body, including counters. This may be a
+        few bytes too many, if the sender or type will be interned when the
+        message is reserved.
+        '''
+        
+        return  self.sizemsg  +  nbody  +  \
+                ( 0  if  self.sender in self.ids  else  len( self.sender ) ) + \
+                ( 0  if  btype       in self.ids  else  len( btype ) )
+    
+    
+    def  _holders ( self , reads , slno ) :
+    
+        '''
+        Returns the bit mask of reader slots that still hold the message with
+        reads counter value reads and serial number slno. A bit only counts if
+        its slot is active, and if the slot was opened before the message was
+        published. Otherwise, the bit was left by an earlier reader in the same
+        slot that closed without reading the message.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Bits of active slots
+        m = reads  &  self.h[ hdr.iact ]
+        
+        # Holders of the message
+        r = 0
+        
+        # Visit each set bit, lowest first, then clear it
+        while  m :
+            
+            # Reader slot index
+            k = ( m & -m ).bit_length( ) - 1
+            
+            # Message was published after the slot was opened
+            if  hdr.slnoafter( slno , self.s[ k*hdr.lenslot + hdr.sopen ] ) :
+                r |= 1 << k
+            
+            m &= m - 1
+        
+        return  r
+    
+    def  _popred ( self ) :
+        
+        '''
+        _popred is a predicate function that returns True when the instance
+        read position does not equal the queue tail position. Or when the read
+        serial number does not equal the write serial number. Either condition
+        signals a message that this instance hasn't read yet. Also returns True
+        if this instance was detached, so that it can find out. Or if the queue
+        grew, so that this instance can follow; see _follow.
+        
+        DO NOT USE THIS unless the lock has been acquired, first. Except as a
+        hint that is checked again under the lock, see _spin.
+        '''
+        
+        # Note, the logical or operator short-circuits. The serial
+        # numbers are only checked if the instance read position sits at
+        # the tail.
+        return  ( self.i    != self.h[ hdr.itail ]  or
+                  self.slno != self.h[ hdr.islno ]  or
+                  self.h[ hdr.idet ]  &  self.bit  or
+                  self.h[ hdr.igrow ]  and  self.bit  and  not self.leases )
+        
+    
+    def  _spin ( self , pred , tend , lock = None ) :
+    
+        '''
+        _spin( pred , tend , lock = None ) busy-polls predicate function pred
+        for up to self.spin seconds. Then it yields the processor and calls pred
+        again, up to self.yields times. Returns True as soon as pred does, or
+        False when it gives up. Gives up at time tend, as returned by time( ),
+        unless tend is None. pred runs without the lock, so True is only a hint
+        that must be checked again under the lock.
+        
+        If lock is given, then it is held by this process, and is released in
+        full while spinning. As Condition.wait does. It is held again on return.
+        lock is a header.countlock, which knows how many times it is held.
+        '''
+        
+        # Sleep at once
+        if  not ( self.spin  or  self.yields ) : return  False
+        
+        # Let other processes change the queue
+        if  lock is not None :
+            c = lock.depth
+            for  _ in range( c ) : lock.release( )
+        
+        try :
+            
+            # When to stop spinning
+            t   = time( )
+            end = t + self.spin
+            if  tend is not None : end = min( end , tend )
+            
+            # Busy-poll
+            while  t < end :
+                if  pred( ) : return  True
+                t = time( )
+            
+            # Give up the processor between polls
+            for  _ in range( self.yields ) :
+                if  tend is not None  and  time( ) >= tend : break
+                sched_yield( )
+                if  pred( ) : return  True
+            
+            return  False
+        
+        # Take the lock back
+        finally :
+            if  lock is not None :
+                for  _ in range( c ) : lock.acquire( )
+    
+    
+    def  _snapshot ( self ) :
+    
+        '''
+        Returns a consistent snapshot of the queue header counters that readers
+        need to check for new messages, without acquiring the lock. Returns the
+        tuple ( free bytes , tail , write serial number , head ,
+        head serial number ).
+        
+        Counters are published with a sequence lock. Any process that changes
+        them first increments the sequence number to an odd value, and then to
+        an even value once it is done, all while holding the lock. A snapshot is
+        consistent if the sequence number was the same even value before and
+        after the counters were read. Otherwise, it is taken again.
+        
+        That relies on the processor keeping loads and stores in program order,
+        as x86 processors do; see header.tso. Python has no memory barrier of
+        its own. So, on any other processor, the snapshot is taken with the lock
+        held, which orders it after every change that was published before.
+        '''
+        
+        if  not hdr.tso :
+            with  self.cond :
+                return  ( self.h[ hdr.ifree ] , self.h[ hdr.itail ] ,
+                          self.h[ hdr.islno ] , self.h[ hdr.ihead ] ,
+                          self.h[ hdr.ihsln ] )
         
-        # Read loop
         while  True :
+            
+            # Sequence number before reading. Odd if a change is in progress,
+            # in which case, let the process making the change get on with it.
+            s = self.h[ hdr.iseq ]
+            if  s & 1 : sched_yield( ) ; continue
+            
+            # Read counters
+            snap = ( self.h[ hdr.ifree ] , self.h[ hdr.itail ] ,
+                     self.h[ hdr.islno ] , self.h[ hdr.ihead ] ,
+                     self.h[ hdr.ihsln ] )
+            
+            # Nothing changed while reading
+            if  s == self.h[ hdr.iseq ] : return  snap
+    
+    
+    def  _next ( self ) :
+    
+        '''
+        _next looks for the next message in the queue relative to current read
+        position of this instance in attribute .i. If there is a message to read
+        then the function will yield a tuple containing a memoryview of the
+        message counters and the location of the first byte that is past them,
+        with the format ( memoryview , byte-location ). The instance read
+        position is placed to the first byte past the end of the message body.
         
-            # Scan queue body for next unread message
-            for  m in self._next( ) :
-                
-                # Unpack msg counters and index of 1st byte to follow them
-                ( h , b ) = m
-                
-                # Accumulate message header byte strings into this list, here
-                bstr = [ ]
-                
-                # At this point we have a message, but it might become screened
-                try :
-                    
-                    # Message header strings, and corresponding screening sets
-                    for  ( i , s )  in  zip( hdr.mcnti , self.scrns ) :
-                        
-                        # Read byte string from shared memory
-                        read , b = self._read( b , h[ i ] )
-                        
-                        # This message has a header string that is screened
-                        if  read in s : raise hdr.ScreenedMessage
-                        
-                        # Append newly read byte string to list
-                        bstr.append( read )
-                    
-                # We found a message on the queue, but it is screened
-                except  hdr.ScreenedMessage : ret = None
-                
-                # A genuine error has occurred, pass it on i.e. re-raise it
-                except  Exception as err :
-                    print( f'Unexpected {err=}, {type(err)=}' )
-                    raise
-                
-                # Message found! Read message body. Build return tuple 
-                # containing strings. Break for loop to skip its else statement.
-                else :
-                    bstr.append(  self._read( b , h[ hdr.ibody ] )[ 0 ]  )
-                    ret = tuple( b.decode( ) for b in bstr ) if decode else \
-                          tuple( bstr )
-                    break
-                
-                # Screened or not, we must decrement the read counter and alert
-                # anything else that is blocking on the condition variable, but
-                # only after freeing queue memory if this was the last read.
-                # Guarantee message memoryview is released.
-                finally :
-                    with  self.cond :
-                        h[ hdr.iread ] -= 1 ;
-                        if  not h[ hdr.iread ] : self._free( h )
-                        self.cond.notify_all( )
-                    h.release( )
+        Therefore, the function returns a generator that can be run in a loop.
+        Once there is no longer any message to read then the function terminates
+        and implicitly triggers a StopIteration exception. 
+        
+        The queue lock is not needed to look for the next message, see
+        _snapshot. A message that this instance has not yet read cannot be
+        freed, so it is safe to read without the lock, too. Except under the
+        overwrite and detach overflow policies. Then _done says whether the
+        message was freed while it was being read. If this instance finds that
+        the head of the queue has overtaken it, then it skips ahead to the head.
+        Raises Detached if this instance was detached.
+        '''
+        
+        # Generator loop
+        while  True :
             
-            # No message was found by _next iterator, for loop drops here
-            else : ret = None
+            # Was this instance detached? If not, then it is still alive.
+            self._detached( )
+            self.heartbeat( )
             
-            # Un-screened and un-read message was found. Return it in a tuple
-            # with format: message ( sender , type , body ). None evaluates as
-            # False.
-            if  ret : return ret
+            # Take a consistent snapshot of the queue header, without the lock
+            ( free , tail , slno , head , hslno ) = self._snapshot( )
             
-            # No unscreened message was found, but we may block on new messages
-            if  block :
-                
-                # How much time has passed since the call to pop( )?
-                if  timer : dt = timer - ( time( ) - tin )
-                else : dt = None
-                
-                # Block on the condition variable
-                with  self.cond :
+            # Messages that we have not read were freed. Skip to the head.
+            if  hdr.slnoafter( hslno , self.slno ) :
+                ( self.i , self.slno ) = ( head , hslno )
                 
-                  # The predicate returns true if there is a message before
-                  # timeout
-                  if  self.cond.wait_for( self._popred , dt ) : continue
+            # Queue is empty or there is no unread message. Compare _popred.
+            # Empty the message wake-up FIFO, if there is one. Look again if
+            # it was readable, in case a message was published meanwhile.
+            if  free == len( self.b )  or  \
+                self.i == tail  and  self.slno == slno :
+                if  hdr.iwmsg in self.wakefds  and  \
+                    self._clearfd( hdr.iwmsg ) : continue
+                return
             
-            # We only get here if no message was found and any blocking timed
-            # out
-            return  None
+            # Generate message details
+            yield  self._step( )
+    
+    
+    def  _step ( self ) :
+    
+        '''
+        _step steps over the message at the current read position of this
+        instance, without checking that there is one. Returns the tuple
+        ( memoryview , byte-location ) as described for _next. The instance
+        read position is placed to the first byte past the end of the message
+        body, and the read serial number is incremented.
+        '''
+        
+        # Increment instance read serial number, modulo max queue count val.
+        if  self.slno == hdr.maxqueuehead :
+            self.slno  = 0
+        else :
+            self.slno += 1
+        
+        # Cast memoryview of message's counters
+        i = self.i
+        hmsg = self.b[ i : i + self.sizemsg ].cast( hdr.fmtmsghead )
+        
+        # Locate the first byte past the message counters
+        b = ( self.i + self.sizemsg  )  %  len( self.b )
+        
+        # Set read position to first byte past the end of message body
+        self.i = ( b + hdr.msgbytes( hmsg ) )  %  len( self.b )
+
+        # If the read position is too close to the end of the queue body for a
+        # complete set of message counters to fit then it must skip those final
+        # bytes and go back to the start of the queue body.
+        if  len( self.b ) - self.i  <  self.sizemsg :
+
+            self.i = 0
+        
+        # Return message details
+        return  ( hmsg , b )
+    
+    
+    def  _strings ( self , h , b ) :
+    
+        '''
+        Read the sender and type byte strings of the message with counter
+        memoryview h, starting at byte b. Returns the tuple ( bstr , b ), where
+        bstr is a list of the byte strings [ sender , type ] and b is the first
+        byte of the message body. Raises ScreenedMessage if the sender or type
+        is found in the scrnsend or scrntype sets, or if the message is void or
+        expired.
+        Screening is done first, in place, so that nothing is copied out of a
+        screened message.
+        '''
+        
+        # Void messages are always screened. So are messages that were not
+        # published to this instance, because it did not subscribe to the type.
+        # And messages that expired.
+        if  h[ hdr.iflag ] & hdr.fvoid  or  not h[ hdr.iread ] & self.bit  or \
+            self.timed  and  h[ hdr.ittl ]  and  \
+            hdr.expired( h , monotonic_ns( ) ) :
+            raise hdr.ScreenedMessage
+        
+        # Screen message header strings. The type must also be subscribed to, in
+        # case two types have the same CRC-32; see _publish. Nothing to do, if
+        # this instance neither screens nor subscribes, which is usual.
+        e = b
+        
+        screens = zip( hdr.mcnti , self.scrns , ( None , self.subs ) )  \
+                  if  self.scrnsend  or  self.scrntype  or  self.subs  else  ( )
+        
+        for  ( i , s , w )  in  screens :
+            
+            # Interned byte string is looked up, not copied, and its hash is
+            # only computed once
+            if  h[ i ] >= hdr.finterned :
+                read = self._lookup( h[ i ] - hdr.finterned )
+                if  read in s  or  w  and  read not in w :
+                    raise hdr.ScreenedMessage
+            
+            # Compare byte string in shared memory
+            else :
+                if  s  and      self._screened( e , h[ i ] , s )  or  \
+                    w  and  not self._screened( e , h[ i ] , w ) :
+                    raise hdr.ScreenedMessage
+                e = ( e + h[ i ] )  %  len( self.b )
+        
+        # Accumulate message header byte strings into this list, here
+        bstr = [ ]
+        
+        for  i in hdr.mcnti :
+            
+            # Look up interned byte string
+            if  h[ i ] >= hdr.finterned :
+                bstr.append( self._lookup( h[ i ] - hdr.finterned ) )
+            
+            # Read byte string from shared memory
+            else :
+                read , b = self._read( b , h[ i ] )
+                bstr.append( read )
+        
+        # Reading moved b on to where the body starts, as screening moved e
+        return  bstr , b
+    
+    
+    def  _claim ( self , h , b ) :
+    
+        '''
+        As for _strings, but for a work message, whose serial number must be
+        self.slno. The strings are screened and read under the lock, so that no
+        other process can claim or free the message in the meantime. Then this
+        instance claims the message, by clearing every other reader's bit in
+        its read counter. Raises ScreenedMessage if the message is screened, or
+        if another process claimed it first, or if it was freed by the overflow
+        policy. The body can be read without the lock, after a claim, because
+        no other process will free the message until this instance is done.
+        '''
+        
+        with  self.cond :
+            
+            # Freed, so the bytes may belong to a new message
+            if  not hdr.slnoafter( self.slno , self.h[ hdr.ihsln ] ) :
+                raise hdr.ScreenedMessage
+            
+            # A claimed message has no bit set but the claimant's
+            bstr , e = self._strings( h , b )
+            h[ hdr.iread ] = self.bit
+        
+        return  bstr , e
+    
+    
+    def  _screened ( self , b , db , s ) :
+    
+        '''
+        Returns True if the db bytes of the queue body that start at byte b are
+        found in qset s. The bytes are compared in place with the elements of s
+        that have the same length, if there are any. Only bytes that wrap
+        around the end of the queue body are copied, first.
+        '''
+        
+        # No screened byte string has this length
+        if  db not in s.bylength( ) : return  False
+        
+        # Bytes wrap around to start of queue body
+        if  b + db  >  len( self.b ) : return  self._read( b , db )[ 0 ] in s
+        
+        # Compare without copying
+        with  self.b[ b : b + db ] as v :
+            return  any( v == e for e in s.bylength( )[ db ] )
+            
+
+    def  _read ( self , b , db ) :
+        
+        '''
+        Read db bytes from queue body, starting at byte b. If b is less than db
+        bytes from the end of the queue then the read wraps around to the start
+        of the queue body and returns a concatenated result.
+        
+        Returns tuple ( bstr , b ). bstr is the byte string that is read from
+        the queue body. b is the first byte past the end of the read, modulo
+        queue body size.
+        '''
+        
+        # Number of bytes readable before the end of the queue body
+        n = min( db , len( self.b ) - b )
+        
+        # Read out bytes
+        bstr = self.b[ b : b + n ].tobytes( )
+        
+        # Read must wrap around to start of queue body
+        if  n < db : bstr += self.b[ : db - n ].tobytes( )
+        
+        # Advance b past the read
+        b = ( b + db )  %  len( self.b )
+        
+        # Return the byte string
+        return  bstr , b
+
 
+    def  _decode ( self , bstr , flags ) :
+        
+        '''
+        Returns tuple ( sender , type , body ) for list bstr of the sender, type
+        and body byte strings of a message with the given flags. The strings
+        are decoded to str, and the body by its codec; see pysyncq.codec.
+        '''
+        
+        return  ( bstr[ 0 ].decode( ) , bstr[ 1 ].decode( ) ,
+                  cdc.decode( flags , bstr[ 2 ] ) )
+    
+    
+    def  _view ( self , b , db , readonly = True ) :
+        
+        '''
+        Like _read, but db bytes from queue body are returned as a read-only
+        memoryview into the queue body, starting at byte b, rather than as a
+        copy. If the bytes wrap around to the start of the queue body then a
+        tuple of two memoryviews is returned, in order. If readonly is False
+        then the memoryviews are writable.
+        '''
+        
+        # Number of bytes readable before the end of the queue body
+        n = min( db , len( self.b ) - b )
+        
+        # Contiguous bytes, or bytes that wrap around to start of queue body
+        v = self.b[ b : b + n ]  if  n == db  else \
+            ( self.b[ b : ] , self.b[ : db - n ] )
+        
+        # Writable memoryviews
+        if  not readonly : return  v
+        
+        # Read-only memoryviews
+        return  v.toreadonly( )  if  n == db  else \
+                tuple( u.toreadonly( ) for u in v )
+    
+    
+    def  _write ( self , i , bstr ) :
+        
+        '''
+        Write byte string bstr into the queue body, starting at byte i. If i is
+        less than len( bstr ) bytes from the end of the queue then the write
+        wraps around to the start of the queue body, as in a circular buffer.
+        
+        Returns the first byte past the end of the write, modulo queue body
+        size. DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Bytes remaining prior to the end of the queue body
+        r = len( self.b ) - i
+        
+        # The string will fit in a contiguous block
+        if  r >= len( bstr ) :
+        
+            # Slice assign the entire byte string
+            self.b[ i : i + len( bstr ) ] = bstr
+            
+            # Advance write position to next free byte
+            return  ( i + len( bstr ) )  %  len( self.b )
+            
+        # The queue is a circular buffer. Bisect the string between the end of
+        # the queue body and the start. Slice assign what we can to the end of
+        # the queue body.
+        self.b[ i : ] = bstr[ : r ]
+        
+        # Number of bytes from string that are still unwritten
+        r = len( bstr ) - r
+        
+        # Cycle to the start of the queue body and write remainder
+        self.b[ : r ] = bstr[ -r : ]
+        
+        # Write position at next free byte
+        return  r
+    
+    
+    def  _reserve ( self , btype , nbody , pid = 0 , ttl = 0 ) :
+        
+        '''
+        Reserve bytes at the reservation tail of the queue for a message with
+        type btype and an nbody byte body. The caller must already have checked
+        that _msgsize( btype , nbody ) bytes are free. The sender and type
+        strings are interned, if possible; see _intern. Writes the message
+        counters, with reads set to
+        hdr.reserved and flags set to pid, and the sender and type strings. The
+        body is left for the caller to write. pid names the process that owns
+        the reservation, so that it can be voided by reap( ) if the process
+        ends. It is left as zero if the reservation is committed before the
+        lock is released. ttl is the message's time to live in milliseconds,
+        or zero if it never expires; see _ttl.
+        
+        Returns tuple ( i , b , n , r ). i is the first byte of the message. b
+        is the first byte of the message body. n is the total number of bytes in
+        the message, including counters. r is the number of bytes skipped at
+        the end of the queue body, following the message.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Get position of queue's reservation tail, where the message starts
+        i = self.h[ hdr.ires ]
+        
+        # Counters and byte strings for the sender and type. Then the total
+        # number of bytes in the message.
+        ( cs , bsend ) = self._intern( self.sender )
+        ( ct , btype ) = self._intern( btype )
+        n = self.sizemsg + len( bsend ) + len( btype ) + nbody
+        
+        # Load message counters. Packing them straight into the queue body
+        # avoids casting a new memoryview. The time that the message is
+        # published is left to _publish.
+        hdr.msghead.pack_into( self.b , i , hdr.reserved , pid , cs , ct ,
+                               nbody )
+        if  self.timed :
+            hdr.msgttl.pack_into( self.b , i + hdr.sizemsghead , ttl , 0 , 0 )
+        
+        # Sender and type byte strings, following the message counters
+        b = self._write( i + self.sizemsg , bsend )
+        b = self._write( b , btype )
+        
+        # Queue header counters are changing, odd sequence number. Even again
+        # once done, even if something here raises.
+        self.h[ hdr.iseq ] += 1
+        
+        try :
+            
+            # Decrement length of message from queue's free space counter
+            self.h[ hdr.ifree ] -= n
+            
+            # Find next byte past new message, the new reservation tail position
+            self.h[ hdr.ires ] = ( i + n )  %  len( self.b )
+            
+            # Message counters require contiguous bytes. But the new
+            # reservation tail is too close to the end of the queue body for
+            # that. We must position it at the start of the queue body and
+            # discard the bytes at the end.
+            if  ( r := len( self.b ) - self.h[ hdr.ires ] ) < self.sizemsg :
+                self.h[ hdr.ires ]  = 0
+                self.h[ hdr.ifree ] -= r
+            else :
+                r = 0
+            
+            # Count the new reservation
+            self.h[ hdr.inres ] += 1
+        
+        # Queue header counters are consistent again, even sequence number
+        finally :
+            self.h[ hdr.iseq ] += 1
+        
+        return  i , b , n , r
+    
+    
+    def  _put ( self , btype , parts , flags = 0 , ttl = 0 ) :
+        
+        '''
+        Write a message with type btype to the reservation tail of the queue,
+        and commit it with the given message flags and time to live ttl, as for
+        _reserve. The body is the byte strings in list parts, one after the
+        other, as returned by a codec's encode method. The caller must already
+        have checked that _msgsize( btype , nbytes ) bytes are free, for the
+        total of nbytes in parts. The message is not published; see _publish.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Reserve space and write the message header
+        ( i , b , _ , _ ) = self._reserve( btype ,
+                                           sum( len( p ) for p in parts ) ,
+                                           ttl = ttl )
+        
+        # Write the message body
+        for  p in parts : b = self._write( b , p )
+        
+        # The message is ready to be published
+        self._ready( i , flags )
+    
+    
+    def  _send ( self , btype , parts , flags = 0 , ttl = 0 ) :
+        
+        '''
+        Write a message at the tail of the queue and publish it at once, as
+        _put and then _publish would, in a single pass. Only if there are no
+        reservations waiting to be published, and no reader subscribes to
+        certain types. That is the common case, where append needs nothing
+        else. Returns True if the message was sent, or else False, and nothing
+        was written. Arguments are as for _put, and the caller must likewise
+        have checked that there is room.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Active reader slots, which all read the message
+        act = self.h[ hdr.iact ]
+        if  self.h[ hdr.inres ]  or  self.h[ hdr.isub ]  &  act : return  False
+        
+        # The tail is the reservation tail, where the message starts
+        i = self.h[ hdr.itail ]
+        
+        # Counters and byte strings for the sender and type
+        ( cs , bsend ) = self._intern( self.sender )
+        ( ct , btype ) = self._intern( btype )
+        nbody = sum( len( p ) for p in parts )
+        
+        # Message counters, with reads and time stamp already set
+        hdr.msghead.pack_into( self.b , i , act , flags , cs , ct , nbody )
+        if  self.timed :
+            now = monotonic_ns( )
+            hdr.msgttl.pack_into( self.b , i + hdr.sizemsghead , ttl ,
+                                  now & hdr.maxmsghead ,
+                                  now >> hdr.nbytemsghead * 8 )
+        
+        # Sender and type byte strings, and then the body
+        b = self._write( i + self.sizemsg , bsend + btype )
+        for  p in parts : b = self._write( b , p )
+        
+        # Queue header counters are changing, odd sequence number. Even again
+        # once done, even if something here raises.
+        self.h[ hdr.iseq ] += 1
+        
+        try :
+            
+            # Take up the bytes, and move both tails past the message. Skip
+            # bytes at the end of the queue body, as _reserve does.
+            self.h[ hdr.ifree ] -= b - i  if  b > i  else  len( self.b ) - i + b
+            if  ( r := len( self.b ) - b ) < self.sizemsg :
+                self.h[ hdr.ifree ] -= r
+                b = 0
+            self.h[ hdr.ires ] = self.h[ hdr.itail ] = b
+            
+            # Increment the message serial number, modulo max value of counter
+            if  self.h[ hdr.islno ] == hdr.maxqueuehead :
+                self.h[ hdr.islno ]  = 0
+            else :
+                self.h[ hdr.islno ] += 1
+        
+        # Queue header counters are consistent again, even sequence number
+        finally :
+            self.h[ hdr.iseq ] += 1
+        
+        # Wake up readers, as _publish does
+        self.cond.notify_all( )
+        self._wake( hdr.iwmsg , act )
+        if  self.group is not None : self.group._notify( )
+        
+        return  True
+    
+    
+    def  _fill ( self , body , parts ) :
+        
+        '''
+        Copy the byte strings in list parts, one after the other, into the
+        reserved message body given by body, a writable memoryview or a tuple of
+        two, as returned by _view. Then releases body. Does not need the lock,
+        since no other process writes to a reservation.
+        '''
+        
+        # Views of the body, the one being written, and the next byte in it
+        V = body  if  type( body ) is tuple  else  ( body , )
+        k = j = 0
+        
+        try :
+            
+            for  p in parts :
+                
+                # Copy as much as fits in the current view. Move on to the
+                # next view once it is full.
+                p = memoryview( p ).cast( 'B' )
+                while  len( p ) :
+                    m = min( len( p ) , len( V[ k ] ) - j )
+                    V[ k ][ j : j + m ] = p[ : m ]
+                    p  = p[ m : ]
+                    j += m
+                    if  j == len( V[ k ] ) : ( k , j ) = ( k + 1 , 0 )
+        
+        # Views of shared memory must be released, or it can't be closed
+        finally :
+            for  v in V : v.release( )
+    
+    
+    def  _spill ( self , parts ) :
+        
+        '''
+        Returns tuple ( parts , flags ) for the message body given by list
+        parts, as returned by a codec's encode method. If the body has more than
+        self.spill bytes, then it is written into a new block of shared memory.
+        Then the returned parts hold a descriptor of the block, and flags is
+        hdr.fspill. Otherwise, parts is returned as it is, with zero flags.
+        Does not need the lock.
+        '''
+        
+        # Small enough for the queue
+        if  self.spill is None : return  parts , 0
+        n = sum( len( p ) for p in parts )
+        if  n <= self.spill : return  parts , 0
+        
+        # Copy the body into a new block
+        shm = hdr.shmopen( size = n )
+        i = 0
+        for  p in parts :
+            shm.buf[ i : i + len( p ) ] = p
+            i += len( p )
+        
+        # Descriptor
+        d = hdr.spillhead.pack( n )  +  shm.name.encode( )
+        shm.close( )
+        
+        return  [ d ] , hdr.fspill
+    
+    
+    def  _work ( self , btype ) :
+        
+        '''
+        Returns hdr.fwork if a message of type btype, as bytes, is a work
+        message, according to self.work. Or else zero.
+        '''
+        
+        if  self.work is True : return  hdr.fwork
+        
+        return  hdr.fwork  if  self.work  and  btype in self.work  else  0
+    
+    
+    def  _ttl ( self , ttl = None ) :
+        
+        '''
+        Returns the message header counter for time to live ttl, in seconds.
+        That is ttl in milliseconds, rounded up, or zero if ttl is None or zero
+        and the message never expires. If ttl is None then self.ttl is used.
+        Raises ValueError if ttl is negative or too long, or if the queue was
+        made without a time to live, so that its messages have no room for one.
+        '''
+        
+        if  ttl is None : ttl = self.ttl
+        if  not ttl : return  0
+        
+        if  not self.timed :
+            raise  ValueError( f'Queue {self.name} was made without a time to '
+                               f'live, {ttl=}' )
+        
+        ms = ceil( ttl * 1000 )
+        
+        if  not 0 < ms <= hdr.maxmsghead :
+            raise  ValueError( f'ttl must be from 0 to '
+                               f'{ hdr.maxmsghead / 1000 } seconds, {ttl=}' )
+        
+        return  ms
+    
+    
+    def  _spillname ( self , d ) :
+        
+        '''
+        Returns the name of the shared memory block of a spilled message, given
+        its descriptor d as a bytes-like object.
+        '''
+        
+        return  bytes( d[ hdr.spillhead.size : ] ).decode( )
+    
+    
+    def  _bodysize ( self , h , b ) :
+        
+        '''
+        Returns the number of bytes in the body of the message with counter
+        memoryview h, whose strings start at byte b. That is the size of a
+        spilled body in its own block, from the descriptor, rather than the
+        size of the descriptor in the queue.
+        '''
+        
+        if  not h[ hdr.iflag ] & hdr.fspill : return  h[ hdr.ibody ]
+        
+        # The descriptor follows the sender and type strings
+        b = ( b + hdr.msgbytes( h ) - h[ hdr.ibody ] )  %  len( self.b )
+        
+        ( d , _ ) = self._read( b , hdr.spillhead.size )
+        
+        return  hdr.spillhead.unpack( d )[ 0 ]
+    
+    
+    def  _fetch ( self , d , copy = True ) :
+        
+        '''
+        Returns the body of a spilled message, given its descriptor d. If copy
+        is True, then the body is copied into a byte string. Otherwise, returns
+        tuple ( view , shm ), where view is a read-only memoryview of the body
+        in SharedMemory block shm. The caller must release the view and close
+        shm when done. If the block was already unlinked, because the message
+        was freed by the overflow policy, then the body is empty.
+        '''
+        
+        ( n , ) = hdr.spillhead.unpack_from( d )
+        
+        try :
+            shm = hdr.shmopen( self._spillname( d ) )
+        except  FileNotFoundError :
+            return  b''  if  copy  else  ( memoryview( b'' ) , None )
+        
+        if  not copy : return  shm.buf[ : n ].toreadonly( ) , shm
+        
+        body = shm.buf[ : n ].tobytes( )
+        shm.close( )
+        
+        return  body
+    
+    
+    def  _ready ( self , i , flags = 0 ) :
+        
+        '''
+        Commit the reserved message that starts at byte i, with the given
+        message flags, but do not publish it; see _publish.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        hdr.msgword.pack_into( self.b , i + hdr.iflag * hdr.nbytemsghead ,
+                               flags )
+        hdr.msgword.pack_into( self.b , i , hdr.committed )
+    
+    
+    def  _commit ( self , i , flags = 0 ) :
+        
+        '''
+        Commit the reserved message that starts at byte i, with the given
+        message flags, and publish all messages that are ready. A queue that
+        may grow can do so again once the last reservation is published. Then
+        writers that wait for space are woken, to try.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        self._ready( i , flags )
+        self._publish( )
+        
+        if  self.grow  and  not self.h[ hdr.inres ] :
+            self.space.notify_all( )
+            self._wake( hdr.iwspc )
+    
+    
+    def  _withdraw ( self , i , n , r ) :
+        
+        '''
+        Withdraw the reserved message that starts at byte i. n and r are as
+        given to and returned by _reserve. This can only be done for the most
+        recent reservation. Returns True if the message was withdrawn, and its
+        bytes freed. Otherwise, returns False and the queue is unchanged.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # A later reservation follows this one
+        if  self.h[ hdr.ires ] != ( 0  if  r  else  ( i + n ) % len( self.b ) ):
+            return  False
+        
+        # Roll back the reservation tail and the free byte count, between odd
+        # and even sequence numbers. Even again, even if something raises.
+        self.h[ hdr.iseq  ] += 1
+        
+        try :
+            self.h[ hdr.ires  ]  = i
+            self.h[ hdr.ifree ] += n + r
+            self.h[ hdr.inres ] -= 1
+        finally :
+            self.h[ hdr.iseq  ] += 1
+        
+        # Wake up writers that are waiting for space
+        self.space.notify_all( )
+        self._wake( hdr.iwspc )
+        
+        return  True
+    
+    
+    def  _publish ( self ) :
+        
+        '''
+        Publish committed messages, in the order that they were reserved. Each
+        one that sits at the tail of the queue has its reads counter set to the
+        bit mask of active reader slots. Then the tail advances past it and the
+        message serial number is incremented. Stops at the first message that
+        is still reserved. Wakes up processes waiting on cond for new messages,
+        but only if something was published.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Number of reservations before publishing
+        n = self.h[ hdr.inres ]
+        
+        # Active reader slots, and those that subscribe to certain types. The
+        # table that maps the CRC-32 of each subscribed type to the bit mask of
+        # its subscribers is only built if there are any.
+        act = self.h[ hdr.iact ]
+        sub = self.h[ hdr.isub ]  &  act
+        if  sub  and  n : table = self._subscribers( sub )
+        
+        # Bit mask of the reader slots that get a new message
+        woken = 0
+        
+        # Time stamp of published messages, split across two counters. If they
+        # have any.
+        if  self.timed :
+            now = monotonic_ns( )
+            now = ( now & hdr.maxmsghead , now >> hdr.nbytemsghead * 8 )
+        
+        # Queue header counters are changing, odd sequence number. Even again
+        # once done, even if something here raises.
+        self.h[ hdr.iseq ] += 1
+        
+        try :
+            
+            # Reservations remain unpublished
+            while  self.h[ hdr.inres ] :
+                
+                # Position of queue's tail, and the counters of the message
+                # there
+                i = self.h[ hdr.itail ]
+                h = hdr.msghead.unpack_from( self.b , i )
+                
+                # Message is still being written. Later messages must wait for
+                # it.
+                if  h[ hdr.iread ] == hdr.reserved : break
+                
+                # Every registered process must read the message, if it
+                # subscribes to the message type. One bit per process, in the
+                # bit mask of active reader slots. Void messages are skipped by
+                # every reader.
+                if  not sub  or  h[ hdr.iflag ] & hdr.fvoid :
+                    reads = act
+                else :
+                    reads = act & ~sub  |  \
+                            table.get( self._typecrc( i , h ) , 0 )
+                
+                hdr.msgword.pack_into( self.b , i , reads )
+                if  self.timed :
+                    hdr.msgstamp.pack_into( self.b ,
+                                            i + hdr.itime * hdr.nbytemsghead ,
+                                            *now )
+                woken |= reads
+                
+                # Find next byte past the message, the new tail position
+                self.h[ hdr.itail ] = ( i + self.sizemsg +
+                                        hdr.msgbytes( h ) )  %  len( self.b )
+                
+                # Skip bytes at the end of the queue body, as _reserve did
+                if  len( self.b ) - self.h[ hdr.itail ] < self.sizemsg :
+                    self.h[ hdr.itail ] = 0
+                
+                # One less reservation
+                self.h[ hdr.inres ] -= 1
+                
+                # Increment the message serial number, modulo max value of
+                # counter
+                if  self.h[ hdr.islno ] == hdr.maxqueuehead :
+                    self.h[ hdr.islno ]  = 0
+                else :
+                    self.h[ hdr.islno ] += 1
+        
+        # Queue header counters are consistent again, even sequence number
+        finally :
+            self.h[ hdr.iseq ] += 1
+        
+        # Wake up readers if there are new messages. Including any that wait on
+        # this queue's group.
+        if  n != self.h[ hdr.inres ] :
+            self.cond.notify_all( )
+            self._wake( hdr.iwmsg , woken )
+            if  self.group is not None : self.group._notify( )
+    
+    
+    def  _typecrc ( self , i , h ) :
+    
+        '''
+        Returns the CRC-32 of the type byte string of the message at byte i of
+        the queue body, with counters h. The type is not copied out of the queue
+        body, unless it is interned.
+        '''
+        
+        # Interned type
+        if  h[ hdr.itype ] >= hdr.finterned :
+            return  crc32( self._lookup( h[ hdr.itype ] - hdr.finterned ) )
+        
+        # First byte of the type string, past the sender string
+        b = ( i  +  self.sizemsg  +  
+              ( h[ hdr.isend ]  if  h[ hdr.isend ] < hdr.finterned  else  0 ) )\
+            %  len( self.b )
+        
+        # Bytes of the type before the end of the queue body, and the rest
+        n = min( h[ hdr.itype ] , len( self.b ) - b )
+        c = crc32( self.b[ b : b + n ] )
+        if  n < h[ hdr.itype ] : c = crc32( self.b[ : h[ hdr.itype ] - n ] , c )
+        
+        return  c
+    
+    
+    def  _subscribers ( self , sub ) :
+    
+        '''
+        Returns a dict that maps the CRC-32 of each message type that the
+        reader slots in bit mask sub subscribe to, to the bit mask of the slots
+        that subscribe to it.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        table = { }
+        
+        # Visit each set bit, lowest first, then clear it
+        while  sub :
+            
+            # Reader slot index, and its counters
+            k = ( sub & -sub ).bit_length( ) - 1
+            s = k * hdr.lenslot
+            
+            for  c in self.s[ s + hdr.ssubs :
+                              s + hdr.ssubs + self.s[ s + hdr.snsub ] ] :
+                table[ c ] = table.get( c , 0 )  |  1 << k
+            
+            sub &= sub - 1
+        
+        return  table
+    
+    
+    def  _subscribe ( self ) :
+    
+        '''
+        Writes the message types that this instance subscribes to into its
+        reader slot, as CRC-32s, and sets or clears the slot's bit in the
+        subscribed slots mask. No bit means that the slot gets every message.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Reader slot counters of this instance
+        s = self.slot * hdr.lenslot
+        
+        self.s[ s + hdr.snsub ] = len( self.subs )
+        
+        for  ( j , btype )  in  enumerate( self.subs ) :
+            self.s[ s + hdr.ssubs + j ] = crc32( btype )
+        
+        if  self.subs :
+            self.h[ hdr.isub ] |=  self.bit
+        else :
+            self.h[ hdr.isub ] &= ~self.bit
+    
+    
+    def  _lag ( self , k ) :
+    
+        '''
+        Returns the tuple ( messages , bytes ) by which the reader in slot k
+        lags behind the tail of the queue, as of the last read that it
+        committed.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Slot counters
+        k *= hdr.lenslot
+        
+        # Published messages that the reader has not committed
+        n = hdr.slnodiff( self.h[ hdr.islno ] , self.s[ k + hdr.sslno ] )
+        
+        # Bytes from read position to tail. But these are the same if all
+        # published bytes are unread.
+        nbytes = ( self.h[ hdr.itail ] - self.s[ k + hdr.spos ] )  %  \
+                 len( self.b )
+        if  n  and  not nbytes : nbytes = len( self.b ) - self.h[ hdr.ifree ]
+        
+        return  n , nbytes
+    
+    
+    def  _evict ( self , m ) :
+    
+        '''
+        Applies the overflow policy to the reader slots in bit mask m, which
+        hold the message at the head of the queue. Returns True if the message
+        can now be freed. Under the overwrite policy, each reader misses the
+        message, which is counted in its slot. Under the detach policy, every
+        reader is detached if they all lag too far behind, see maxlag and
+        maxlagbytes. Otherwise, no reader is detached. Under any other policy,
+        readers keep their messages.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Reader slot indices
+        K = [ k for k in range( self.slots ) if m & ( 1 << k ) ]
+        
+        if  self.overflow == 'overwrite' :
+            
+            for  k in K : self.s[ k*hdr.lenslot + hdr.smiss ] += 1
+            
+            return  True
+        
+        if  self.overflow != 'detach' : return  False
+        
+        # Check every reader. With no limits, any lag is too much.
+        for  k in K :
+            
+            ( n , nbytes ) = self._lag( k )
+            
+            if  not ( self.maxlag is None  and  self.maxlagbytes is None  or
+                      self.maxlag is not None  and  n > self.maxlag  or
+                      self.maxlagbytes is not None  and
+                          nbytes > self.maxlagbytes ) :
+                return  False
+        
+        # Detach readers. Their slots are inactive, so they no longer hold any
+        # messages. But the slots are not free until each reader finds out.
+        # They still count as processes that use the queue.
+        self.h[ hdr.iact ] &= ~m
+        self.h[ hdr.idet ] |=  m
+        
+        # Waiting readers must find out
+        self._wake( hdr.iwmsg , m )
+        
+        return  True
+    
+    
+    def  _drop ( self , *types ) :
+    
+        '''
+        _drop( btype1 , btype2 , ... ) counts dropped messages, one of each
+        given type, in the slot of every active reader that would have been
+        published the message; see _publish. Because they all missed it.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Active reader slots, and those that subscribe to certain types
+        act = self.h[ hdr.iact ]
+        sub = self.h[ hdr.isub ]  &  act
+        table = self._subscribers( sub )  if  sub  else  { }
+        
+        for  btype in types :
+            
+            # Readers of the message
+            m = act & ~sub  |  table.get( crc32( btype ) , 0 )
+            
+            # Visit each set bit, lowest first, then clear it
+            while  m :
+                k = ( m & -m ).bit_length( ) - 1
+                self.s[ k*hdr.lenslot + hdr.smiss ] += 1
+                m &= m - 1
+    
+    
+    def  _room ( self , n , block , timer ) :
+    
+        '''
+        Returns True if there are at least n free bytes in the queue. If not,
+        then processes that ended without closing are reaped, see _reap. Then
+        the queue grows, if it may; see _grow. Then the overflow policy is
+        applied, which may free messages. Under the
+        drop policy, False is returned without waiting. Otherwise, if block is
+        True then _room waits up to timer seconds for free bytes, as for append,
+        and returns False on timeout.
+        
+        While it waits, the queue grows as soon as it can.
+        
+        DO NOT USE THIS unless the lock has been acquired, first. And the
+        memoryviews are the newest generation's; see _newest.
+        '''
+        
+        # Nothing more to do, as is usual
+        if  self.h[ hdr.ifree ] >= n : return  True
+        
+        # Predicate function returns True when there is enough space in the
+        # queue for n bytes
+        free = lambda : self.h[ hdr.ifree ] >= n
+        
+        # Likewise, but frees messages first if the policy allows it. Move on
+        # to the newest generation, if any were made while the lock was
+        # released.
+        def  evict ( ) :
+            
+            if  ( g := self._root( )[ hdr.igrow ] ) : self._install( g )
+            
+            # Growing was refused while there were reservations
+            if  self.grow  and  not free( ) : self._grow( n )
+            
+            # Expired messages are freed under any policy
+            if  not free( ) : self._free( n )
+            
+            return  free( )
+        
+        # There is space. Or there is after reaping, growing, or applying the
+        # overflow policy.
+        room = free( )  or  self._reap( )  and  free( )  or  \
+               self.grow  and  self._grow( n )  or  evict( )
+        
+        # Or else wait for space, unless dropping. Poll for it for a little
+        # while, first, without the lock.
+        if  not room  and  self.overflow != 'drop'  and  block :
+            tend = None  if  timer is None  else  time( ) + timer
+            room = self._spin( free , tend , self.lock )  and  evict( )  or  \
+                   self.space.wait_for( evict ,
+                                        tend  and  max( tend - time( ) , 0 ) )
+        
+        # No room. The free space wake-up FIFO is readable again once memory is
+        # freed, which can't happen while we hold the lock.
+        if  not room  and  hdr.iwspc in self.wakefds :
+            self._clearfd( hdr.iwspc )
+        
+        return  room
+    
+    
+    def  _reap ( self , timeout = None ) :
+    
+        '''
+        Frees the reader slot of every process that has ended without calling
+        close( ), and decrements the process counter for each. If timeout is
+        not None, then every process that is alive but has been idle for more
+        than timeout seconds is detached, as by the detach overflow policy. The
+        slot of this instance is left alone. Reservations that were left by a
+        process that ended are aborted, and published as void messages.
+        Finally, messages that no process holds any longer are freed. Returns
+        the number of processes that were reaped.
+        
+        DO NOT USE THIS unless the lock has been acquired, first. And the
+        memoryviews are the newest generation's; see _newest.
+        '''
+        
+        # Time now, in nanoseconds, and the idle limit
+        now = monotonic_ns( )
+        if  timeout is not None : timeout *= 1e9
+        
+        # Count freed reader slots
+        n = 0
+        
+        # Active and detached slots both belong to a process
+        for  k in range( self.slots ) :
+            
+            # Slot bit, and slot counters
+            bit = 1 << k
+            s = k * hdr.lenslot
+            
+            # Not in use, or in use by this instance
+            if  not ( self.h[ hdr.iact ] | self.h[ hdr.idet ] ) & bit  or  \
+                k == self.slot : continue
+            
+            # Process is alive
+            if  hdr.pidalive( self.s[ s + hdr.spid ] ) :
+                
+                # But it is registered, and has been idle for too long. Detach.
+                if  timeout is not None  and  self.h[ hdr.iact ] & bit  and  \
+                    now - self.s[ s + hdr.stime ] > timeout :
+                    
+                    self.h[ hdr.iact ] &= ~bit
+                    self.h[ hdr.idet ] |=  bit
+                    self._wake( hdr.iwmsg , bit )
+                    n += 1
+                
+                continue
+            
+            # Free the slot, as if the process had closed
+            self.h[ hdr.iact ] &= ~bit
+            self.h[ hdr.idet ] &= ~bit
+            self.h[ hdr.isub ] &= ~bit
+            self.s[ s + hdr.spid ] = 0
+            
+            # And remove its wake-up FIFOs
+            for  i in ( hdr.iwmsg , hdr.iwspc ) :
+                if  self.h[ i ] & bit :
+                    self.h[ i ] &= ~bit
+                    try :
+                        os.unlink( self._fifopath( i , k ) )
+                    except  OSError :
+                        pass
+            if  self.h[ hdr.iproc ] : self.h[ hdr.iproc ] -= 1
+            if  self.gen  and  self._root( )[ hdr.iproc ] :
+                self._root( )[ hdr.iproc ] -= 1
+            n += 1
+        
+        # Visit each unpublished reservation, starting from the tail
+        i = self.h[ hdr.itail ]
+        
+        for  _ in range( self.h[ hdr.inres ] ) :
+            
+            h = hdr.msghead.unpack_from( self.b , i )
+            
+            # Reserved by a process that has ended. Void it.
+            if  h[ hdr.iread ] == hdr.reserved  and  h[ hdr.iflag ]  and  \
+                not hdr.pidalive( h[ hdr.iflag ] ) :
+                
+                self._ready( i , hdr.fvoid )
+            
+            # Next message, skipping bytes at the end of the queue body
+            i = ( i + self.sizemsg + hdr.msgbytes( h ) )  %  len( self.b )
+            if  len( self.b ) - i < self.sizemsg : i = 0
+        
+        # Publish void messages, and free whatever dead processes held
+        self._publish( )
+        self._free( )
+        
+        return  n
+    
+    
+    def  _free ( self , need = 0 ) :
+        
+        '''
+        Free queue memory that stores messages at the head of the queue that no
+        reader holds any longer; see _holders. The head advances past each
+        such message in turn, and stops at the first message that still has
+        reads remaining, unless it expired.
+        Messages can be released out of order e.g. by a Lease. So the message
+        at the head may keep the head in place after later messages have been
+        read by every process. Wakes up processes waiting on space for free
+        bytes, but only if the head advanced.
+        
+        If there are fewer than need free bytes, then the overflow policy is
+        applied to the readers that hold the message at the head; see _evict.
+        This carries on until there are need free bytes, or the policy keeps
+        the message.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Queue header counters and body size, looked up once. This runs on
+        # every read.
+        qh   = self.h
+        size = len( self.b )
+        
+        # Position of head before freeing
+        i = qh[ hdr.ihead ]
+        
+        # Queue header counters are changing, odd sequence number. Even again
+        # once done, even if something here raises.
+        qh[ hdr.iseq ] += 1
+        
+        try :
+            
+            # Free messages until none is published. Reservations are never
+            # freed.
+            while  qh[ hdr.ihsln ] != qh[ hdr.islno ] :
+            
+                # Message counters of the message at the head of the queue
+                h = self.msghead.unpack_from( self.b , qh[ hdr.ihead ] )
+                
+                # Serial number of the message
+                slno = ( qh[ hdr.ihsln ] + 1 )  %  ( hdr.maxqueuehead + 1 )
+                
+                # Message still has reads remaining. Stop here, unless it
+                # expired, or we need more room and the overflow policy lets us
+                # free it.
+                if  ( m := self._holders( h[ hdr.iread ] , slno ) )  and  \
+                    not ( self.timed  and  h[ hdr.ittl ]  and
+                          hdr.expired( h , monotonic_ns( ) ) )  and  \
+                    not ( qh[ hdr.ifree ] < need  and  self._evict( m ) ) :
+                    break
+                
+                # The body of a spilled message goes with it
+                if  h[ hdr.iflag ]  &  hdr.fspill :
+                    b = ( qh[ hdr.ihead ] + self.sizemsg +
+                          hdr.msgbytes( h ) - h[ hdr.ibody ] )  %  size
+                    hdr.shmunlink( self._spillname( self._read( b ,
+                                                       h[ hdr.ibody ] )[ 0 ] ) )
+                
+                # Serial number of the last freed message
+                qh[ hdr.ihsln ] = slno
+                
+                # Bytes in message, including counters and all byte strings
+                nmsg = self.sizemsg  +  hdr.msgbytes( h )
+                
+                # Advance head of queue, modulo size of queue body
+                qh[ hdr.ihead ] = ( qh[ hdr.ihead ] + nmsg )  %  size
+                
+                # Free up those bytes
+                qh[ hdr.ifree ] += nmsg
+                
+                # Head is now too close to end of queue body for a full set of
+                # message counters. Wrap around back to the start of queue body
+                # and free the skipped bytes.
+                gap = size - qh[ hdr.ihead ]
+                if  gap < self.sizemsg :
+                    
+                    qh[ hdr.ihead ]  = 0
+                    qh[ hdr.ifree ] += gap
+        
+        # Queue header counters are consistent again, even sequence number
+        finally :
+            qh[ hdr.iseq ] += 1
+        
+        # Wake up writers if bytes were freed. Just in case the head came full
+        # circle, also check whether the queue is now empty.
+        if  i != qh[ hdr.ihead ]  or  qh[ hdr.ifree ] == size :
+            self.space.notify_all( )
+            self._wake( hdr.iwspc )
+    
+    
+    def  _freed ( self , slno ) :
+    
+        '''
+        Returns True if the message with serial number slno was freed, by the
+        overflow policy or because it expired, so that its bytes may have been
+        overwritten. Otherwise, whatever this instance copied out of the
+        message before the call is intact. Needs no lock; see _snapshot.
+        '''
+        
+        return  not hdr.slnoafter( slno , self._snapshot( )[ 4 ] )
+    
+    
+    def  _done ( self , slno , *H ) :
+    
+        '''
+        _done( slno , h1 , h2 , ... ) signals that this instance is done with
+        the messages whose counter memoryviews are given. These are consecutive
+        messages, and the first has serial number slno. This instance's bit is
+        cleared from their read counters, and the queue memory of depleted
+        messages is freed, which alerts any writer that is waiting for space.
+        The reader slot gets the current read position and serial number. 
+        Finally, the memoryviews are released.
+        
+        Returns the number of messages, from the first, that were freed by
+        the overflow policy before this instance was done with them. Their
+        bytes may have been overwritten while they were read, so they must be
+        discarded. Normally, this is zero. But if this instance was detached
+        then all messages are discarded.
+        '''
+        
+        # Get the queue's lock
+        with  self.cond :
+            
+            # Detached. None of the messages belong to us anymore.
+            if  not self.h[ hdr.iact ]  &  self.bit :
+                
+                n = len( H )
+            
+            else :
+                
+                # Number of messages that were freed, up to the head
+                n = 0  if  hdr.slnoafter( slno , self.h[ hdr.ihsln ] )  else \
+                    min( len( H ) ,
+                         hdr.slnodiff( self.h[ hdr.ihsln ] , slno ) + 1 )
+                
+                # Clear read bits of the rest. The bytes of freed messages may
+                # belong to new messages.
+                for  h in H[ n : ] : h[ hdr.iread ] &= ~self.bit
+                
+                # Reader slot of this instance
+                k = self.slot * hdr.lenslot
+                
+                self.s[ k + hdr.spos  ] = self.i
+                self.s[ k + hdr.sslno ] = self.slno
+                self.s[ k + hdr.stime ] = monotonic_ns( )
+                
+                self._free( )
+        
+        # Guarantee message memoryviews are released
+        for  h in H : h.release( )
+        
+        return  n
+    
+    
+    def  _detached ( self ) :
+    
+        '''
+        Raises Detached if this instance was detached from the queue by a
+        writer. First, the reader slot is given up, so that another process can
+        open it. This instance no longer reads from the queue, until it calls
+        open( ) again. But it can still write to the queue.
+        '''
+        
+        # Checking our bit does not need the lock. Only a writer can set it, and
+        # only this instance clears it.
+        if  not self.h[ hdr.idet ]  &  self.bit : return
+        
+        with  self.cond :
+            self._closefds( )
+            for  _ in self._gens( ) : self.h[ hdr.idet ] &= ~self.bit
+        
+        ( self.slot , self.bit ) = ( None , 0 )
+        
+        raise  hdr.Detached( f'{self.sender.decode()} was detached from '
+                             f'{self.name}' )
+    
+    
+    def  _fifopath ( self , i , k ) :
+    
+        '''
+        Returns the path of the wake-up FIFO of reader slot k, for queue header
+        counter index i; either hdr.iwmsg or hdr.iwspc. The path names the
+        shared memory of the queue's first generation, and the queue's offset
+        within it.
+        '''
+        
+        return  os.path.join( gettempdir( ) ,
+                              f'pysyncq.{ self.base.lstrip( "/" ) }.'
+                              f'{ self.offset }.{ i }.{ k }' )
+    
+    
+    def  _wakefd ( self , i ) :
+    
+        '''
+        Returns a file descriptor that becomes readable when the queue changes.
+        For queue header counter index hdr.iwmsg, that is when new messages are
+        published to this instance. For hdr.iwspc, it is when queue memory is
+        freed. The file descriptor is the read end of a FIFO that is made on
+        first use, and that writers write a byte into; see _wake. Call
+        _clearfd( i ) before looking at the queue, so that the file descriptor
+        only becomes readable again after the next change. Only supported on
+        POSIX systems.
+        '''
+        
+        # Already made
+        if  i in self.wakefds : return  self.wakefds[ i ][ 0 ]
+        
+        if  osname != 'posix' :
+            raise  NotImplementedError( 'Wake-up FIFOs need a POSIX system' )
+        
+        if  not self.bit :
+            raise  ValueError( f'{ self.name } is not open in this process' )
+        
+        # Replace any FIFO that was left over in this slot, e.g. by a process
+        # that was killed
+        path = self._fifopath( i , self.slot )
+        
+        try :
+            os.unlink( path )
+        except  FileNotFoundError :
+            pass
+        
+        os.mkfifo( path , 0o600 )
+        
+        # Keep a write end open, too. Or else the read end is always readable,
+        # at end of file, while no writer has the FIFO open.
+        r = os.open( path , os.O_RDONLY | os.O_NONBLOCK )
+        w = os.open( path , os.O_WRONLY | os.O_NONBLOCK )
+        self.wakefds[ i ] = ( r , w )
+        
+        # Writers may now write into the FIFO, in every generation
+        with  self.cond :
+            for  _ in self._gens( ) : self.h[ i ] |= self.bit
+        
+        return  r
+    
+    
+    def  _clearfd ( self , i ) :
+    
+        '''
+        Reads every byte out of the wake-up FIFO for queue header counter index
+        i, making it first, if need be; see _wakefd. Returns True if there were
+        any bytes to read.
+        '''
+        
+        fd = self._wakefd( i )
+        n  = 0
+        
+        try :
+            while  ( b := os.read( fd , 4096 ) ) : n += len( b )
+        except  BlockingIOError :
+            pass
+        
+        return  n > 0
+    
+    
+    def  _closefds ( self ) :
+    
+        '''
+        Closes and removes the wake-up FIFOs of this instance's reader slot.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        for  _ in self._gens( ) :
+            for  i in self.wakefds : self.h[ i ] &= ~self.bit
+        
+        for  ( i , fds )  in  self.wakefds.items( ) :
+            
+            for  fd in fds : os.close( fd )
+            
+            try :
+                os.unlink( self._fifopath( i , self.slot ) )
+            except  FileNotFoundError :
+                pass
+        
+        self.wakefds.clear( )
+    
+    
+    def  _wake ( self , i , m = -1 ) :
+    
+        '''
+        Writes a byte into the wake-up FIFO, for queue header counter index i,
+        of each reader slot in bit mask m that has one. By default, that is
+        every slot that has one. A full FIFO is readable already. File
+        descriptors are kept open until the slot changes hands.
+        
+        DO NOT USE THIS unless the lock has been acquired, first.
+        '''
+        
+        # Slots with a FIFO
+        m &= self.h[ i ]
+        
+        # Visit each set bit, lowest first, then clear it
+        while  m :
+            
+            # Reader slot index, and the slot's current holder
+            k = ( m & -m ).bit_length( ) - 1
+            key = ( self.s[ k*hdr.lenslot + hdr.spid  ] ,
+                    self.s[ k*hdr.lenslot + hdr.sopen ] )
+            m &= m - 1
+            
+            # Open the FIFO, unless it is open already
+            f = self.fifos.get( ( i , k ) )
+            
+            if  f is None  or  f[ 0 ] != key :
+                
+                if  f : os.close( f[ 1 ] )
+                
+                try :
+                    f = self.fifos[ ( i , k ) ] = \
+                        ( key , os.open( self._fifopath( i , k ) ,
+                                         os.O_WRONLY | os.O_NONBLOCK ) )
+                except  OSError :
+                    self.fifos.pop( ( i , k ) , None )
+                    continue
+            
+            # A full FIFO, or one whose reader is gone, needs nothing more
+            try :
+                os.write( f[ 1 ] , b'\0' )
+            except  OSError :
+                pass
+    
+    
+    async def  _readable ( self , i , timer ) :
+    
+        '''
+        Waits until the wake-up FIFO for queue header counter index i is
+        readable, or until timer seconds have passed. Waits indefinitely if
+        timer is None. The FIFO is watched by the running asyncio event loop.
+        '''
+        
+        loop = asyncio.get_running_loop( )
+        fd   = self._wakefd( i )
+        done = loop.create_future( )
+        
+        loop.add_reader( fd , lambda : done.done( )  or  done.set_result( 0 ) )
+        
+        try :
+            await  asyncio.wait( [ done ] , timeout = timer )
+        finally :
+            loop.remove_reader( fd )
+    
+    
+    #-- Principal API methods --#
+    
+    # Creation / Deletion #
+    
+    @classmethod
+    def  attach ( cls , name , **kargs ) :
+    
+        '''
+        attach( name , **kargs )
+        
+        Returns a new PySyncQ instance of the existing queue called name. The
+        queue can be made by any other process, which need not be related to
+        this one. So independent programs can share a queue, not only a parent
+        and its children. Same as PySyncQ( name , create = False , **kargs ).
+        kargs are as for PySyncQ, except that size, readers, and intern are
+        those of the existing queue. Call open( ) next, as usual.
+        
+        The lock and condition variables of the queue are named POSIX
+        semaphores, so this is only supported on POSIX systems. Raises
+        FileNotFoundError if there is no such queue, or if it is still being
+        made. Not for a channel of a PySyncMultiQ.
+        '''
+        
+        return  cls( name , create = False , **kargs )
+    
+    
+    def  open ( self , sender = None , filtself = True ) :
+    
+        '''
+        open( sender = pid , filtself = True ) registers the current process
+        with the queue. sender is a string naming the process in each message
+        that it sends; if set to None, then the current process ID i.e. pid is
+        used as the sender (default). The bool filtself says whether the sender
+        string is automatically added to the scrnsend set; default is True.
+        
+        A process that was detached from the queue may call open( ) again, to
+        take a new reader slot. If the queue grew, then the process reads from
+        its newest generation.
+        '''
+        
+        # Opening again after being detached. The process is already counted.
+        # But not if this instance was inherited from the process that opened.
+        counted = self.pid == mp.current_process( ).pid
+        self.pid = mp.current_process( ).pid
+        
+        # Use the default sender string
+        if  sender is None : sender = str( mp.current_process( ).pid )
+        
+        # Store sender string as bytes that can go directly into shared memory
+        self.sender = sender.encode( )
+        
+        # If true then add local sender name to message filter list
+        if  filtself : self.scrnsend.add( self.sender )
+        
+        # Child processes was spawned rather than forked. Recover all un-
+        # pickleable and un-inheritable resources. Unless this instance was
+        # detached, and is opening again.
+        if  self.h is None : self._map( )
+        
+        # Get queue lock. Increment the process counter in the queue header. And
+        # set this instance's read or queue position to the tail; read only the
+        # messages that come after this instance/process has registered. The
+        # read serial number catches up with the write serial number, likewise.
+        # The assignment to attribute i should provoke any necessary copy-on-
+        # write.
+        with  self.cond :
+            
+            # Move on to the newest generation. A process that was already
+            # counted lets go of the others.
+            if  ( n := self._root( )[ hdr.igrow ] ) > self.gen :
+                if  counted :
+                    self._leave( n )
+                else :
+                    self._install( n )
+            
+            # Bit mask of free reader slots. A detached slot is not free until
+            # its reader finds out.
+            free = ~( self.h[ hdr.iact ] | self.h[ hdr.idet ] )  &  \
+                   ( ( 1 << self.slots ) - 1 )
+            
+            # None. Try reaping processes that ended without closing.
+            if  not free  and  self._reap( ) :
+                free = ~( self.h[ hdr.iact ] | self.h[ hdr.idet ] )  &  \
+                       ( ( 1 << self.slots ) - 1 )
+            
+            if  not free :
+                raise  MemoryError( f'All {self.slots} reader slots are in '
+                                    'use' )
+            
+            # Take the lowest free slot
+            self.slot = ( free & -free ).bit_length( ) - 1
+            self.bit  = 1 << self.slot
+            
+            # Count the process, in the first generation, too
+            if  not counted :
+                self.h[ hdr.iproc ] += 1
+                if  self.gen : self._root( )[ hdr.iproc ] += 1
+            
+            self.i    = self.h[ hdr.itail ]
+            self.slno = self.h[ hdr.islno ]
+            
+            # Fill in the reader slot. The open serial number tells _holders
+            # which messages were published after this slot was opened.
+            k = self.slot * hdr.lenslot
+            self.s[ k + hdr.spid  ] = self.pid
+            self.s[ k + hdr.spos  ] = self.i
+            self.s[ k + hdr.sslno ] = self.slno
+            self.s[ k + hdr.sopen ] = self.slno
+            self.s[ k + hdr.stime ] = monotonic_ns( )
+            self.s[ k + hdr.smiss ] = 0
+            
+            # Carry over any subscriptions, e.g. from before being detached
+            self._subscribe( )
+            
+            # Slot is active. Messages published from now on carry its bit.
+            self.h[ hdr.iact ] |= self.bit
+        
+    
+    def  close ( self ) :
+        
+        '''
+        Closes the shared memory. And unlinks if this is the last closure. But
+        a channel of a PySyncMultiQ leaves that to the PySyncMultiQ.
+        '''
+        
+        # Return immediately if shared memory was already closed
+        if  not self.shm : return
+        
+        # Release any outstanding message leases, and abort reservations
+        for  lease in list( self.leases ) : lease.release( )
+        for  rsv in list( self.reservations ) : rsv.abort( )
+        
+        # Generations that no process uses any longer
+        unused = [ ]
+        
+        # Get queue lock.
+        with  self.cond :
+            
+            # Leave every generation of the queue that this instance still uses
+            for  gen in self._gens( ) :
+                
+                # Deactivate the reader slot. Unread messages keep this
+                # instance's bit, but _holders ignores the bits of inactive
+                # slots, and the bits left over for the next reader to open the
+                # slot. So there is no need to visit them. If this instance was
+                # detached then the slot need only be freed.
+                if  self.h[ hdr.iact ]  &  self.bit :
+                    self.h[ hdr.iact  ] &= ~self.bit
+                    self.s[ self.slot * hdr.lenslot + hdr.spid ] = 0
+                else :
+                    self.h[ hdr.idet ] &= ~self.bit
+                
+                # Subscriptions go with the slot
+                self.h[ hdr.isub ] &= ~self.bit
+                
+                # Free messages that no longer have any reads remaining. This
+                # alerts anything that is waiting for free space.
+                self._free( )
+                
+                # Decrement the process counter of a later generation, and
+                # remember to unlink it if no process uses it any longer
+                if  gen  and  self.h[ hdr.iproc ] :
+                    self.h[ hdr.iproc ] -= 1
+                    if  not self.h[ hdr.iproc ] : unused.append( gen )
+            
+            # And wake-up FIFOs
+            self._closefds( )
+            
+            # Decrement the process counter
+            root = self._root( )
+            if  root[ hdr.iproc ] : root[ hdr.iproc ] -= 1
+            
+            # But remember the counter value, we unlink if all instances closed.
+            # Then every generation goes.
+            noproc = root[ hdr.iproc ] == 0
+            if  noproc : unused = range( 1 , root[ hdr.igrow ] + 1 )
+        
+        # Close the wake-up FIFOs of other reader slots
+        for  ( _ , fd )  in  self.fifos.values( ) : os.close( fd )
+        self.fifos.clear( )
+        
+        # Take care to release memoryviews, or else .close raises an exception.
+        # Including those of other generations. Keep the first generation's
+        # shared memory, which is unlinked last.
+        self._unmap( )
+        shm = self.shm  if  self.gen == 0  else  self.segs[ 0 ][ 0 ]
+        
+        for  ( seg , *V ) in self.segs.values( ) :
+            for  v in V : v.release( )
+            if  seg is not shm : seg.close( )
+        
+        if  self.gen : self.shm.close( )
+        
+        ( self.segs , self.gen , self.shm ) = ( { } , 0 , shm )
+        
+        # Shared memory belongs to the group, which closes it. But the channel
+        # has semaphores of its own.
+        if  self.group is not None :
+            self._unsync( noproc )
+            self.shm = None
+            return
+        
+        # Unlink later generations that no process uses any longer
+        for  gen in unused : hdr.shmunlink( self._segname( gen ) )
+        
+        # Close local copy of shared memory
+        self.shm.close( )
+        
+        # Unlink if this is the last close. The process that made the queue
+        # need not be the one to do so. And its semaphores. A queue of the same
+        # name that is made later is not this process's to track.
+        if  noproc :
+            hdr.shmunlink( self.base )
+        
+        # Or leave it to the processes that still use it. Then the resource
+        # tracker of the process that made it must not unlink it, once that
+        # process ends. Nor its semaphores.
+        elif  self.maker == mp.current_process( ).pid :
+            hdr.tracked.discard( self.shm._name )
+            hdr.shmuntrack( self.shm )
+        
+        self._unsync( noproc )
+        
+        # Signal that shared memory has been closed by this instance
+        self.shm = None
+
+
+    # Message handling #
+    
+    def  append ( self , msgtype = '' , msg = '' , block = False ,
+                         timer = 0.5 , ttl = None ) :
+    
+        '''
+        append ( self , msgtype = '' , msg = '' , block = False , timer = 0.5 ,
+                 ttl = None )
+        
+        Adds a new message to the tail of the queue. The message header stores
+        the sender name and msgtype as message type. msg forms the main body of
+        the message. If msgtype or msg are not already str or bytes then they
+        are first cast to str before casting to bytes with the default encoding.
+        
+        If the queue lacks sufficient free space in which to write the message
+        header and body then a MemoryError exception is raised, unless block is
+        True. Then append will wait until there is enough room in the queue.
+        
+        append will wait indefinitely for free space if timer is None. But timer
+        can be a float that specifies the number of seconds to wait for. If the
+        timer expires before the message is appended to the queue then the
+        MemoryError exception is raise.
+        
+        The overflow policy of the queue may free space for the message, first.
+        Or, under the drop policy, the message is dropped instead of raising
+        MemoryError; see PySyncQ. Returns True if the message was appended, and
+        False if it was dropped.
+        
+        A body of more than bulk bytes is copied into the queue after the lock
+        is released, and published when the lock is acquired again; see
+        PySyncQ.
+        
+        ttl is the message's time to live in seconds, after which it expires.
+        By default, None, it is the ttl of PySyncQ. Zero never expires.
+        '''
+        
+        # Internally, messages have the format
+        # [ message counters , message sender , message type , message body ]
+        
+        # Cast message type to bytes, and encode the body. Spill a large body
+        # before taking the lock.
+        btype = hdr.tobytes( msgtype )
+        ttl   = self._ttl( ttl )
+        ( bmsg , flags ) = self._spill( self.codec.encode( msg ) )
+        flags |= self.codec.id << hdr.shcodec  |  self._work( btype )
+        
+        # Total number of bytes required by the message, including counters,
+        # at most
+        nbody = sum( len( p ) for p in bmsg )
+        n = self._msgsize( btype , nbody )
+        
+        # A large body is copied without the lock
+        bulk = self.bulk is not None  and  nbody > self.bulk
+        
+        # The message is not in the queue yet
+        sent = False
+        
+        try :
+            
+            # Get queue lock. Write to the newest generation of the queue.
+            with  self.cond , self._newest( ) :
+            
+                # The queue is too full
+                if  not self._room( n , block , timer ) :
+                    
+                    # Drop the message, and let the readers know
+                    if  self.overflow == 'drop' :
+                        self._drop( btype )
+                        return  False
+                
+                    raise  MemoryError( f'{ n } byte message > '
+                                        f'{ self.h[ hdr.ifree ] } free bytes.' )
+                    
+                # If we got here then there is enough free space in the queue.
+                # Write the message, which wakes up any process that is waiting
+                # for it.
+                if  not bulk :
+                    if  not self._send( btype , bmsg , flags , ttl ) :
+                        self._put( btype , bmsg , flags , ttl )
+                        self._publish( )
+                    sent = True
+                    return  True
+                
+                # Or only reserve space for it
+                ( i , b , n , r ) = self._reserve( btype , nbody , self.pid ,
+                                                   ttl )
+                body = self._view( b , nbody , readonly = False )
+            
+            # Copy the body without the lock. Then commit the message, which
+            # publishes it once earlier reservations are. Or get rid of it, if
+            # the copy was interrupted.
+            try :
+                self._fill( body , bmsg )
+                sent = True
+            finally :
+                with  self.cond , self._newest( ) :
+                    if  sent :
+                        self._commit( i , flags )
+                    elif  not self._withdraw( i , n , r ) :
+                        self._commit( i , hdr.fvoid )
+        
+        # The spilled body of a message that was not sent is no use
+        finally :
+            if  not sent  and  flags & hdr.fspill :
+                hdr.shmunlink( self._spillname( bmsg[ 0 ] ) )
+        
+        return  True
+    
+    
+    def  append_many ( self , msgs , block = False , timer = 0.5 ,
+                              ttl = None ) :
+    
+        '''
+        append_many ( msgs , block = False , timer = 0.5 , ttl = None )
+        
+        Adds a batch of messages to the tail of the queue in one go. msgs is an
+        iterable of ( msgtype , msg ) pairs, each one handled as by append. The
+        queue lock is acquired once for the whole batch, and waiting processes
+        are woken only once, after the last message is written.
+        
+        If block is True then append_many waits until there is enough free space
+        for the entire batch, or until the queue is empty if the batch is bigger
+        than the queue. timer works as for append. But if the timer expires, or
+        block is False, then append_many writes as many messages as will fit, in
+        order, and drops the rest. Returns the number of messages
+        that were written, which is less than the number in msgs after such a
+        partial success. A MemoryError is raised if not even the first message
+        can be written, unless the overflow policy is drop. The overflow policy
+        is applied to make room for the whole batch, as for append. Bodies of
+        more than bulk bytes are copied without the lock, as for append, and
+        published together once all are written. ttl is the time to live of
+        every message, as for append.
+        '''
+        
+        # Cast message types to bytes, and encode bodies, spilling large ones.
+        # Get each message's total number of bytes, including counters.
+        cid   = self.codec.id << hdr.shcodec
+        ttl   = self._ttl( ttl )
+        batch = [ ( hdr.tobytes( t ) , *self._spill( self.codec.encode( m ) ) )
+                  for ( t , m ) in msgs ]
+        sizes = [ self._msgsize( t , sum( len( p ) for p in m ) )
+                  for ( t , m , _ ) in batch ]
+        
+        # Nothing to do
+        if  not batch : return  0
+        
+        # Count messages that are written. Large bodies, that are reserved
+        # and copied later, and how many of them were copied.
+        count = 0
+        pend  = [ ]
+        k     = 0
+        
+        try :
+            
+            # Get queue lock, the remainder of append_many runs with possession.
+            # Write to the newest generation of the queue.
+            with  self.cond , self._newest( ) :
+                
+                # Room for the whole batch. Or, if the batch is bigger than the
+                # queue, for the whole queue.
+                need = min( sum( sizes ) , len( self.b ) )
+                
+                # Wait for the whole batch to fit, if we may. Whatever the
+                # outcome, we carry on and write as much of the batch as
+                # possible.
+                self._room( need , block , timer )
+                
+                # Write each message in turn, stopping at the first that won't
+                # fit. Bytes skipped at the end of the queue body can make the
+                # batch take slightly more room than the sum of its message
+                # sizes.
+                for  ( ( btype , bmsg , flags ) , n ) in zip( batch , sizes ) :
+                    
+                    if  self.h[ hdr.ifree ] < n : break
+                    
+                    # Name the codec, and mark a work message
+                    flags |= cid  |  self._work( btype )
+                    
+                    # Reserve space for a large body. Spilled bodies are small,
+                    # and must not be voided, or their blocks are never freed.
+                    nbody = sum( len( p ) for p in bmsg )
+                    if  self.bulk is not None  and  nbody > self.bulk  and  \
+                        not flags & hdr.fspill :
+                        ( i , b , _ , _ ) = self._reserve( btype , nbody ,
+                                                           self.pid , ttl )
+                        body = self._view( b , nbody , readonly = False )
+                        pend.append( ( i , flags , bmsg , body ) )
+                    else :
+                        self._put( btype , bmsg , flags , ttl )
+                    
+                    count += 1
+                
+                # Publish the batch, which wakes up any process that is waiting
+                # on new messages, once for the whole batch.
+                self._publish( )
+                
+                # Drop the rest, and let the readers know
+                if  self.overflow == 'drop' :
+                    self._drop( *( btype for ( btype , _ , _ )
+                                         in batch[ count : ] ) )
+                
+                # Not even one message was written
+                elif  not count :
+                    raise  MemoryError( f'{ sizes[ 0 ] } byte message > '
+                                        f'{ self.h[ hdr.ifree ] } free bytes.' )
+            
+            # Copy the large bodies without the lock
+            for  ( _ , _ , bmsg , body ) in pend :
+                self._fill( body , bmsg )
+                k += 1
+        
+        finally :
+            
+            # Commit the large bodies, and publish them in one go. Any that
+            # weren't copied are voided, and their views released.
+            if  pend :
+                
+                for  ( _ , _ , _ , body ) in pend[ k : ] :
+                    for  v in ( body  if  type( body ) is tuple  else
+                                ( body , ) ) : v.release( )
+                
+                # Start byte and flags of each reservation
+                done = [ ( p[ 0 ] , p[ 1 ]  if  j < k  else  hdr.fvoid )
+                         for ( j , p ) in enumerate( pend ) ]
+                
+                # The last commit publishes them all
+                with  self.cond , self._newest( ) :
+                    for  ( i , flags ) in done[ : -1 ] :
+                        self._ready( i , flags )
+                    self._commit( *done[ -1 ] )
+            
+            # The spilled bodies of messages that were not sent are no use
+            for  ( _ , bmsg , flags ) in batch[ count : ] :
+                if  flags & hdr.fspill :
+                    hdr.shmunlink( self._spillname( bmsg[ 0 ] ) )
+        
+        return  count
+         
+        
+    def  reserve ( self , msgtype = '' , nbytes = 0 , block = False ,
+                          timer = 0.5 , ttl = None ) :
+    
+        '''
+        reserve ( msgtype = '' , nbytes = 0 , block = False , timer = 0.5 ,
+                  ttl = None )
+        
+        Reserves space at the tail of the queue for a message of type msgtype
+        with an nbytes byte body, so that the body can be written in place. This
+        saves making a separate copy of the body, as append does. Returns a
+        Reservation, which is a context manager. Its body is a writable
+        memoryview into the queue's shared memory, or a tuple of two if the body
+        wraps around the end of the queue body. For example,
+        
+            with  q.reserve( 'data' , 8 ) as buf :
+                struct.pack_into( 'd' , buf , 0 , x )
+        
+        The message is published to the queue when the Reservation is
+        committed, which happens automatically on leaving the with statement.
+        But if an exception is raised then the Reservation is aborted instead,
+        and the message is never read by any process. Otherwise, call the
+        Reservation's .commit( ) or .abort( ) methods directly. Messages that
+        are appended after a reservation is made are not published until the
+        reservation is committed or aborted, so that messages are always read in
+        the order that they were reserved. Reservations should be committed
+        promptly, for that reason. Any that remain are aborted by close( ).
+        
+        msgtype, block, timer and ttl are as for append. The time to live
+        counts from when the message is published. MemoryError is raised if
+        there is insufficient free space, even under the drop overflow policy.
+        '''
+        
+        # Cast message type to bytes
+        btype = hdr.tobytes( msgtype )
+        ttl   = self._ttl( ttl )
+        
+        # Total number of bytes required by the message, including counters,
+        # at most
+        n = self._msgsize( btype , nbytes )
+        
+        # Get queue lock only for long enough to reserve the space, in the
+        # newest generation of the queue
+        with  self.cond , self._newest( ) :
+        
+            # The queue is too full
+            if  not self._room( n , block , timer ) :
+            
+                raise  MemoryError( f'{ n } byte message > '
+                                    f'{ self.h[ hdr.ifree ] } free bytes.' )
+            
+            # If we got here then there is enough free space in the queue
+            ( i , b , n , r ) = self._reserve( btype , nbytes , self.pid ,
+                                               ttl )
+        
+            # Hand out the reserved space
+            return  Reservation( self , i , n , r ,
+                                 self._view( b , nbytes , readonly = False ) ,
+                                 self._work( btype ) )
+    
+    
+    def  pop ( self , block = False , timer = 0.5 , decode = True ) :
+    
+        '''
+        pop ( block = False , timer = 0.5 , decode = True )
+        
+        Reads the next next unread message from the queue and returns the tuple
+        ( sender , type , msg ) ... see append. If the sender or type string is
+        found in the scrnsend or scrntype sets, respectively, then the message
+        is skipped, and pop looks for the next unread message in the queue. If
+        there are no unread and unscreened messages then None is returned,
+        unless block is True.
+        
+        Then pop will wait until there is a new message to read. Pop will wait
+        indefinitely if timer is None. Otherwise, timer can be a float that
+        gives the number of seconds that pop will wait for. If the timer expires
+        before an unread message becomes available then None will be returned.
+        
+        By default, the sender and type are decoded from bytes to str with the
+        default encoding, and the body by the codec that encoded it; see the
+        codec argument of PySyncQ. But if decode is False then the raw bytes
+        are returned.
+        
+        Raises Detached if this process was detached from the queue; see the
+        detach overflow policy of PySyncQ.
+        '''
+        
+        # Get time at start of function call. We use this to subtract elapsed
+        # time from repeated waits on the condition variable, if frequent
+        # screened messages are appended to the queue by another instance.
+        if  timer : tin = time( )
+        
+        # Read loop
+        while  True :
+        
+            # Screened messages are not done one at a time. Instead, a run of
+            # them is done together with the message that follows, under a
+            # single acquisition of the queue lock. H holds the run, and f is
+            # the serial number of its first message.
+            H = [ ]
+            
+            try :
+            
+                # Scan queue body for next unread message
+                for  m in self._next( ) :
+                
+                    # Unpack msg counters and index of 1st byte to follow them
+                    ( h , b ) = m
+                
+                    # _next skipped ahead of messages that were overwritten.
+                    # The run so far is not consecutive with this message.
+                    if  H  and  hdr.slnodiff( self.slno , f ) != len( H ) :
+                        self._done( f , *H )
+                        H = [ ]
+                
+                    # Add message to the run
+                    if  not H : f = self.slno
+                    H.append( h )
+                
+                    # We have a message, but it might become screened
+                    try :
+                    
+                        # Read message header strings, unless screened. A
+                        # work message must be claimed, first.
+                        bstr , b = self._claim( h , b )  \
+                                   if  h[ hdr.iflag ] & hdr.fwork  else  \
+                                   self._strings( h , b )
+                    
+                        # Read message body, and the flags that name its codec
+                        bstr.append(  self._read( b , h[ hdr.ibody ] )[ 0 ]  )
+                        flags = h[ hdr.iflag ]
+                        
+                        # The body of a spilled message is in its own block.
+                        # Unless the message was freed, and the flags and
+                        # descriptor are garbage. Then _done discards it.
+                        if  flags & hdr.fspill :
+                            bstr[ -1 ] = b''  if  self._freed( self.slno )  \
+                                         else  self._fetch( bstr[ -1 ] )
+                    
+                    # We found a message on the queue, but it is screened.
+                    # Carry on with the run.
+                    except  hdr.ScreenedMessage : continue
+                
+                    # A genuine error has occurred, pass it on i.e. re-raise it
+                    except  Exception as err :
+                        print( f'Unexpected {err=}, {type(err)=}' )
+                        raise
+                
+                    # We must clear our bit in the read counters of the run,
+                    # and alert anything else that is blocking on the condition
+                    # variable, but only after freeing queue memory if this was
+                    # the last read. Guarantee message memoryviews are released.
+                    # Discard the message if it was overwritten while we read
+                    # it.
+                    if  self._done( f , *H ) == len( H ) : bstr = None
+                    H = [ ]
+                
+                    # Message found! Build return tuple containing strings.
+                    # Break for loop to skip its else statement.
+                    if  bstr :
+                        ret = self._decode( bstr , flags )  \
+                              if decode else tuple( bstr )
+                        break
+                
+                # No message was found by _next iterator, for loop drops here.
+                # Finish any run of screened messages.
+                else :
+                    if  H : self._done( f , *H )
+                    ret = None
+            
+            # Finish any run of screened messages before passing on an error,
+            # including Detached
+            except  BaseException :
+                if  H : self._done( f , *H )
+                raise
+            
+            # Un-screened and un-read message was found. Return it in a tuple
+            # with format: message ( sender , type , body ). None evaluates as
+            # False.
+            if  ret : return ret
+            
+            # No unscreened message was found. But the queue grew, and there may
+            # be messages in the next generation.
+            if  self._follow( ) : continue
+            
+            # We may block on new messages
+            if  block :
+                
+                # Poll for a new message for a little while, first
+                if  self._spin( self._popred ,
+                                tin + timer  if  timer  else  None ) : continue
+                
+                # How much time has passed since the call to pop( )?
+                if  timer : dt = timer - ( time( ) - tin )
+                else : dt = None
+                
+                # Block on the condition variable
+                with  self.cond :
+                
+                  # The predicate returns true if there is a message before
+                  # timeout
+                  if  self.cond.wait_for( self._popred , dt ) : continue
+            
+            # We only get here if no message was found and any blocking timed
+            # out
+            return  None
+
+
+    
+    
+    def  lease ( self , block = False , timer = 0.5 , decode = True ) :
+    
+        '''
+        lease ( block = False , timer = 0.5 , decode = True )
+        
+        Zero-copy version of pop. Finds the next unread and unscreened message
+        in the queue, exactly as pop does. But instead of returning a copy of
+        the message, it returns a Lease on it. The Lease has attributes sender
+        and type, as for pop, and body. body is a read-only memoryview that
+        looks directly into the queue's shared memory. Or, if the message body
+        wraps around the end of the queue body, then body is a tuple of two
+        memoryviews that must be read in order.
+        
+        The message stays in the queue until the Lease is released, by calling
+        its .release( ) method or by using it in a with statement, e.g.
+        
+            with  q.lease( ) as m : use( m.body )
+        
+        Leases should be released promptly, because no queue memory past the
+        leased message can be freed until then. Any that remain are released
+        by close( ), after which their memoryviews are invalid.
+        
+        block and timer are as for pop, and None is returned if no message is
+        found. decode applies to sender and type, only. The body is never
+        decoded, but the Lease's .decode( ) method can do it without copying.
+        Under the overwrite overflow policy, the leased message can be
+        overwritten before it is released. Then the Lease's .release( ) method
+        returns False.
+        '''
+        
+        # Get time at start of function call, as for pop
+        if  timer : tin = time( )
+        
+        # Read loop
+        while  True :
+        
+            # Run of screened messages, done together as for pop. H holds the
+            # run, and f is the serial number of its first message.
+            H = [ ]
+            
+            try :
+            
+                # Scan queue body for next unread message
+                for  ( h , b ) in self._next( ) :
+                    
+                    # Finish the run if _next skipped ahead, as for pop
+                    if  H  and  hdr.slnodiff( self.slno , f ) != len( H ) :
+                        self._done( f , *H )
+                        H = [ ]
+                    
+                    # Read message header strings, unless they are screened.
+                    # A work message must be claimed, first.
+                    try :
+                        bstr , b = self._claim( h , b )  \
+                                   if  h[ hdr.iflag ] & hdr.fwork  else  \
+                                   self._strings( h , b )
+                    
+                    # Add this message to the run, and look at the next one. Or
+                    # pass on a genuine error.
+                    except  hdr.ScreenedMessage :
+                        if  not H : f = self.slno
+                        H.append( h )
+                        continue
+                    except  Exception :
+                        self._done( self.slno , h )
+                        raise
+                    
+                    # Done with the run of screened messages
+                    if  H : self._done( f , *H )
+                    H = [ ]
+                    
+                    # The flags, and the descriptor of a spilled message, are
+                    # copied before the check that they are intact
+                    flags = h[ hdr.iflag ]
+                    if  flags & hdr.fspill :
+                        d = self._read( b , h[ hdr.ibody ] )[ 0 ]
+                    
+                    # The message was freed by the overflow policy, so the
+                    # strings may have been overwritten while we read them
+                    if  self._freed( self.slno ) :
+                        self._done( self.slno , h )
+                        continue
+                    
+                    # Message found! Hand it out, it is now the lease's job to
+                    # clear our bit in the read counter.
+                    if  decode : bstr = [ b.decode( ) for b in bstr ]
+                    
+                    # The body of a spilled message is in its own block
+                    if  flags & hdr.fspill :
+                        return  Lease( self , h , self.slno , *bstr ,
+                                       *self._fetch( d , copy = False ) )
+                    
+                    return  Lease( self , h , self.slno , *bstr ,
+                                   self._view( b , h[ hdr.ibody ] ) )
+            
+            # Always finish the run of screened messages
+            finally :
+                if  H : self._done( f , *H )
+            
+            # No unscreened message was found. But the queue grew, and there may
+            # be messages in the next generation.
+            if  self._follow( ) : continue
+            
+            # We may block on new messages
+            if  block :
+                
+                # Poll for a new message for a little while, first
+                if  self._spin( self._popred ,
+                                tin + timer  if  timer  else  None ) : continue
+                
+                # How much time has passed since the call to lease( )?
+                if  timer : dt = timer - ( time( ) - tin )
+                else : dt = None
+                
+                # Block on the condition variable
+                with  self.cond :
+                  if  self.cond.wait_for( self._popred , dt ) : continue
+            
+            # No message was found and any blocking timed out
+            return  None
+    
+    
+    def  pop_many ( self , max_count = None , max_bytes = None , block = False ,
+                           timer = 0.5 , decode = True ) :
+    
+        '''
+        pop_many ( max_count = None , max_bytes = None , block = False ,
+                   timer = 0.5 , decode = True )
+        
+        Reads every unread message from the queue in one pass and returns a
+        list of ( sender , type , msg ) tuples ... see pop. Screened messages
+        are skipped, as for pop. The number of unread messages is taken once,
+        at the start, and this instance's bits in their read counters are all
+        cleared together under a single acquisition of the queue lock, once
+        they have been read.
+        
+        If max_count is an int then no more than max_count messages are
+        returned. If max_bytes is an int then reading stops before the total
+        number of message body bytes would exceed max_bytes; but the first
+        message is always returned, however large. Any unread messages that
+        are left over can be read by a subsequent call. If the queue grew, then
+        the messages of newer generations follow those of the old one. But
+        with either limit, one call only reads from one generation.
+        
+        If there are no unread and unscreened messages then an empty list is
+        returned, unless block is True. Then pop_many waits for new messages, as
+        for pop. block, timer and decode all work as they do for pop. Detached
+        is raised as for pop.
+        '''
+        
+        # Get time at start of function call, as for pop
+        if  timer : tin = time( )
+        
+        # Returned messages
+        ret = [ ]
+        
+        # Read loop
+        while  True :
+            
+            # Was this instance detached? If not, then it is still alive.
+            self._detached( )
+            self.heartbeat( )
+        
+            # Take a snapshot of the number of messages that this instance has
+            # not yet read, without the lock. None can be freed before we
+            # clear our bits in their read counters, except by the overflow
+            # policy. If that already happened, then skip to the head.
+            ( free , _ , slno , head , hslno ) = self._snapshot( )
+            if  hdr.slnoafter( hslno , self.slno ) :
+                ( self.i , self.slno ) = ( head , hslno )
+            n = 0  if  free == len( self.b )  else  \
+                hdr.slnodiff( slno , self.slno )
+            
+            # Message counter memoryviews of messages that we have read, and
+            # the serial number of the first. The byte strings of unscreened
+            # messages, with the index of each message in H. And the total
+            # number of message body bytes that will be returned.
+            H = [ ]
+            first = ( self.slno + 1 )  %  ( hdr.maxqueuehead + 1 )
+            B = [ ]
+            nbytes = 0
+            
+            # Read out messages without the lock. No matter what, clear
+            # our bits in the read counters of all messages that were read.
+            try :
+                
+                for  _ in range( n ) :
+                    
+                    # Enough messages
+                    if  max_count is not None  and  len( B ) >= max_count :
+                        break
+                    
+                    # Remember read position and serial number, in case the
+                    # next message must be left for later
+                    ( i , slno ) = ( self.i , self.slno )
+                    
+                    # Step over the next message
+                    ( h , b ) = self._step( )
+                    
+                    # Too many bytes, put the message back. But return at least
+                    # one message.
+                    size = self._bodysize( h , b )
+                    if  max_bytes is not None  and  B  and  \
+                        nbytes + size > max_bytes :
+                        
+                        h.release( )
+                        ( self.i , self.slno ) = ( i , slno )
+                        break
+                    
+                    # Message has been read
+                    H.append( h )
+                    
+                    # Read message header strings, unless they are screened.
+                    # A work message must be claimed, first.
+                    try :
+                        bstr , b = self._claim( h , b )  \
+                                   if  h[ hdr.iflag ] & hdr.fwork  else  \
+                                   self._strings( h , b )
+                    except  hdr.ScreenedMessage :
+                        continue
+                    
+                    # Read message body. The body of a spilled message is in its
+                    # own block, unless the message was freed, as for pop.
+                    bstr.append(  self._read( b , h[ hdr.ibody ] )[ 0 ]  )
+                    flags = h[ hdr.iflag ]
+                    if  flags & hdr.fspill :
+                        bstr[ -1 ] = b''  if  self._freed( self.slno )  \
+                                     else  self._fetch( bstr[ -1 ] )
+                    nbytes += size
+                    B.append( ( len( H ) - 1 , bstr , flags ) )
+            
+            # Single locked commit. Clear our read bits, in order, and
+            # free any message that has no reads left. Then wake up anything
+            # that is blocking on the condition variable.
+            finally :
+                
+                n = self._done( first , *H )  if  H  else  0
+            
+            # Build return tuples. Discard messages that were overwritten while
+            # we read them.
+            ret.extend( ( self._decode( bstr , flags ) if decode
+                          else tuple( bstr ) )
+                        for ( j , bstr , flags ) in B  if  j >= n )
+            
+            # Look in the next generation, if the queue grew. Unless there are
+            # limits, and messages were found, which count towards them.
+            if  ( not ret  or  max_count is None  and  max_bytes is None ) \
+                and  self._follow( ) : continue
+            
+            # Found messages
+            if  ret : return  ret
+            
+            # No point in waiting
+            if  not block : return  ret
+            
+            # Poll for a new message for a little while, first
+            if  self._spin( self._popred ,
+                            tin + timer  if  timer  else  None ) : continue
+            
+            # How much time has passed since the call to pop_many( )?
+            if  timer : dt = timer - ( time( ) - tin )
+            else : dt = None
+            
+            # Block on the condition variable. Return empty list on timeout.
+            with  self.cond :
+                if  not self.cond.wait_for( self._popred , dt ) : return  ret
+    
+    
+    def  drain ( self , decode = True ) :
+    
+        '''
+        drain ( decode = True )
+        
+        Reads every unread and unscreened message from the queue, without
+        blocking. Equivalent to pop_many( decode = decode ).
+        '''
+        
+        return  self.pop_many( decode = decode )
+    
+    
+    # Subscriptions #
+    
+    def  subscribe ( self , *types ) :
+    
+        '''
+        subscribe( *types )
+        
+        Subscribes this process to messages of the given types, only. These are
+        converted to byte strings, as for the scrntype set. With no types, this
+        process subscribes to every type of message, which is the default. Each
+        call replaces the last. Up to header.maxsubs types are allowed.
+        
+        Unlike screening, subscriptions are kept in shared memory. Writers do
+        not set this process's bit in the read counter of a message that it
+        did not subscribe to. So the message can be freed as soon as the
+        processes that did subscribe have read it, and this process skips over
+        it without looking at its sender or type. Subscriptions only apply to
+        messages that are appended after the call. They are kept if this
+        process is detached and calls open( ) again.
+        '''
+        
+        subs = hdr.qset( types )
+        
+        if  len( subs ) > hdr.maxsubs :
+            raise  ValueError( f'Can\'t subscribe to more than {hdr.maxsubs} '
+                               f'types, got {len( subs )}' )
+        
+        self.subs = subs
+        
+        # Registered with the queue. Otherwise, open( ) writes them.
+        if  self.bit :
+            with  self.cond :
+                for  _ in self._gens( ) : self._subscribe( )
+    
+    
+    # Event loops #
+    
+    def  fileno ( self ) :
+    
+        '''
+        fileno( )
+        
+        Returns a file descriptor that is readable while this process may have
+        unread messages. So the queue can be waited on by select, poll, or a
+        selectors object, in one call along with sockets and timers. It becomes
+        readable when a new message is published to this process, and stops
+        being readable when a read, such as pop( ) or drain( ), finds no more.
+        It may be readable when every unread message is screened. Then pop( )
+        returns None. It also becomes readable if this process is detached,
+        so that pop( ) raises Detached. The file descriptor is closed by
+        close( ), and when Detached is raised.
+        
+        The file descriptor belongs to a FIFO that is made by the first call.
+        Only supported on POSIX systems.
+        '''
+        
+        return  self._wakefd( hdr.iwmsg )
+    
+    
+    def  spacefileno ( self ) :
+    
+        '''
+        spacefileno( )
+        
+        Returns a file descriptor that becomes readable when queue memory is
+        freed, after append( ), append_many( ) or reserve( ) found too little
+        room. Then it is worth trying again. It stops being readable when they
+        next find too little room. Otherwise, as for fileno( ).
+        '''
+        
+        return  self._wakefd( hdr.iwspc )
+    
+    
+    # Asynchronous #
+    
+    async def  pop_async ( self , timer = 0.5 , decode = True ) :
+    
+        '''
+        pop_async ( timer = 0.5 , decode = True )
+        
+        Coroutine version of pop( block = True ) for use with asyncio. Instead
+        of blocking the thread, it waits for a wake-up FIFO to become readable
+        in the running event loop. One event loop can then wait on many queues
+        at once. timer and decode are as for pop. None is returned if the timer
+        expires before an unread and unscreened message is found. Only
+        supported on POSIX systems, by event loops that have add_reader( ).
+        '''
+        
+        # Get time at start of function call, as for pop
+        if  timer : tin = time( )
+        
+        while  True :
+            
+            # Look for a message. The wake-up FIFO must exist first. Finding
+            # no message empties it.
+            self._wakefd( hdr.iwmsg )
+            if  ( m := self.pop( decode = decode ) ) : return  m
+            
+            # How much time has passed since the call to pop_async( )?
+            if  timer is None :
+                dt = None
+            else :
+                dt = timer - ( time( ) - tin )  if  timer  else  0
+                if  dt <= 0 : return  None
+            
+            # Wait for new messages
+            await  self._readable( hdr.iwmsg , dt )
+    
+    
+    async def  append_async ( self , msgtype = '' , msg = '' , timer = 0.5 ) :
+    
+        '''
+        append_async ( msgtype = '' , msg = '' , timer = 0.5 )
+        
+        Coroutine version of append( block = True ) for use with asyncio, see
+        pop_async. Waits for free space in the running event loop. Returns as
+        for append, and raises MemoryError if timer expires before there is
+        room for the message.
+        '''
+        
+        # Get time at start of function call, as for pop
+        if  timer : tin = time( )
+        
+        while  True :
+            
+            # Try to append. The wake-up FIFO must exist first. Finding no
+            # room empties it.
+            self._wakefd( hdr.iwspc )
+            
+            try :
+                return  self.append( msgtype , msg )
+            
+            # No room. How much time has passed since the call?
+            except  MemoryError :
+                
+                if  timer is None :
+                    dt = None
+                else :
+                    dt = timer - ( time( ) - tin )  if  timer  else  0
+                    if  dt <= 0 : raise
+            
+            # Wait for free space
+            await  self._readable( hdr.iwspc , dt )
+    
+    
+    async def  iter_async ( self , *args , **kargs ) :
+    
+        '''
+        Asynchronous version of __call__, for use as in
+        
+            async for  m in q.iter_async( timer = None ) : ...
+        
+        Makes repeat calls to pop_async( ) until no messages are available, or
+        the timer expires.
+        '''
+        
+        while  ( m := await self.pop_async( *args , **kargs ) ) : yield  m
+    
+    
+    # Diagnostics #
+    
+    def  readers ( self ) :
+    
+        '''
+        readers( )
+        
+        Returns a list of Reader named tuples, one for each registered process,
+        ordered by reader slot. Each has fields
+        ( slot , pid , pos , slno , lag , head , idle ). slot is the reader slot
+        index and pid the process ID. pos and slno are the read position and
+        read serial number that the process last committed. lag is the number
+        of published messages that it has not yet committed. head is True if
+        the process holds the message at the head of the queue, and hence stops
+        writers from using its bytes. idle is the number of seconds since the
+        process last committed a read, looked for new messages, or called
+        heartbeat( ).
+        '''
+        
+        # Holds the lock while visiting the reader slots, for a consistent view
+        with  self.cond :
+            
+            # Bit mask of readers that hold the head message, if there is one
+            if  self.h[ hdr.ihsln ] != self.h[ hdr.islno ] :
+                head = self._holders(
+                           hdr.msgword.unpack_from( self.b ,
+                                                    self.h[ hdr.ihead ] )[ 0 ] ,
+                           ( self.h[ hdr.ihsln ] + 1 ) %
+                             ( hdr.maxqueuehead + 1 ) )
+            else :
+                head = 0
+            
+            # Time now, in nanoseconds
+            now = monotonic_ns( )
+            
+            # Accumulate reader details here
+            R = [ ]
+            
+            for  slot in range( self.slots ) :
+                
+                # Slot is not in use
+                if  not self.h[ hdr.iact ]  &  ( 1 << slot ) : continue
+                
+                # Slot counters
+                s = self.s[ slot * hdr.lenslot : ( slot + 1 ) * hdr.lenslot ]
+                
+                R.append( hdr.Reader( slot , s[ hdr.spid ] , s[ hdr.spos ] ,
+                              s[ hdr.sslno ] ,
+                              hdr.slnodiff( self.h[ hdr.islno ] ,
+                                            s[ hdr.sslno ] ) ,
+                              bool( head  &  ( 1 << slot ) ) ,
+                              ( now - s[ hdr.stime ] ) / 1e9 ) )
+                
+                s.release( )
+        
+        return  R
+    
+    
+    def  missed ( self ) :
+    
+        '''
+        missed( )
+        
+        Returns the number of messages that this process has missed since it
+        called open( ), because they were dropped or overwritten by the overflow
+        policy of the queue. See PySyncQ.
+        '''
+        
+        return  self.s[ self.slot * hdr.lenslot + hdr.smiss ]  if  self.bit \
+                else  0
+    
+    
+    # Liveness #
+    
+    def  heartbeat ( self ) :
+    
+        '''
+        heartbeat( )
+        
+        Marks this process as alive, by setting the last activity time of its
+        reader slot. This happens automatically whenever the process looks for
+        new messages. A process that goes for long periods without doing so,
+        such as one that blocks on pop( timer = None ), should call heartbeat( )
+        regularly if other processes call reap( ) with a timeout.
+        '''
+        
+        # Only this instance writes its own slot's time, so no lock is needed
+        if  self.bit :
+            self.s[ self.slot * hdr.lenslot + hdr.stime ] = monotonic_ns( )
+    
+    
+    def  reap ( self , timeout = None ) :
+    
+        '''
+        reap( timeout = None )
+        
+        Unregisters every process that ended without calling close( ), for
+        instance because it crashed or was killed. Its unread messages are
+        released, and any reservation that it left is aborted, so that the
+        queue keeps flowing. If timeout is a number of seconds, then processes
+        that are still alive but have not shown any activity for longer than
+        that are detached; see heartbeat( ). Each raises Detached when it next
+        reads from the queue, as under the detach overflow policy of PySyncQ.
+        Returns the number of processes that were unregistered or detached.
+        
+        Writers reap processes that have ended automatically, whenever there is
+        not enough free space in the queue. So does open( ) when there is no
+        free reader slot. Processes are identified by their process ID. Ended
+        processes can only be detected on POSIX systems, so that reap( ) must
+        be given a timeout, elsewhere.
+        '''
+        
+        with  self.cond , self._newest( ) : return  self._reap( timeout )
+
+
+class  PySyncMultiQ :
+
+    '''
+    class pysyncq.PySyncMultiQ( channels , name = None , create = True ,
+                                size = <Page Size> , start = None , **kargs )
+    
+    Creates a group of independent synchronisation queues, one per channel,
+    inside a single block of shared memory. channels is either an int giving
+    the number of channels, which are then named 0, 1, 2, etc., or an iterable
+    of unique channel names. name, create, and start are as for PySyncQ. size
+    is the size of each channel's queue body, in bytes, or a sequence that
+    gives the size of each channel in turn. Any further keyword arguments,
+    such as readers or overflow, are passed on to every channel's PySyncQ.
+    With create False, an existing group is attached as it is, by any process.
+    As for PySyncQ, the locks of the group and its channels are named, so that
+    attaching needs a POSIX system.
+    
+    Each channel is a PySyncQ that is found by indexing the group, as in
+    group[ channel ]. Channels have their own lock, so that processes using
+    different channels never wait for each other. But a process can wait for a
+    new message on any one of several channels by calling wait( ). Or it can
+    pop( ) from several channels in order of priority, so that channels act as
+    priority lanes. Since each channel has its own memory, a full channel
+    never leaves another without room for its messages.
+    
+    Each process must call the group's .open( ) method once, which registers it
+    with every channel. And .close( ) once, rather than closing channels one by
+    one.
+    '''
+
+    #-- Double underscore methods --#
+
+    def  __init__ ( self , channels , name = None , create = True ,
+                           size = hdr.defsize , start = None , **kargs ) :
+        
+        # Name channels by number
+        if  isinstance( channels , int ) : channels = range( channels )
+        
+        # Remember initialisation parameters
+        self.channels = tuple( channels )
+        self.name = name
+        self.create = create
+        self.size = size
+        self.start = start
+        
+        if  not self.channels :
+            raise  ValueError( 'There must be at least one channel' )
+        
+        if  len( set( self.channels ) ) != len( self.channels ) :
+            raise  ValueError( f'Channel names must be unique, {channels=}' )
+        
+        # Attaching needs named semaphores
+        if  not create  and  osname != 'posix' :
+            raise  NotImplementedError( 'attach needs a POSIX system' )
+        
+        # Get default start method
+        if  self.start is None : self.start = mp.get_start_method( )
+        
+        # ID of the process that made the group, if it was this one. Its
+        # resource tracker tracks the shared memory, as for PySyncQ.
+        self.maker = mp.current_process( ).pid  if  create  else  None
+        
+        # Size of each channel's queue body
+        sizes = [ size ] * len( self.channels )  if  isinstance( size , int ) \
+                else  list( size )
+        
+        if  len( sizes ) != len( self.channels ) :
+            raise  ValueError( f'Need one size per channel, {size=}' )
+        
+        # Bytes taken by each channel's queue, which starts on a queue counter
+        # boundary, and the offset of each one
+        n = hdr.sizequeuehead  +  \
+            kargs.get( 'readers' , hdr.maxreaders ) * hdr.sizeslot  +  \
+            kargs.get( 'intern'  , 0 ) * hdr.sizeintern
+        N = [ n + z  +  -( n + z ) % hdr.nbytequeuehead  for z in sizes ]
+        O = [ hdr.sizegrouphead + sum( N[ : j ] ) for j in range( len( N ) ) ]
+        
+        # Create the shared memory, for the group header and every channel.
+        # Guarantee that it is initialised to zeros. Or attach to it, as it is,
+        # without the resource tracker of this process.
+        if  create :
+            self.shm = sm.SharedMemory( name , create ,
+                                        hdr.sizegrouphead  +  sum( N ) )
+            hdr.tracked.add( self.shm._name )
+            self.shm.buf[:] = bytes( self.shm.size )
+        else :
+            self.shm = hdr.shmopen( name )
+        
+        # Lock for waiting on any channel, and the condition variable that
+        # channels notify when they publish messages, if anyone is waiting.
+        # Named on POSIX systems, like those of the channels.
+        if  osname == 'posix' :
+            ( self.lock , self.ready ) = self._sync( create )
+        else :
+            self.lock  = mp.RLock( )
+            self.ready = mp.Condition( self.lock )
+        
+        # Make memoryview of the group header
+        self._map( )
+        if  create : self.h[ hdr.gchan ] = len( self.channels )
+        
+        # Make one PySyncQ per channel, in turn
+        try :
+            
+            self.queues = {
+                c : PySyncQ( f'{ self.shm.name }/{ c }' , create , z ,
+                             self.start , group = self , offset = o , **kargs )
+                for ( c , z , o ) in zip( self.channels , sizes , O ) }
+        
+        # Invalid PySyncQ arguments. Don't leave the shared memory behind, if
+        # it was made here. Nor the semaphores.
+        except  Exception :
+            
+            self._unmap( )
+            self.shm.close( )
+            if  create :
+                hdr.shmunlink( self.shm.name )
+                if  osname == 'posix' :
+                    for  n in self._semnames( ) : hdr.semunlink( n )
+            raise
+        
+        # Release un-pickleable resources, as for PySyncQ
+        if  self.start == 'spawn' : self._unmap( )
+    
+    
+    def  __getitem__ ( self , channel ) :
+    
+        'Returns the PySyncQ of the named channel.'
+        
+        return  self.queues[ channel ]
+    
+    
+    def  __iter__ ( self ) :
+    
+        'Iterates over channel names.'
+        
+        return  iter( self.channels )
+    
+    
+    def  __len__ ( self ) :
+        
+        return  len( self.channels )
+    
+    
+    def  __setstate__ ( self , state ) :
+    
+        '''
+        Unpickles a PySyncMultiQ that was passed to a spawned child process;
+        see PySyncQ.__setstate__.
+        '''
+        
+        self.__dict__.update( state )
+        
+        if  self.create :
+            hdr.tracked.add( self.shm._name )
+        else :
+            hdr.shmuntrack( self.shm )
+    
+    
+    #-- Single underscore methods for internal class use --#
+    
+    def  _map ( self ) :
+    
+        'Makes memoryview h of the group header counters.'
+        
+        self.h = self.shm.buf[ : hdr.sizegrouphead ].cast( hdr.fmtqueuehead )
+    
+    
+    def  _unmap ( self ) :
+    
+        'Releases the memoryview made by _map.'
+        
+        self.h.release( )
+        self.h = None
+    
+    
+    def  _semnames ( self ) :
+    
+        '''
+        Returns the names of the group's POSIX semaphores, which are named after
+        its shared memory. The lock goes first, and then three for ready.
+        '''
+        
+        return  [ f'/pysyncq.{ self.shm.name.lstrip( "/" ) }.{ k }'
+                  for k in range( 4 ) ]
+    
+    
+    def  _sync ( self , create ) :
+    
+        '''
+        Returns the tuple ( lock , ready ) of the group's named lock and
+        condition variable. Made and tracked if create is True, or else opened,
+        as for PySyncQ._sync.
+        '''
+        
+        N = self._semnames( )
+        
+        if  create :
+            for  name in N : hdr.semunlink( name )
+        
+        lock  = hdr.semopen( sync.RLock , N[ 0 ] , create )
+        ready = hdr.semcond( lock , N[ 1 : ] , create )
+        
+        if  create :
+            for  name in N : hdr.semtrack( name )
+        
+        return  ( lock , ready )
+    
+    
+    def  _notify ( self ) :
+    
+        '''
+        Called by a channel that has published new messages. Wakes up any
+        process that is waiting on the group. Checking for waiting processes
+        without the group lock is safe, because the channel's lock is held. A
+        waiting process counts itself before checking a channel, and it checks
+        the channel with the channel's lock; see wait( ).
+        
+        DO NOT USE THIS unless the channel's lock has been acquired, first.
+        '''
+        
+        if  not self.h[ hdr.gwait ] : return
+        
+        # Bump the generation, so that a process that has checked its channels
+        # but is not yet waiting will check them again
+        with  self.ready :
+            self.h[ hdr.ggen ] += 1
+            self.ready.notify_all( )
+    
+    
+    #-- Principal API methods --#
+    
+    # Creation / Deletion #
+    
+    def  open ( self , sender = None , filtself = True ) :
+    
+        '''
+        open( sender = pid , filtself = True ) registers the current process
+        with every channel of the group, as for PySyncQ.open.
+        '''
+        
+        # Child process was spawned, recover the group header
+        if  self.h is None : self._map( )
+        
+        with  self.ready : self.h[ hdr.gproc ] += 1
+        
+        for  q in self.queues.values( ) : q.open( sender , filtself )
+    
+    
+    def  close ( self ) :
+    
+        '''
+        Closes every channel, and then the shared memory. And unlinks if this
+        is the last closure.
+        '''
+        
+        # Return immediately if shared memory was already closed
+        if  not self.shm : return
+        
+        for  q in self.queues.values( ) : q.close( )
+        
+        # Decrement the process counter, and remember whether we must unlink
+        with  self.ready :
+            if  self.h[ hdr.gproc ] : self.h[ hdr.gproc ] -= 1
+            noproc = self.h[ hdr.gproc ] == 0
+        
+        self._unmap( )
+        self.shm.close( )
+        
+        # Unlink if this is the last close, along with the semaphores. Or else
+        # leave them to the processes that still use them, as PySyncQ does.
+        if  noproc :
+            hdr.shmunlink( self.shm.name )
+        elif  self.maker == mp.current_process( ).pid :
+            hdr.tracked.discard( self.shm._name )
+            hdr.shmuntrack( self.shm )
+        
+        if  osname == 'posix' :
+            for  name in self._semnames( ) :
+                if  noproc :
+                    hdr.semunlink( name )
+                elif  self.maker == mp.current_process( ).pid :
+                    hdr.semuntrack( name )
+        
+        self.shm = None
+    
+    
+    # Message handling #
+    
+    def  wait ( self , channels = None , timer = 0.5 ) :
+    
+        '''
+        wait( channels = None , timer = 0.5 )
+        
+        Waits until there is a message to read on any of the named channels, or
+        on any channel at all if channels is None. Returns the list of channels
+        with messages that this process has not read, which pop( ) or lease( )
+        can then fetch. These may be screened, so that pop( ) returns None. If
+        timer expires first then an empty list is returned. timer is a number
+        of seconds, or None to wait indefinitely, as for PySyncQ.pop.
+        '''
+        
+        # Channels to check, and the time that we started
+        C = [ self.queues[ c ] for c in ( self.channels  if  channels is None
+                                          else  channels ) ]
+        if  timer : tin = time( )
+        
+        # Count this process as waiting before checking channels. Any message
+        # that is published from now on, but is missed by the check, changes
+        # the generation.
+        with  self.ready :
+            self.h[ hdr.gwait ] += 1
+            g = self.h[ hdr.ggen ]
+        
+        try :
+            
+            while  True :
+                
+                # Channels with unread messages
+                R = [ ]
+                
+                for  q in C :
+                    with  q.cond :
+                        if  q._popred( ) : R.append( q )
+                
+                if  R : return  [ c for c in self.channels
+                                    if  self.queues[ c ] in R ]
+                
+                # How much time has passed since the call to wait( )?
+                if  timer is None :
+                    dt = None
+                else :
+                    dt = timer - ( time( ) - tin )  if  timer  else  0
+                    if  dt <= 0 : return  [ ]
+                
+                # Nothing was published since the check. Wait for a channel to
+                # notify the group. Never hold the group lock while taking a
+                # channel's lock, or else this process and a writer deadlock.
+                with  self.ready :
+                    if  self.h[ hdr.ggen ] == g : self.ready.wait( dt )
+                    g = self.h[ hdr.ggen ]
+        
+        # No longer waiting
+        finally :
+            with  self.ready : self.h[ hdr.gwait ] -= 1
+    
+    
+    def  pop ( self , channels = None , block = False , timer = 0.5 ,
+                      decode = True ) :
+    
+        '''
+        pop( channels = None , block = False , timer = 0.5 , decode = True )
+        
+        Pops the next message from the first of the named channels that has
+        one, or from the first of all channels if channels is None. So channels
+        are listed in order of priority. A message is only popped from a
+        channel once every channel before it has none to read, and messages of
+        the same channel are popped in order, as always. Returns the tuple
+        ( channel , message ), where message is as returned by PySyncQ.pop. If
+        no channel has a message then None is returned, unless block is True.
+        Then pop waits for a message on any of the channels; see wait( ).
+        block, timer and decode are as for PySyncQ.pop.
+        '''
+        
+        # Channels in order of priority, and the time that we started
+        C = self.channels  if  channels is None  else  tuple( channels )
+        if  timer : tin = time( )
+        
+        while  True :
+            
+            # Highest priority message first
+            for  c in C :
+                if  ( m := self.queues[ c ].pop( decode = decode ) ) :
+                    return  ( c , m )
+            
+            if  not block : return  None
+            
+            # How much time is left? Then wait for a message on any channel.
+            # The channels are checked again, in order, even if the message
+            # that woke us was on a low priority channel.
+            if  timer is None :
+                dt = None
+            else :
+                dt = timer - ( time( ) - tin )  if  timer  else  0
+            
+            if  not self.wait( C , dt ) : return  None
+
+
+class  PySyncPipe :
+
+    '''
+    class pysyncq.PySyncPipe( name = None , create = True ,
+                              size = <Page Size> , start = None ,
+                              spin = 0 , yields = 0 , codec = None )
+    
+    Creates a single-producer, single-consumer queue, which has exactly one
+    writer process and one reader process. name, create, size, start, spin,
+    yields and codec are as for PySyncQ. size is the number of bytes in the
+    pipe body, and 192 bytes are added for the pipe's header. With create
+    False, the existing pipe called name is attached as it is, by any process,
+    and size is taken from it. As for PySyncQ, its lock and condition variable
+    are named, so attaching needs a POSIX system. There are no reader slots,
+    overflow policies, subscriptions or reservations.
+    Messages have a type and a body, but no sender, since there is only one.
+    
+    No lock is taken to append or pop a message. The writer alone moves the
+    tail of the pipe, and the reader alone moves the head, and each one sits in
+    a separate cache line of the header. The writer publishes a message by
+    moving the tail past it, after it is written. The reader frees a message by
+    moving the head past it, after it is read. A lock is only taken by a
+    process that must wait, when it finds no message or no free space, and
+    only if it is asked to block. Even then, it spins first; see PySyncQ.
+    
+    Each process calls .open( 'w' ) to take the writer's end of the pipe, or
+    .open( 'r' ) to take the reader's end. An end that was taken by a process
+    that has since ended can be taken again. An instance must only be used by
+    one thread.
+    '''
+
+    #-- Double underscore methods --#
+
+    def  __init__ ( self , name = None , create = True , size = hdr.defsize ,
+                           start = None , spin = 0 , yields = 0 ,
+                           codec = None ) :
+        
+        # Remember initialisation parameters
+        self.name = name
+        self.create = create
+        self.size = size
+        self.start = start
+        self.spin = spin
+        self.yields = yields
+        self.codec = cdc.Text( )  if  codec is None  else  codec
+        
+        # Messages start on a counter boundary
+        if  size < hdr.sizepipemsg  or  size % hdr.nbytequeuehead :
+            raise  ValueError( f'size must be a multiple of '
+                               f'{ hdr.nbytequeuehead }, {size=}' )
+        
+        # Attaching needs named semaphores
+        if  not create  and  osname != 'posix' :
+            raise  NotImplementedError( 'attach needs a POSIX system' )
+        
+        # Get default start method
+        if  self.start is None : self.start = mp.get_start_method( )
+        
+        # Check validity of start method string
+        if  self.start not in mp.get_all_start_methods( ) :
+            raise  ValueError( f'Not a valid start method, {start=}' )
+        
+        # ID of the process that made the pipe, if it was this one, as for
+        # PySyncQ
+        self.maker = mp.current_process( ).pid  if  create  else  None
+        
+        # The end of the pipe that this instance opened, 'w' or 'r'. The
+        # instance's own copy of the cursor that it moves. And the last value
+        # that it saw of the other one's cursor, plus the size of the pipe body
+        # for the writer.
+        self.end   = None
+        self.pos   = 0
+        self.limit = 0
+        
+        # Lock held by this instance, that makes memory barriers; see _fence.
+        # Made by open( ), since it can't be pickled.
+        self.barrier = None
+        
+        # Create the shared memory, initialised to zeros. Tracked as for
+        # PySyncQ.
+        if  create :
+            self.shm = sm.SharedMemory( name , True , hdr.sizepipehead + size )
+            hdr.tracked.add( self.shm._name )
+            self.shm.buf[:] = bytes( self.shm.size )
+        
+        # Or attach to an existing pipe, as it is
+        else :
+            self.shm  = hdr.shmopen( name )
+            self.size = self.shm.size - hdr.sizepipehead
+        
+        # Lock and condition variable, for processes that wait. Named on POSIX
+        # systems, so that either end can wake the other, however it got the
+        # pipe.
+        if  osname == 'posix' :
+            ( _ , self.cond ) = self._sync( create )
+        else :
+            self.cond = mp.Condition( mp.Lock( ) )
+        
+        # Make memoryviews. Release them, if they can't be pickled.
+        self._map( )
+        if  self.start == 'spawn' : self._unmap( )
+    
+    
+    def  __call__ ( self , *args , **kargs ) :
+    
+        '''
+        Iterates over repeat calls to pop( ) with the given arguments, until no
+        messages are available, or the blocking timer expires.
+        '''
+        
+        while  ( m := self.pop( *args , **kargs ) ) : yield m
+    
+    
+    def  __iter__ ( self ) :
+    
+        'Returns iterator using default pop() input arguments.'
+        
+        return  self( )
+    
+    
+    def  __str__ ( self ) :
+        
+        return ( f'PySyncPipe(name={self.name},size={self.size},'
+                 f'end={self.end},pos={self.pos})' )
+    
+    
+    def  __setstate__ ( self , state ) :
+    
+        'Unpickles a PySyncPipe in a spawned child process, as for PySyncQ.'
+        
+        self.__dict__.update( state )
+        
+        if  self.create :
+            hdr.tracked.add( self.shm._name )
+        else :
+            hdr.shmuntrack( self.shm )
+    
+    
+    #-- Single underscore methods for internal class use --#
+    
+    def  _map ( self ) :
+    
+        '''
+        Makes memoryview h of the pipe header counters, and b of the pipe body.
+        '''
+        
+        self.h = self.shm.buf[ : hdr.sizepipehead ].cast( hdr.fmtqueuehead )
+        self.b = self.shm.buf[ hdr.sizepipehead : ]
+    
+    
+    def  _unmap ( self ) :
+    
+        'Releases the memoryviews made by _map.'
+        
+        self.h.release( )
+        self.b.release( )
+        self.h = self.b = None
+    
+    
+    def  _fence ( self ) :
+    
+        '''
+        A full memory barrier. Memory accesses that this process makes before
+        it are seen by other processes before any that it makes afterwards.
+        Releasing a lock orders every access before the release ahead of it,
+        and acquiring a lock orders every access after the acquire behind it.
+        '''
+        
+        self.barrier.release( )
+        self.barrier.acquire( )
+    
+    
+    def  _wake ( self , k ) :
+    
+        '''
+        Wakes up the other end of the pipe, if header counter k says that it is
+        waiting. The barrier makes sure that the other end either sees the
+        cursor that this end just moved, or that this end sees k set; see
+        _wait.
+        '''
+        
+        self._fence( )
+        
+        if  self.h[ k ] :
+            with  self.cond : self.cond.notify_all( )
+    
+    
+    def  _wait ( self , k , pred , timer ) :
+    
+        '''
+        Waits up to timer seconds, or indefinitely if timer is None, until
+        predicate function pred returns True. Spins first; see PySyncQ._spin.
+        Then sets header counter k while it sleeps on the condition variable,
+        so that the other end wakes it up; see _wake. Returns the last value
+        of pred.
+        '''
+        
+        tend = None  if  timer is None  else  time( ) + timer
+        
+        if  self._spin( pred , tend ) : return  True
+        
+        with  self.cond :
+            
+            self.h[ k ] = 1
+            self._fence( )
+            
+            try :
+                return  self.cond.wait_for( pred , tend  and
+                                                   max( tend - time( ) , 0 ) )
+            finally :
+                self.h[ k ] = 0
+    
+    
+    # Same wait strategy as PySyncQ
+    _spin = PySyncQ._spin
+    
+    # Named semaphores as for PySyncMultiQ, a lock and one condition variable
+    _semnames = PySyncMultiQ._semnames
+    _sync     = PySyncMultiQ._sync
+    
+    
+    def  _room ( self , n ) :
+    
+        '''
+        Returns True if the writer has n free bytes at the tail of the pipe.
+        Reads the reader's head, so only call this once the bytes seen last
+        time are used up.
+        '''
+        
+        self.limit = self.h[ hdr.phead ]  +  len( self.b )
+        
+        return  self.pos + n <= self.limit
+    
+    
+    def  _space ( self , n , block , timer ) :
+    
+        '''
+        Returns True if the writer has n free bytes at the tail of the pipe.
+        Looks at the head only if the free bytes seen so far are too few. Then
+        waits for them, if block is True, as for append.
+        '''
+        
+        return  self.pos + n <= self.limit  or  self._room( n )  or  \
+                block  and  self._wait( hdr.pwspc , lambda : self._room( n ) ,
+                                        timer )
+    
+    
+    def  _ready ( self ) :
+    
+        '''
+        Returns True if there is a message for the reader. Reads the writer's
+        tail, so only call this once the messages seen last time are read.
+        '''
+        
+        self.limit = self.h[ hdr.ptail ]
+        
+        return  self.pos != self.limit
+    
+    
+    #-- Principal API methods --#
+    
+    # Creation / Deletion #
+    
+    def  open ( self , end ) :
+    
+        '''
+        open( end ) takes the writer's end of the pipe for this process, if
+        end is 'w', or the reader's end, if end is 'r'. Raises ValueError if a
+        process that is still running has it already.
+        '''
+        
+        if  end not in ( 'w' , 'r' ) :
+            raise  ValueError( f'end must be \'w\' or \'r\', {end=}' )
+        
+        # Child process was spawned, recover the memoryviews
+        if  self.h is None : self._map( )
+        
+        # Header counter with the process ID of the end's owner
+        k   = hdr.pwpid  if  end == 'w'  else  hdr.prpid
+        pid = mp.current_process( ).pid
+        
+        with  self.cond :
+            
+            if  self.h[ k ]  and  hdr.pidalive( self.h[ k ] ) :
+                raise  ValueError( f'Pipe end {end!r} is taken by process '
+                                   f'{ self.h[ k ] }' )
+            
+            self.h[ k ] = pid
+            self.h[ hdr.pproc ] += 1
+            
+            # Carry on from wherever the end was left
+            self.pos = self.h[ hdr.ptail  if  end == 'w'  else  hdr.phead ]
+        
+        self.end = end
+        
+        # Cursors seen so far
+        if  end == 'w' :
+            self._room( 0 )
+        else :
+            self._ready( )
+        
+        # Held from now on, see _fence
+        self.barrier = Lock( )
+        self.barrier.acquire( )
+    
+    
+    def  close ( self ) :
+    
+        '''
+        Gives up this process's end of the pipe, and closes the shared memory.
+        And unlinks it if this is the last closure.
+        '''
+        
+        # Return immediately if shared memory was already closed
+        if  not self.shm : return
+        
+        # Child process was spawned but never opened the pipe
+        if  self.h is None : self._map( )
+        
+        with  self.cond :
+            
+            if  self.end is not None :
+                self.h[ hdr.pwpid  if  self.end == 'w'  else  hdr.prpid ] = 0
+                self.h[ hdr.pproc ] -= 1
+            
+            # Remember whether we must unlink
+            noproc = self.h[ hdr.pproc ] == 0
+        
+        self._unmap( )
+        self.shm.close( )
+        
+        # Unlink if this is the last close, along with the semaphores. Or else
+        # leave them to the process that still uses them, as PySyncQ does.
+        if  noproc :
+            hdr.shmunlink( self.shm.name )
+        elif  self.maker == mp.current_process( ).pid :
+            hdr.tracked.discard( self.shm._name )
+            hdr.shmuntrack( self.shm )
+        
+        if  osname == 'posix' :
+            for  name in self._semnames( ) :
+                if  noproc :
+                    hdr.semunlink( name )
+                elif  self.maker == mp.current_process( ).pid :
+                    hdr.semuntrack( name )
+        
+        ( self.shm , self.end , self.barrier ) = ( None , None , None )
+    
+    
+    # Message handling #
+    
+    def  append ( self , msgtype = '' , msg = '' , block = False ,
+                         timer = 0.5 ) :
+    
+        '''
+        append( msgtype = '' , msg = '' , block = False , timer = 0.5 )
+        
+        Writes a message of type msgtype to the tail of the pipe, with msg as
+        its body, encoded by the codec. Only the writer may append. If there is
+        not enough free space then MemoryError is raised, unless block is True.
+        Then append waits up to timer seconds, or indefinitely if timer is
+        None, for the reader to free enough. MemoryError is raised if the timer
+        expires first, or if the message is bigger than the pipe. Returns True.
+        '''
+        
+        if  self.end != 'w' :
+            raise  ValueError( 'Only the writer\'s end of the pipe can append' )
+        
+        # Encode the type and body
+        btype = hdr.tobytes( msgtype )
+        parts = self.codec.encode( msg )
+        nbody = sum( len( p ) for p in parts )
+        
+        if  len( btype ) > hdr.maxpipetype :
+            raise  ValueError( f'Message type exceeds { hdr.maxpipetype } '
+                               f'bytes, {msgtype=}' )
+        
+        # Total bytes in the message, up to the next counter boundary
+        n  = hdr.sizepipemsg + len( btype ) + nbody
+        n += -n % hdr.nbytequeuehead
+        
+        if  n > len( self.b ) :
+            raise  MemoryError( f'{ n } byte message > '
+                                f'{ len( self.b ) } byte pipe' )
+        
+        # Where the message starts
+        i = self.pos % len( self.b )
+        
+        # It won't fit before the end of the pipe body. Skip the bytes there,
+        # and publish that at once. The reader must free them before the
+        # message can have the room at the start.
+        if  ( r := len( self.b ) - i ) < n :
+            
+            if  not self._space( r , block , timer ) :
+                raise  MemoryError( f'{ r } bytes to skip > '
+                                    f'{ self.limit - self.pos } free bytes.' )
+            
+            hdr.pipemsg.pack_into( self.b , i , r - hdr.sizepipemsg ,
+                                   hdr.fvoid , 0 )
+            if  not hdr.tso : self._fence( )
+            self.pos += r
+            self.h[ hdr.ptail ] = self.pos
+            self._wake( hdr.prmsg )
+            i = 0
+        
+        # Wait for free space, if we may
+        if  not self._space( n , block , timer ) :
+            raise  MemoryError( f'{ n } byte message > '
+                                f'{ self.limit - self.pos } free bytes.' )
+        
+        # Write the message
+        hdr.pipemsg.pack_into( self.b , i , nbody ,
+                               self.codec.id << hdr.shcodec , len( btype ) )
+        i += hdr.sizepipemsg
+        self.b[ i : i + len( btype ) ] = btype
+        i += len( btype )
+        for  p in parts :
+            self.b[ i : i + len( p ) ] = p
+            i += len( p )
+        
+        # Publish it. The message must be seen before the tail moves.
+        if  not hdr.tso : self._fence( )
+        self.pos += n
+        self.h[ hdr.ptail ] = self.pos
+        
+        # Wake the reader, if it waits
+        self._wake( hdr.prmsg )
+        
+        return  True
+    
+    
+    def  pop ( self , block = False , timer = 0.5 , decode = True ) :
+    
+        '''
+        pop( block = False , timer = 0.5 , decode = True )
+        
+        Reads the message at the head of the pipe, and returns tuple
+        ( type , msg ). Only the reader may pop. If there is no message then
+        None is returned, unless block is True. Then pop waits up to timer
+        seconds, or indefinitely if timer is None, for a message. If decode is
+        False then the type and body are returned as bytes. Otherwise, the type
+        is decoded to str, and the body by the codec that encoded it.
+        '''
+        
+        if  self.end != 'r' :
+            raise  ValueError( 'Only the reader\'s end of the pipe can pop' )
+        
+        while  True :
+            
+            # Look for a message at the tail, only if those seen are read. Then
+            # wait for one, if we may.
+            if  self.pos == self.limit  and  not self._ready( )  and  \
+                not ( block  and  self._wait( hdr.prmsg , self._ready ,
+                                              timer ) ) :
+                return  None
+            
+            # The message must not be read before the tail moved
+            if  not hdr.tso : self._fence( )
+            
+            # Message header
+            i = self.pos % len( self.b )
+            ( nbody , flags , ntype ) = hdr.pipemsg.unpack_from( self.b , i )
+            
+            if  not flags & hdr.fvoid : break
+            
+            # Skipped bytes at the end of the pipe body. Free them, since the
+            # writer may be waiting for them.
+            self.pos += len( self.b ) - i
+            self.h[ hdr.phead ] = self.pos
+            self._wake( hdr.pwspc )
+        
+        # Copy the type and body
+        i    += hdr.sizepipemsg
+        btype = self.b[ i : i + ntype ].tobytes( )
+        i    += ntype
+        body  = self.b[ i : i + nbody ].tobytes( )
+        
+        # Free the message. It must be read before the head moves.
+        n  = hdr.sizepipemsg + ntype + nbody
+        n += -n % hdr.nbytequeuehead
+        if  not hdr.tso : self._fence( )
+        self.pos += n
+        self.h[ hdr.phead ] = self.pos
+        
+        # Wake the writer, if it waits
+        self._wake( hdr.pwspc )
+        
+        if  not decode : return  btype , body
+        
+        return  btype.decode( ) , cdc.decode( flags , body )
+    
+    
+    def  drain ( self , decode = True ) :
+    
+        '''
+        drain( decode = True )
+        
+        Reads every message in the pipe, without blocking. Returns a list of
+        ( type , msg ) tuples, as by pop( ).
+        '''
+        
+        return  list( self( decode = decode ) )
+
+
+#--- SUPPORTING CLASSES ---#
+
+class  Lease :
+
+    '''
+    class pysyncq.Lease( q , h , slno , sender , msgtype , body , shm = None )
+    
+    A message that has been read from PySyncQ q by its lease( ) method, but
+    which remains in the queue. Attributes sender and type give the message
+    sender and type. body is a read-only memoryview of the message body in q's
+    shared memory, or a tuple of two when the body wraps around the end of the
+    queue body. h is the memoryview of the message's counters, and slno is the
+    message's serial number. If the message was spilled, then body is a view of
+    SharedMemory block shm, instead, which is closed on release. Attribute time
+    is when the message was published, in nanoseconds; see time.monotonic_ns.
+    
+    Calling .release( ) clears the reader's bit in the message's read counter,
+    after which the memoryviews in body must no longer be used. A Lease is a
+    context manager that releases itself on exit. And it unpacks like the tuple
+    returned by pop, as in ( sender , msgtype , body ) = lease.
+    '''
+    
+    def  __init__ ( self , q , h , slno , sender , msgtype , body ,
+                           shm = None ) :
+        
+        self.q      = q
+        self.h      = h
+        self.slno   = slno
+        self.sender = sender
+        self.type   = msgtype
+        self.body   = body
+        self.shm    = shm
+        self.time   = hdr.msgtime( h )  if  q.timed  else  None
+        
+        # Register with the queue, so that close( ) can find unreleased leases
+        q.leases.add( self )
+    
+    
+    def  __enter__ ( self ) :
+        
+        return  self
+    
+    
+    def  __exit__ ( self , *exc ) :
+        
+        self.release( )
+    
+    
+    def  __iter__ ( self ) :
+        
+        return  iter( ( self.sender , self.type , self.body ) )
+    
+    
+    def  tobytes ( self ) :
+    
+        '''
+        Returns a copy of the message body as a byte string.
+        '''
+        
+        if  type( self.body ) is tuple :
+            return  b''.join( v.tobytes( ) for v in self.body )
+        
+        return  self.body.tobytes( )
+    
+    
+    def  decode ( self ) :
+    
+        '''
+        Returns the message body decoded by the codec that encoded it, as pop( )
+        would. But the body is not copied, unless it wraps around the end of
+        the queue body. So a NumPy array from the Array codec is a view of
+        shared memory, which must not be used after the lease is released.
+        '''
+        
+        return  cdc.decode( self.h[ hdr.iflag ] ,
+                            self.tobytes( )  if  type( self.body ) is tuple
+                            else  self.body )
+    
+    
+    def  release ( self ) :
+    
+        '''
+        Release the leased message back to the queue. Safe to call repeatedly.
+        Returns False if the message was overwritten before it was released, in
+        which case the body that was read from it is not valid. Otherwise,
+        returns True.
+        '''
+        
+        # Already released
+        if  self.h is None : return  True
+        
+        # Release memoryviews of the message body
+        for  v in ( self.body if type( self.body ) is tuple else
+                    ( self.body , ) ) : v.release( )
+        
+        # And the block of a spilled message
+        if  self.shm is not None : self.shm.close( )
+        
+        # Clear our read bit, freeing queue memory as necessary
+        self.q.leases.discard( self )
+        n = self.q._done( self.slno , self.h )
+        
+        # Signal that the lease has been released
+        self.h    = None
+        self.body = None
+        
+        return  not n
+
+
+class  Reservation :
+
+    '''
+    class pysyncq.Reservation( q , i , n , r , body , flags = 0 )
+    
+    Space for a message in PySyncQ q that has been reserved by its reserve( )
+    method, but which has not yet been published. The message starts at byte i
+    of the queue body and has n bytes in total, followed by r skipped bytes.
+    body is a writable memoryview of the message body in q's shared memory, or
+    a tuple of two when the body wraps around the end of the queue body.
+    flags are the message flags that are published with it.
+    
+    Calling .commit( ) publishes the message. Calling .abort( ) discards it.
+    Either way, the memoryviews in body must no longer be used. A Reservation
+    is a context manager that returns body on entry. On exit, it commits if the
+    with statement completed normally, and aborts if an exception was raised.
+    '''
+    
+    def  __init__ ( self , q , i , n , r , body , flags = 0 ) :
+        
+        self.q     = q
+        self.i     = i
+        self.n     = n
+        self.r     = r
+        self.body  = body
+        self.flags = flags
+        
+        # Register with the queue, so that close( ) can find reservations
+        q.reservations.add( self )
+    
+    
+    def  __enter__ ( self ) :
+        
+        return  self.body
+    
+    
+    def  __exit__ ( self , exc_type , *exc ) :
+        
+        if  exc_type is None :
+            self.commit( )
+        else :
+            self.abort( )
+    
+    
+    def  _release ( self ) :
+    
+        '''
+        Release the body's memoryviews. Returns False if this was already done.
+        '''
+        
+        # Already committed or aborted
+        if  self.body is None : return  False
+        
+        # Release memoryviews of the message body
+        for  v in ( self.body if type( self.body ) is tuple else
+                    ( self.body , ) ) : v.release( )
+        
+        # Signal that the reservation is finished
+        self.q.reservations.discard( self )
+        self.body = None
+        
+        return  True
+    
+    
+    def  commit ( self ) :
+    
+        '''
+        Publish the message. Safe to call repeatedly.
+        '''
+        
+        if  not self._release( ) : return
+        
+        # Commit message, which wakes up any process waiting for it. The queue
+        # can't grow while it is reserved, so it is in the newest generation.
+        with  self.q.cond , self.q._newest( ) :
+            self.q._commit( self.i , self.flags )
+    
+    
+    def  abort ( self ) :
+    
+        '''
+        Discard the message. Safe to call repeatedly. If no later reservation
+        has been made then the space is returned to the queue immediately.
+        Otherwise, the message is published as a void message that every
+        process skips over.
+        '''
+        
+        if  not self._release( ) : return
+        
+        # Withdraw or void the message, in the newest generation
+        with  self.q.cond , self.q._newest( ) :
+            if  not self.q._withdraw( self.i , self.n , self.r ) :
+                self.q._commit( self.i , hdr.fvoid )
+
+
+class  _Newest :
+
+    '''
+    class pysyncq._Newest( q )
+    
+    The context manager returned by PySyncQ q's _newest( ) method. It remembers
+    which generation q reads from, installs the newest one on entry, and
+    installs the remembered one again on exit. A class rather than a
+    contextlib.contextmanager, since it is made on every append and pop, and a
+    generator costs several times more to set up and tear down.
+    '''
+    
+    def  __init__ ( self , q ) :
+        
+        self.q   = q
+        self.gen = q.gen
+    
+    
+    def  __enter__ ( self ) :
+        
+        if  ( n := self.q._root( )[ hdr.igrow ] ) : self.q._install( n )
+    
+    
+    def  __exit__ ( self , *exc ) :
+        
+        self.q._install( self.gen )
 
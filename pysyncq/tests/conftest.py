@@ -0,0 +1,39 @@
+
+'''
+Shared pytest fixtures for the pysyncq tests. Run them from the top of the
+repository with python -m pytest pysyncq/tests.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import glob , itertools , os
+
+# Third party
+import pytest
+
+
+#--- GLOBALS ---#
+
+# Makes each queue name unique within a test session
+counter = itertools.count( )
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  name ( ) :
+
+    '''
+    A fresh shared memory name for one test. Anything that the test leaves
+    behind in /dev/shm under that name is removed afterwards, so that one
+    failure does not cause the next.
+    '''
+
+    n = f'pysyncqtest{ os.getpid( ) }.{ next( counter ) }'
+
+    yield  n
+
+    for  f in glob.glob( f'/dev/shm/{ n }*' )  +  \
+              glob.glob( f'/dev/shm/sem.pysyncq.{ n }*' ) :
+        os.unlink( f )
@@ -0,0 +1,62 @@
+
+'''
+Measure the cost of append and pop in a single process, without any switch
+between processes. One instance appends a batch of small messages, then pops
+them all back, over and over. Prints the best time per append and per pop, in
+microseconds, over all batches. This is the overhead that PySyncQ adds to each
+message, and so the number to compare between versions of pysyncq.
+'''
+
+
+#--- Import block ---#
+
+# Standard library
+import gc , time
+
+# pysyncq
+from pysyncq import pysyncq as pq
+
+
+#--- Globals ---#
+
+# Messages per batch
+batch = 500
+
+# Number of batches
+batches = 100
+
+# Message body
+body = 'body of a message'
+
+
+#--- MAIN ---#
+
+if __name__ == "__main__" :
+
+    # Create new synchronisation queue, and read our own messages
+    q = pq.PySyncQ( name = 'opbench' , size = 2 ** 16 )
+    q.open( 'bench' , filtself = False )
+
+    # We do not want automatic garbage collection to mess up timing
+    gc.disable( )
+
+    # Best time per batch, in seconds
+    ( ta , tp ) = ( float( 'inf' ) , float( 'inf' ) )
+
+    for  _ in range( batches ) :
+
+        t0 = time.perf_counter( )
+        for  i in range( batch ) : q.append( 'type' , body )
+        t1 = time.perf_counter( )
+        for  i in range( batch ) : q.pop( )
+        t2 = time.perf_counter( )
+
+        ( ta , tp ) = ( min( ta , t1 - t0 ) , min( tp , t2 - t1 ) )
+
+    # Report
+    print( f'append (us),{ ta / batch * 1e6 :.3g}' )
+    print( f'pop (us),{ tp / batch * 1e6 :.3g}' )
+
+    # Release queue resources
+    q.close( )
+
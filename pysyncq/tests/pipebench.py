@@ -0,0 +1,159 @@
+
+'''
+Compare the message transfer time of PySyncQ with that of PySyncPipe, when one
+process writes and one process reads. A parent and a child process bounce a
+message back and forth, each blocking between turns. PySyncQ carries messages
+both ways, while there is one PySyncPipe for each direction. Prints a table
+that gives the queue class, the message body size in bytes, and the mean
+one-way transfer time in microseconds with its standard error. Then the same
+again, with both processes spinning for up to spin seconds before they sleep;
+spinning only pays when each process has a processor of its own.
+'''
+
+
+#--- Import block ---#
+
+# Standard library
+import gc , os , time
+import      statistics as stat
+import multiprocessing as mp
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import codec
+
+
+#--- Globals ---#
+
+# Message body sizes, in bytes
+sizes = [ 8 , 1024 , 2 ** 16 ]
+
+# Spin times to compare, in seconds
+spins = [ 0 , 100e-6 ]
+
+# Number of round trips per sample
+transfers = 1_000
+
+# Number of samples per setting
+samples = 10
+
+# Bytes of shared memory for each queue or pipe
+size = 2 ** 20
+
+
+#--- Child functions ---#
+
+def  qfun ( q , spin ) :
+
+    # Open queue, ignoring own messages
+    q.open( 'child' )
+    q.spin = spin
+    gc.disable( )
+
+    # Echo every message until the kill signal
+    for  ( _ , typ , msg )  in  q( block = True , timer = None ) :
+        if  typ == 'kill' : break
+        q.append( 'echo' , msg , block = True , timer = None )
+
+    q.close( )
+
+
+def  pfun ( ping , pong , spin ) :
+
+    # Read from one pipe, and write to the other
+    ping.open( 'r' )
+    pong.open( 'w' )
+    ping.spin = pong.spin = spin
+    gc.disable( )
+
+    # Echo every message until the kill signal
+    for  ( typ , msg )  in  ping( block = True , timer = None ) :
+        if  typ == 'kill' : break
+        pong.append( 'echo' , msg , block = True , timer = None )
+
+    ping.close( )
+    pong.close( )
+
+
+#--- Timing function ---#
+
+def  transtime ( send , recv , msg , N ) :
+
+    # Measure start time
+    tstart = time.perf_counter( )
+
+    # Round trips
+    for  i in range( N ) :
+        send( 'ping' , msg , block = True , timer = None )
+        recv( block = True , timer = None )
+
+    # One-way transfer time in microseconds
+    return  ( time.perf_counter( ) - tstart ) / 2 / N * 1e6
+
+
+def  run ( name , send , recv ) :
+
+    # Burn-in
+    transtime( send , recv , bytes( 8 ) , 100 )
+
+    for  n in sizes :
+
+        # Make message just once, then take samples of the transfer time
+        msg = bytes( n )
+        X = [ transtime( send , recv , msg , transfers )
+              for i in range( samples ) ]
+
+        # Show the result
+        avg = stat.mean( X )
+        sem = stat.stdev( X ) / samples ** 0.5
+        print( f'{name},{n},{avg:.3g},{sem:.2g}' )
+
+
+#--- MAIN ---#
+
+if __name__ == "__main__" :
+
+    # Report
+    print( f'{ os.cpu_count( ) } processors' )
+
+    for  spin in spins :
+
+        print( f'\nSpin {spin*1e6:g} us' )
+        print( 'Queue,Msg bytes,Avg time (us),SEM' )
+
+        # PySyncQ, raw bytes in and out
+        q = pq.PySyncQ( name = 'pipebenchq' , size = size ,
+                        codec = codec.Raw( ) )
+        p = mp.Process( target = qfun , args = ( q , spin ) )
+        p.start( )
+        q.open( 'parent' )
+        q.spin = spin
+        time.sleep( 0.1 )
+        gc.disable( )
+
+        run( 'PySyncQ' , q.append , q.pop )
+
+        q.append( 'kill' , b'' )
+        q.close( )
+        p.join( )
+        gc.enable( )
+
+        # PySyncPipe, one in each direction
+        ping = pq.PySyncPipe( name = 'pipebench0' , size = size ,
+                              spin = spin , codec = codec.Raw( ) )
+        pong = pq.PySyncPipe( name = 'pipebench1' , size = size ,
+                              spin = spin , codec = codec.Raw( ) )
+        p = mp.Process( target = pfun , args = ( ping , pong , spin ) )
+        p.start( )
+        ping.open( 'w' )
+        pong.open( 'r' )
+        time.sleep( 0.1 )
+        gc.disable( )
+
+        run( 'PySyncPipe' , ping.append , pong.pop )
+
+        ping.append( 'kill' , b'' )
+        ping.close( )
+        pong.close( )
+        p.join( )
+        gc.enable( )
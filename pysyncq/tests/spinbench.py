@@ -0,0 +1,149 @@
+
+'''
+Measure the trade-off between message latency and processor time for each wait
+strategy of PySyncQ; see the spin and yields arguments. A parent and a child
+process bounce a small message back and forth, each blocking on pop between
+turns. Prints a table that gives the spin time in microseconds and the number
+of yields, the mean one-way transfer time in microseconds with its standard
+error, and the processor time that both processes used per transfer, also in
+microseconds. Spinning only pays when each process has a processor of its own.
+'''
+
+
+#--- Import block ---#
+
+# Standard library
+import gc , os , time
+import      statistics as stat
+import multiprocessing as mp
+
+# pysyncq
+from pysyncq import pysyncq as pq
+
+
+#--- Globals ---#
+
+# Wait strategies to compare, as ( spin seconds , yields )
+settings = [ ( 0      ,   0 ) ,
+             ( 0      ,  10 ) ,
+             ( 0      , 100 ) ,
+             ( 20e-6  ,   0 ) ,
+             ( 100e-6 ,   0 ) ,
+             ( 1e-3   ,   0 ) ,
+             ( 100e-6 , 100 ) ]
+
+# Number of round trips per sample
+transfers = 1_000
+
+# Number of samples per setting
+samples = 10
+
+
+#--- Child function ---#
+
+def  cfun ( q ) :
+
+    # Open queue, ignoring own messages
+    q.open( 'child' )
+
+    # We do not want automatic garbage collection to mess up timing
+    gc.disable( )
+
+    # Read loop. Wait indefinitely for new messages.
+    for  ( _ , typ , msg )  in  q( block = True , timer = None ) :
+
+        # Kill signal, terminate program
+        if  typ == 'kill' : break
+
+        # Change wait strategy
+        if  typ == 'set' :
+            spin , yields = msg.split( ',' )
+            q.spin , q.yields = float( spin ) , int( yields )
+            q.append( 'ok' )
+
+        # Report processor time used so far
+        elif  typ == 'cpu' :
+            q.append( 'cpu' , repr( time.process_time( ) ) )
+
+        # Echo the message back to the queue
+        else :
+            q.append( 'echo' , msg )
+
+    # Release PySyncQ object
+    q.close( )
+
+
+#--- Timing function ---#
+
+def  transtime ( q , N ) :
+
+    # Processor time of both processes before
+    q.append( 'cpu' )
+    c0 = time.process_time( ) + float( q.pop( True , None )[ 2 ] )
+
+    # Measure start time
+    tstart = time.perf_counter( )
+
+    # Round trips
+    for  i in range( N ) :
+        q.append( 'ping' , 'x' )
+        q.pop( block = True , timer = None )
+
+    # Measure end time
+    tend = time.perf_counter( )
+
+    # Processor time of both processes after
+    q.append( 'cpu' )
+    c1 = time.process_time( ) + float( q.pop( True , None )[ 2 ] )
+
+    # One-way transfer time and processor time per transfer, in microseconds
+    return  ( ( tend - tstart ) / 2 / N * 1e6 , ( c1 - c0 ) / 2 / N * 1e6 )
+
+
+#--- MAIN ---#
+
+if __name__ == "__main__" :
+
+    # Create new synchronisation queue
+    q = pq.PySyncQ( name = 'spinbench' , size = 2 ** 16 )
+
+    # Start the echoing child, then connect to the queue
+    p = mp.Process( target = cfun , args = ( q , ) )
+    p.start( )
+    q.open( 'parent' )
+
+    # Brief wait so that child process can initialise
+    time.sleep( 0.1 )
+    gc.disable( )
+
+    # Report
+    print( f'{ os.cpu_count( ) } processors\n' )
+    print( 'Spin (us),Yields,Avg time (us),SEM,CPU per transfer (us)' )
+
+    for  ( spin , yields ) in settings :
+
+        # Both processes use the same strategy
+        q.spin , q.yields = spin , yields
+        q.append( 'set' , f'{ spin },{ yields }' )
+        q.pop( True , None )
+
+        # Burn-in
+        transtime( q , 100 )
+
+        # Samples of transfer time and processor time
+        X , C = zip( *( transtime( q , transfers ) for i in range( samples ) ) )
+
+        # Show the result
+        avg = stat.mean( X )
+        sem = stat.stdev( X ) / samples ** 0.5
+        cpu = stat.mean( C )
+        print( f'{spin*1e6:g},{yields},{avg:.3g},{sem:.2g},{cpu:.3g}' )
+
+    # Send kill signal
+    q.append( 'kill' )
+
+    # Release queue resources
+    q.close( )
+
+    # Clean up terminated child process
+    p.join( )
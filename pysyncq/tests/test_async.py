@@ -0,0 +1,100 @@
+
+'''
+Tests of the asyncio methods, which wait on wake-up FIFOs in the running event
+loop instead of blocking the thread.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import asyncio , os , time
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+
+
+#--- Globals ---#
+
+pytestmark = pytest.mark.skipif( os.name != 'posix' ,
+                                 reason = 'Wake-up FIFOs need POSIX' )
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  wr ( name ) :
+
+    # A writer that reads nothing, and a reader
+    w = pq.PySyncQ( name , size = 1024 )
+    w.open( 'w' )
+    w.subscribe( 'none' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+    yield  w , r
+    r.close( )
+    w.close( )
+
+
+#--- Tests ---#
+
+def  test_pop_async_times_out ( wr ) :
+
+    ( w , r ) = wr
+
+    t = time.time( )
+    assert  asyncio.run( r.pop_async( timer = 0.1 ) ) is None
+    assert  0.09 < time.time( ) - t < 1
+
+
+def  test_pop_async_woken ( wr ) :
+
+    ( w , r ) = wr
+
+    async def  main ( ) :
+
+        # The message arrives while the reader waits
+        asyncio.get_running_loop( ).call_later( 0.05 , w.append , 't' , 'hi' )
+        return  await r.pop_async( timer = 5 )
+
+    t = time.time( )
+    assert  asyncio.run( main( ) ) == ( 'w' , 't' , 'hi' )
+    assert  time.time( ) - t < 1
+
+
+def  test_append_async_waits_for_space ( wr ) :
+
+    ( w , r ) = wr
+
+    while  True :
+        try :
+            w.append( 't' , 'x' * 60 )
+        except  MemoryError :
+            break
+
+    async def  main ( ) :
+
+        # Reading frees the space for a message as big as those that filled it
+        asyncio.get_running_loop( ).call_later( 0.05 , r.drain )
+        return  await w.append_async( 't' , 'L' * 60 , timer = 5 )
+
+    assert  asyncio.run( main( ) ) is True
+    assert  r.pop( ) == ( 'w' , 't' , 'L' * 60 )
+
+
+def  test_async_for ( wr ) :
+
+    ( w , r ) = wr
+
+    async def  main ( ) :
+
+        loop = asyncio.get_running_loop( )
+        for  k in range( 3 ) :
+            loop.call_later( 0.02 * k , w.append , 't' , str( k ) )
+
+        return  [ m[ 2 ]  async for m in r.iter_async( timer = 0.5 ) ]
+
+    assert  asyncio.run( main( ) ) == [ '0' , '1' , '2' ]
+
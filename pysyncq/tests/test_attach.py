@@ -0,0 +1,93 @@
+
+'''
+Tests of PySyncQ attach, which opens a queue by name from any process, and of
+the clean up of its shared memory and named semaphores.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import glob , os , subprocess , sys , time
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Helpers ---#
+
+def  leftovers ( name ) :
+
+    '''
+    Returns the files in /dev/shm that belong to queue name.
+    '''
+
+    return  glob.glob( f'/dev/shm/{ name }' )  +  \
+            glob.glob( f'/dev/shm/sem.pysyncq.{ name }*' )
+
+
+#--- Tests ---#
+
+def  test_attach_by_name ( name ) :
+
+    q = pq.PySyncQ( name )
+    q.open( 'w' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+        q.append( 'm' , 'hello' )
+        assert  r.pop( )[ 2 ] == 'hello'
+    finally :
+        r.close( )
+        q.close( )
+
+    assert  leftovers( name ) == [ ]
+
+
+def  test_close_order ( name ) :
+
+    # The maker closes first, so the attached reader unlinks everything
+    q = pq.PySyncQ( name )
+    q.open( 'w' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+    q.close( )
+    assert  leftovers( name )
+    r.close( )
+
+    assert  leftovers( name ) == [ ]
+
+
+def  test_no_leak_without_close ( name ) :
+
+    # The resource tracker of the child unlinks the semaphores too, once it
+    # sees that the child has gone
+    code = ( 'import os\n'
+             'from pysyncq import pysyncq as pq\n'
+            f'q = pq.PySyncQ( { name !r} )\n'
+             'q.open( "w" )\n'
+             'q.append( "m" , "lost" )\n'
+             'os._exit( 0 )\n' )
+
+    subprocess.run( [ sys.executable , '-c' , code ] , check = True ,
+                    stderr = subprocess.DEVNULL ,
+                    cwd = os.path.dirname( os.path.dirname(
+                                           os.path.dirname( __file__ ) ) ) )
+
+    for  _ in range( 50 ) :
+        if  not leftovers( name ) : break
+        time.sleep( 0.1 )
+
+    assert  leftovers( name ) == [ ]
+
+
+def  test_remade_queue_not_tracked ( name ) :
+
+    # Once this process unlinks its queue, it must not track a queue of the
+    # same name that another process makes
+    q = pq.PySyncQ( name )
+    q.open( 'w' )
+    q.close( )
+
+    assert  not any( n.endswith( name ) for n in hdr.tracked )
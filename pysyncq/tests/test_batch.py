@@ -0,0 +1,88 @@
+
+'''
+Tests of batches of messages, which are written by append_many and read by
+pop_many, each under one acquisition of the queue lock.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  q ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' , filtself = False )
+    yield  q
+    q.close( )
+
+
+#--- Tests ---#
+
+def  test_append_many_notifies_once ( q , monkeypatch ) :
+
+    # Waiting readers are woken once for the whole batch
+    calls  = [ ]
+    notify = q.cond.notify_all
+    monkeypatch.setattr( q.cond , 'notify_all' ,
+                         lambda : calls.append( 1 ) or notify( ) )
+
+    M = [ ( 't' , str( k ) ) for k in range( 10 ) ]
+    assert  q.append_many( M ) == 10
+    assert  len( calls ) == 1
+    assert  [ m[ 1 : ] for m in q.drain( ) ] == M
+
+
+def  test_append_many_partial ( q ) :
+
+    # As many messages as fit are written, in order, and the rest dropped
+    M = [ ( 't' , str( k ) * 60 ) for k in range( 40 ) ]
+    n = q.append_many( M )
+
+    assert  0 < n < len( M )
+    assert  [ m[ 1 : ] for m in q.drain( ) ] == M[ : n ]
+
+
+def  test_append_many_none_fit ( q ) :
+
+    with  pytest.raises( MemoryError ) :
+        q.append_many( [ ( 't' , 'x' * 2000 ) ] )
+    assert  q.append_many( [ ] ) == 0
+
+
+def  test_pop_many_commits_once ( q , monkeypatch ) :
+
+    # Every message that was read is done with in one go
+    calls = [ ]
+    done  = q._done
+    def  spy ( first , *H ) :
+        calls.append( len( H ) )
+        return  done( first , *H )
+    monkeypatch.setattr( q , '_done' , spy )
+
+    M = [ str( k ) for k in range( 10 ) ]
+    for  m in M : q.append( 't' , m )
+    assert  [ m[ 2 ] for m in q.pop_many( ) ] == M
+    assert  calls == [ 10 ]
+    assert  q.pop_many( ) == [ ]
+
+
+def  test_pop_many_limits ( q ) :
+
+    for  k in range( 6 ) : q.append( 't' , str( k ) * 10 )
+
+    # Leftovers are read by the next call. The first message is returned,
+    # however many bytes it has.
+    assert  [ m[ 2 ] for m in q.pop_many( max_count = 2 ) ] == [ '0' * 10 ,
+                                                                '1' * 10 ]
+    assert  [ m[ 2 ] for m in q.pop_many( max_bytes = 25 ) ] == [ '2' * 10 ,
+                                                                 '3' * 10 ]
+    assert  [ m[ 2 ] for m in q.pop_many( max_bytes = 5 ) ] == [ '4' * 10 ]
+    assert  [ m[ 2 ] for m in q.drain( ) ] == [ '5' * 10 ]
@@ -0,0 +1,108 @@
+
+'''
+Tests of bulk messages, whose bodies are copied into the queue without the
+lock, and of the order in which messages are published.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  q ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 , bulk = 100 )
+    q.open( 'w' , filtself = False )
+    yield  q
+    q.close( )
+
+
+#--- Tests ---#
+
+def  test_bulk_bodies ( q ) :
+
+    # Large bodies go without the lock, small ones with it, and they wrap
+    # around the end of the queue body
+    for  k in range( 40 ) :
+        body = chr( 97 + k % 26 ) * ( 5 + 37 * k % 400 )
+        assert  q.append( 't' , body )
+        assert  q.pop( ) == ( 'w' , 't' , body )
+
+    assert  q.h[ hdr.ifree ] == len( q.b )  and  not q.h[ hdr.inres ]
+
+
+def  test_append_many_mixed ( q ) :
+
+    M = [ ( 'small' , 'x' ) , ( 'big' , 'y' * 500 ) , ( 'small' , 'z' ) ]
+    assert  q.append_many( M ) == 3
+    assert  [ m[ 1 : ] for m in q.pop_many( ) ] == M
+
+
+def  test_published_in_reserved_order ( q ) :
+
+    # A message appended after a reservation waits for it
+    with  q.reserve( 'first' , 3 ) as body :
+        body[ : ] = b'abc'
+        q.append( 'second' , 'def' )
+        assert  q.pop( ) is None
+
+    assert  q.pop_many( decode = False ) == [ ( b'w' , b'first'  , b'abc' ) ,
+                                              ( b'w' , b'second' , b'def' ) ]
+
+
+def  test_subscribers_get_their_types ( q , name ) :
+
+    # Appending to a queue with a subscriber takes the slower path
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+    r.subscribe( 'mine' )
+
+    try :
+        q.append( 'other' , '1' )
+        q.append( 'mine'  , '2' )
+        assert  r.pop_many( ) == [ ( 'w' , 'mine' , '2' ) ]
+        assert  [ m[ 2 ] for m in q.pop_many( ) ] == [ '1' , '2' ]
+    finally :
+        r.close( )
+
+
+def  test_append_many_copy_fails ( q , monkeypatch ) :
+
+    # The second large body fails to copy. It is voided, and the rest of the
+    # batch is still published.
+    fill = q._fill
+    def  once ( body , bmsg ) :
+        monkeypatch.setattr( q , '_fill' , None )
+        fill( body , bmsg )
+    monkeypatch.setattr( q , '_fill' , once )
+
+    M = [ ( 'big' , 'a' * 200 ) , ( 'big' , 'b' * 200 ) , ( 'small' , 'c' ) ]
+    with  pytest.raises( TypeError ) : q.append_many( M )
+
+    assert  not q.h[ hdr.inres ]
+    assert  [ m[ 1 : ] for m in q.pop_many( ) ] == [ M[ 0 ] , M[ 2 ] ]
+
+
+def  test_pop_many_counts_spilled_bodies ( name ) :
+
+    # The limit counts the spilled body, not its descriptor in the queue
+    q = pq.PySyncQ( name , size = 4096 , spill = 100 )
+    q.open( 'w' , filtself = False )
+
+    try :
+        q.append( 't' , 's' * 50 )
+        q.append( 't' , 'S' * 300 )
+        assert  [ m[ 2 ] for m in q.pop_many( max_bytes = 100 ) ] == \
+                [ 's' * 50 ]
+        assert  [ m[ 2 ] for m in q.pop_many( max_bytes = 100 ) ] == \
+                [ 'S' * 300 ]
+    finally :
+        q.close( )
@@ -0,0 +1,110 @@
+
+'''
+Tests of the message body codecs, and of which codecs a reader will decode.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import pickle
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import codec
+
+
+#--- Helpers ---#
+
+class  Alarm :
+
+    '''
+    Sets off the alarm, if it is ever unpickled.
+    '''
+
+    rung = False
+
+    def  __reduce__ ( self ) :
+        return  ( Alarm.ring , ( ) )
+
+    @staticmethod
+    def  ring ( ) :
+        Alarm.rung = True
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  q ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 )
+    q.open( 'w' , filtself = False )
+    yield  q
+    q.close( )
+
+
+@pytest.fixture
+def  pickles ( ) :
+
+    '''
+    Registers Pickle for one test.
+    '''
+
+    codec.register( codec.Pickle( ) )
+    yield
+    del  codec.codecs[ codec.Pickle.id ]
+
+
+#--- Tests ---#
+
+def  test_round_trip ( q ) :
+
+    q.append( 'txt' , 12.5 )
+    q.codec = codec.Raw( )
+    q.append( 'raw' , bytearray( b'\x00\x01\x02' ) )
+    q.codec = codec.Record( '<dI' )
+    q.append( 'rec' , ( 1.5 , 7 ) )
+
+    assert  q.pop_many( ) == [ ( 'w' , 'txt' , '12.5' ) ,
+                               ( 'w' , 'raw' , b'\x00\x01\x02' ) ,
+                               ( 'w' , 'rec' , ( 1.5 , 7 ) ) ]
+
+
+def  test_record_needs_fmt ( q ) :
+
+    # A Record made to decode only can't encode
+    q.codec = codec.Record( )
+    with  pytest.raises( ValueError , match = 'needs fmt' ) :
+        q.append( 'rec' , ( 1 , 2 ) )
+    assert  q.pop( ) is None
+
+
+def  test_pickle_needs_opt_in ( q ) :
+
+    # Anyone can write a pickle, but an unregistered reader won't run it
+    q.codec = codec.Pickle( )
+    q.append( 'pkl' , Alarm( ) )
+
+    with  pytest.raises( ValueError ) : q.pop( )
+    assert  not Alarm.rung
+
+
+def  test_pickle_opted_in ( q , pickles ) :
+
+    q.codec = codec.Pickle( )
+    q.append( 'pkl' , { 'a' : [ 1 , 2 ] ,
+                        'b' : pickle.PickleBuffer( b'xyz' * 50 ) } )
+
+    d = q.pop( )[ 2 ]
+    assert  d[ 'a' ] == [ 1 , 2 ]  and  bytes( d[ 'b' ] ) == b'xyz' * 50
+
+
+def  test_codec_is_abstract ( ) :
+
+    class  Half ( codec.Codec ) :
+        def  encode ( self , obj ) : return  [ obj ]
+
+    with  pytest.raises( TypeError ) : codec.Codec( )
+    with  pytest.raises( TypeError ) : Half( )
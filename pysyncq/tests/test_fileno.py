@@ -0,0 +1,108 @@
+
+'''
+Tests of fileno( ) and spacefileno( ), which let select and poll wait on a
+queue along with other file descriptors.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import os , select
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Globals ---#
+
+pytestmark = pytest.mark.skipif( os.name != 'posix' ,
+                                 reason = 'Wake-up FIFOs need POSIX' )
+
+
+#--- Helpers ---#
+
+def  readable ( fd ) :
+
+    'True if fd is readable now.'
+
+    return  bool( select.select( [ fd ] , [ ] , [ ] , 0 )[ 0 ] )
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  wr ( name ) :
+
+    # A writer that reads nothing, and a reader
+    w = pq.PySyncQ( name , size = 1024 )
+    w.open( 'w' )
+    w.subscribe( 'none' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+    yield  w , r
+    r.close( )
+    w.close( )
+
+
+#--- Tests ---#
+
+def  test_fileno_readable_with_messages ( wr ) :
+
+    ( w , r ) = wr
+    fd = r.fileno( )
+    assert  fd == r.fileno( )  and  not readable( fd )
+
+    w.append( 't' , 'a' )
+    w.append( 't' , 'b' )
+    assert  readable( fd )
+
+    # Still readable until a read finds nothing more
+    assert  r.pop( )[ 2 ] == 'a'
+    assert  readable( fd )
+    assert  r.pop( )[ 2 ] == 'b'  and  r.pop( ) is None
+    assert  not readable( fd )
+
+
+def  test_fileno_readable_when_detached ( wr ) :
+
+    ( w , r ) = wr
+    fd = r.fileno( )
+
+    w.heartbeat( )
+    assert  w.reap( timeout = 0 ) == 1
+    assert  readable( fd )
+
+    # The file descriptor is closed along with the slot
+    with  pytest.raises( hdr.Detached ) : r.pop( )
+    with  pytest.raises( OSError ) : os.fstat( fd )
+
+
+def  test_spacefileno ( wr ) :
+
+    ( w , r ) = wr
+    fd = w.spacefileno( )
+
+    while  True :
+        try :
+            w.append( 't' , 'x' * 60 )
+        except  MemoryError :
+            break
+
+    assert  not readable( fd )
+    r.pop( )
+    assert  readable( fd )
+
+
+def  test_fileno_needs_open ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 )
+
+    try :
+        with  pytest.raises( ValueError ) : q.fileno( )
+    finally :
+        q.close( )
+
@@ -0,0 +1,102 @@
+
+'''
+Tests of queues that grow into bigger blocks of shared memory when they run
+out of room, and of the readers that follow them.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import os
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Tests ---#
+
+def  test_reader_follows ( name ) :
+
+    # A writer that reads nothing, and a reader that reads after the fact
+    w = pq.PySyncQ( name , size = 512 , grow = 1 << 14 )
+    w.open( 'w' )
+    w.subscribe( 'none' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+
+        for  k in range( 200 ) : w.append( 't' , str( k ) * 4 )
+        gen = w._root( )[ hdr.igrow ]
+        assert  gen > 1
+
+        # r finishes the old generations, in order, and then moves on
+        assert  [ m[ 2 ] for m in r.drain( ) ] == \
+                [ str( k ) * 4 for k in range( 200 ) ]
+        assert  r.gen == gen  and  r.missed( ) == 0
+
+        # Generations that every process left are unlinked. The first is kept.
+        assert  w.drain( ) == [ ]  and  w.gen == gen
+        assert  os.path.exists( f'/dev/shm/{ name }' )
+        assert  not any( os.path.exists( f'/dev/shm/{ name }.{ g }' )
+                         for g in range( 1 , gen ) )
+
+    finally :
+        r.close( )
+        w.close( )
+
+
+def  test_writer_keeps_reading_old ( name ) :
+
+    # The queue grows inside append, while the same instance still has
+    # messages to read in the old generation
+    q = pq.PySyncQ( name , size = 512 , grow = 4096 )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        for  k in range( 40 ) : q.append( 't' , str( k ) * 4 )
+        assert  q._root( )[ hdr.igrow ] > 0  and  q.gen == 0
+
+        assert  [ m[ 2 ] for m in q.drain( ) ] == \
+                [ str( k ) * 4 for k in range( 40 ) ]
+        assert  q.gen == q._root( )[ hdr.igrow ]
+
+    finally :
+        q.close( )
+
+
+def  test_grow_limit ( name ) :
+
+    q = pq.PySyncQ( name , size = 512 , grow = 2048 )
+    q.open( 'w' , filtself = False )
+
+    try :
+        with  pytest.raises( MemoryError ) : q.append( 't' , 'x' * 4096 )
+        assert  q.append( 't' , 'x' * 1500 )
+        assert  q.pop( )[ 2 ] == 'x' * 1500
+    finally :
+        q.close( )
+
+
+def  test_no_growth_past_reservation ( name ) :
+
+    q = pq.PySyncQ( name , size = 512 , grow = 4096 )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        with  q.reserve( 't' , 8 ) as body :
+            body[ : ] = b'reserved'
+            with  pytest.raises( MemoryError ) : q.append( 't' , 'x' * 1000 )
+
+        assert  q._root( )[ hdr.igrow ] == 0
+        assert  q.pop( )[ 2 ] == 'reserved'
+
+    finally :
+        q.close( )
+
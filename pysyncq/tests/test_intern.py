@@ -0,0 +1,84 @@
+
+'''
+Tests of the interning table, which stores short sender and type strings once
+in shared memory so that messages can refer to them by ID.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Helpers ---#
+
+def  cost ( q , msgtype , body ) :
+
+    '''
+    Appends one message and returns the number of queue bytes that it took.
+    '''
+
+    free = q.h[ hdr.ifree ]
+    q.append( msgtype , body )
+    return  free - q.h[ hdr.ifree ]
+
+
+#--- Tests ---#
+
+def  test_interned_strings_not_written ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 , intern = 4 )
+    q.open( 'writer' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+
+        # Only the body and the counters are written
+        assert  cost( q , 'status' , 'x' ) == hdr.sizemsghead + 1
+        assert  q.h[ hdr.iistr ] == 2
+
+        # Too long to intern, so written in full each time
+        long = 't' * ( hdr.maxintern + 1 )
+        assert  cost( q , long , 'x' ) == hdr.sizemsghead + len( long ) + 1
+        assert  cost( q , long , 'x' ) == hdr.sizemsghead + len( long ) + 1
+
+        # Another instance looks up the IDs in shared memory
+        assert  r.drain( ) == [ ( 'writer' , 'status' , 'x' ) ,
+                                ( 'writer' , long , 'x' ) ,
+                                ( 'writer' , long , 'x' ) ]
+
+    finally :
+        r.close( )
+        q.close( )
+
+
+def  test_full_table_writes_strings ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 , intern = 2 )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        # The sender and the first type fill the table
+        assert  cost( q , 'a' , 'x' ) == hdr.sizemsghead + 1
+        assert  cost( q , 'bb' , 'x' ) == hdr.sizemsghead + 2 + 1
+
+        assert  [ m[ 1 ] for m in q.drain( ) ] == [ 'a' , 'bb' ]
+
+    finally :
+        q.close( )
+
+
+def  test_disabled_by_default ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 )
+    q.open( 'w' , filtself = False )
+
+    try :
+        assert  cost( q , 'type' , 'x' ) == hdr.sizemsghead + 1 + 4 + 1
+        assert  q.pop( ) == ( 'w' , 'type' , 'x' )
+    finally :
+        q.close( )
+
@@ -0,0 +1,77 @@
+
+'''
+Tests of leased messages, whose bodies are read in place from the queue's
+shared memory, and which stay in the queue until they are released.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  q ( name ) :
+
+    q = pq.PySyncQ( name , size = 256 )
+    q.open( 'w' , filtself = False )
+    yield  q
+    q.close( )
+
+
+#--- Tests ---#
+
+def  test_lease_held_until_release ( q ) :
+
+    q.append( 't' , 'body' )
+
+    with  q.lease( ) as m :
+
+        # A read-only view of the queue, not a copy
+        assert  ( m.sender , m.type ) == ( 'w' , 't' )
+        assert  type( m.body ) is memoryview  and  m.body.readonly
+        assert  m.tobytes( ) == b'body'  and  m.decode( ) == 'body'
+        assert  q.h[ hdr.ifree ] < len( q.b )
+
+        # Not read again
+        assert  q.pop( ) is None
+
+    assert  q.h[ hdr.ifree ] == len( q.b )
+    assert  m.release( ) is True
+
+
+def  test_lease_wraps ( q ) :
+
+    # Move round the ring until a body wraps around the end of the queue. Then
+    # it is read in two parts, in order.
+    parts = None
+
+    for  k in range( 50 ) :
+
+        body = chr( 97 + k % 26 ) * 40
+        q.append( 't' , body )
+
+        with  q.lease( ) as m :
+            assert  m.tobytes( ) == body.encode( )
+            if  type( m.body ) is tuple :
+                parts = [ v.tobytes( ) for v in m.body ]
+                break
+
+    assert  parts  and  all( parts )  and  b''.join( parts ) == body.encode( )
+
+
+def  test_unreleased_lease_closed ( name ) :
+
+    q = pq.PySyncQ( name , size = 256 )
+    q.open( 'w' , filtself = False )
+    q.append( 't' , 'left' )
+    m = q.lease( )
+
+    q.close( )
+    assert  not q.leases  and  m.h is None
@@ -0,0 +1,99 @@
+
+'''
+Tests of PySyncMultiQ, a group of queues that share one block of shared
+memory, one per channel.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import os , subprocess , sys , time
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  g ( name ) :
+
+    g = pq.PySyncMultiQ( [ 'a' , 'b' ] , name = name , size = 512 ,
+                         readers = 4 )
+    g.open( 'w' , filtself = False )
+    yield  g
+    g.close( )
+
+
+#--- Tests ---#
+
+def  test_channels_are_independent ( g ) :
+
+    assert  list( g ) == [ 'a' , 'b' ]  and  len( g ) == 2
+
+    # Filling one channel leaves room in the other
+    with  pytest.raises( MemoryError ) :
+        while  True : g[ 'a' ].append( 'm' , 'x' * 40 )
+    assert  g[ 'b' ].append( 'm' , 'y' )
+
+    assert  g.wait( timer = 0 ) == [ 'a' , 'b' ]
+    assert  g[ 'b' ].pop( )[ 2 ] == 'y'
+    assert  g.wait( [ 'b' ] , timer = 0 ) == [ ]
+
+
+def  test_attach_keeps_contents ( g , name ) :
+
+    g[ 'b' ].append( 'm' , 'kept' )
+
+    # Attaching must not wipe the group, nor its channel headers
+    a = pq.PySyncMultiQ( [ 'a' , 'b' ] , name = name , create = False ,
+                         size = 512 , readers = 4 )
+
+    try :
+        assert  a.h[ hdr.gchan ] == 2
+        assert  a[ 'b' ].h[ hdr.ifree ] == g[ 'b' ].h[ hdr.ifree ]
+        assert  g[ 'b' ].pop( )[ 2 ] == 'kept'
+    finally :
+        g.close( )
+        a.close( )
+
+
+def  test_attach_from_other_process ( g , name ) :
+
+    # An unrelated process attaches by name, and blocks until the maker writes
+    code = ( 'from pysyncq import pysyncq as pq\n'
+            f'a = pq.PySyncMultiQ( [ "a" , "b" ] , name = { name !r} ,\n'
+             '                     create = False , size = 512 ,\n'
+             '                     readers = 4 )\n'
+             'a.open( "r" )\n'
+             'print( a.pop( block = True , timer = 10 ) , flush = True )\n'
+             'a.close( )\n' )
+
+    p = subprocess.Popen( [ sys.executable , '-c' , code ] ,
+                          stdout = subprocess.PIPE , stderr = subprocess.PIPE ,
+                          text = True ,
+                          cwd = os.path.dirname( os.path.dirname(
+                                os.path.dirname( __file__ ) ) ) )
+
+    # Wait until it waits on the group. Its wake-up must reach it at once, so
+    # the lock and condition variable are shared.
+    for  _ in range( 100 ) :
+        if  g.h[ hdr.gwait ] : break
+        time.sleep( 0.05 )
+
+    t = time.time( )
+    g[ 'b' ].append( 'm' , 'woken' )
+    ( out , err ) = p.communicate( timeout = 20 )
+
+    assert  out.strip( ) == "('b', ('w', 'm', 'woken'))"
+    assert  time.time( ) - t < 5
+
+    # Its exit leaves the group to the maker, and reports no leaks
+    assert  os.path.exists( f'/dev/shm/{ name }' )
+    assert  'leaked' not in err  and  'Error' not in err
+    assert  g[ 'a' ].append( 'm' , 'still here' )
+    assert  g.pop( )[ 1 ][ 2 ] == 'still here'
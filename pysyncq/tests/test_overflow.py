@@ -0,0 +1,114 @@
+
+'''
+Tests of the overflow policies of PySyncQ, which free space for a writer when
+a reader stalls the queue.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Helpers ---#
+
+def  fill ( q , size ) :
+
+    '''
+    Appends messages with size byte bodies until the next one would not fit.
+    Returns the number appended.
+    '''
+
+    n = 0
+    while  q.h[ hdr.ifree ] >= q._msgsize( b'm' , size ) :
+        q.append( 'm' , 'y' * size )
+        n += 1
+
+    return  n
+
+
+#--- Tests ---#
+
+@pytest.mark.parametrize( 'skip' , [ 0 , 5 , 9 , 13 ] )
+def  test_overwrite_evicts_only_enough ( name , skip ) :
+
+    # Move the head round the ring first, so that eviction crosses the end of
+    # the queue body for some values of skip
+    q = pq.PySyncQ( name , size = 1024 , overflow = 'overwrite' )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        for  _ in range( skip ) :
+            q.append( 'p' , 'x' )
+            q.pop( )
+
+        n = fill( q , 60 )
+
+        # Just enough of the oldest messages are evicted for the new one
+        need = q._msgsize( b'big' , 300 ) - q.h[ hdr.ifree ]
+        msz  = q._msgsize( b'm' , 60 )
+        q.append( 'big' , 'z' * 300 )
+
+        got = [ m[ 2 ] for m in q.drain( ) ]
+        assert  q.missed( ) == -( -need // msz )
+        assert  got == [ 'y' * 60 ] * ( n - q.missed( ) )  +  [ 'z' * 300 ]
+
+    finally :
+        q.close( )
+
+
+def  test_block_raises ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' , filtself = False )
+
+    try :
+        n = fill( q , 60 )
+        with  pytest.raises( MemoryError ) : q.append( 'm' , 'y' * 60 )
+        assert  len( q.drain( ) ) == n  and  q.missed( ) == 0
+    finally :
+        q.close( )
+
+
+def  test_drop_counts_missed ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 , overflow = 'drop' )
+    q.open( 'w' , filtself = False )
+
+    try :
+        n = fill( q , 60 )
+        assert  q.append( 'm' , 'y' * 60 )  is  False
+        assert  len( q.drain( ) ) == n  and  q.missed( ) == 1
+    finally :
+        q.close( )
+
+
+def  test_detach_lagging_reader ( name ) :
+
+    # A second reader attaches, then never reads
+    q = pq.PySyncQ( name , size = 1024 , overflow = 'detach' , maxlag = 2 )
+    q.open( 'w' )
+    q.subscribe( 'none' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+
+        fill( q , 60 )
+        assert  q.append( 'm' , 'y' * 60 )
+
+        with  pytest.raises( hdr.Detached ) : r.pop( )
+
+        # Reopening starts from the newest messages
+        r.open( 'r' )
+        q.append( 'm' , 'after' )
+        assert  r.pop( )[ 2 ] == 'after'
+
+    finally :
+        r.close( )
+        q.close( )
@@ -0,0 +1,122 @@
+
+'''
+Tests of PySyncPipe, the single-producer single-consumer queue. Both ends are
+opened in this process, by two instances of the same pipe, unless a test says
+otherwise.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import os , subprocess , sys , time
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import codec
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  ends ( name ) :
+
+    '''
+    Yields the tuple ( writer , reader ) of a 128 byte pipe.
+    '''
+
+    w = pq.PySyncPipe( name , size = 128 )
+    r = pq.PySyncPipe( name , create = False )
+    w.open( 'w' )
+    r.open( 'r' )
+
+    yield  ( w , r )
+
+    r.close( )
+    w.close( )
+
+
+#--- Tests ---#
+
+def  test_order_across_wrap ( ends ) :
+
+    ( w , r ) = ends
+    w.codec = codec.Raw( )
+
+    for  i in range( 200 ) :
+        body = bytes( [ i ] ) * ( i % 40 )
+        w.append( 'r' , body )
+        assert  r.pop( decode = False ) == ( b'r' , body )
+
+    assert  r.pop( ) is None
+
+
+def  test_full_and_ends ( ends ) :
+
+    ( w , r ) = ends
+
+    with  pytest.raises( MemoryError ) : w.append( 'x' , 'y' * 200 )
+    with  pytest.raises( ValueError )  : w.pop( )
+    with  pytest.raises( ValueError )  : r.open( 'r' )
+
+    k = 0
+    with  pytest.raises( MemoryError ) :
+        while  True :
+            w.append( 'a' , 'x' * 50 )
+            k += 1
+
+    assert  k  and  r.drain( ) == [ ( 'a' , 'x' * 50 ) ] * k
+
+
+def  test_attach_keeps_contents ( name ) :
+
+    w = pq.PySyncPipe( name , size = 128 )
+    w.open( 'w' )
+    w.append( 't' , 'kept' )
+
+    # Attaching must not wipe the pipe
+    r = pq.PySyncPipe( name , create = False )
+    r.open( 'r' )
+
+    try :
+        assert  r.size == 128
+        assert  r.pop( ) == ( 't' , 'kept' )
+    finally :
+        r.close( )
+        w.close( )
+
+
+def  test_wake_attached_process ( name ) :
+
+    w = pq.PySyncPipe( name , size = 128 )
+    w.open( 'w' )
+
+    # An unrelated process attaches by name, and blocks with no timer
+    code = ( 'from pysyncq import pysyncq as pq\n'
+            f'r = pq.PySyncPipe( { name !r} , create = False )\n'
+             'r.open( "r" )\n'
+             'print( r.pop( block = True , timer = None ) , flush = True )\n'
+             'r.close( )\n' )
+
+    p = subprocess.Popen( [ sys.executable , '-c' , code ] ,
+                          stdout = subprocess.PIPE , text = True ,
+                          cwd = os.path.dirname( os.path.dirname(
+                                os.path.dirname( __file__ ) ) ) )
+
+    try :
+
+        # Wait until it sleeps on the condition variable, past its spin
+        for  _ in range( 100 ) :
+            if  w.h[ hdr.prmsg ] : break
+            time.sleep( 0.05 )
+
+        assert  w.append( 't' , 'woken' )
+        assert  p.communicate( timeout = 10 )[ 0 ].strip( ) == \
+                "('t', 'woken')"
+
+    finally :
+        p.kill( )
+        w.close( )
@@ -0,0 +1,79 @@
+
+'''
+Tests of priority lanes, where PySyncMultiQ pops from its channels in order of
+priority, so that control messages overtake a backlog of data.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import threading , time
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  g ( name ) :
+
+    # A small control lane, and a big data lane
+    g = pq.PySyncMultiQ( [ 'ctl' , 'data' ] , name = name ,
+                         size = [ 256 , 2048 ] , readers = 4 )
+    g.open( 'w' , filtself = False )
+    yield  g
+    g.close( )
+
+
+#--- Tests ---#
+
+def  test_control_overtakes_data ( g ) :
+
+    for  k in range( 20 ) : g[ 'data' ].append( 'd' , str( k ) )
+    g[ 'ctl' ].append( 'c' , 'stop' )
+
+    assert  g.pop( ) == ( 'ctl' , ( 'w' , 'c' , 'stop' ) )
+    assert  [ g.pop( )[ 1 ][ 2 ] for _ in range( 20 ) ] == \
+            [ str( k ) for k in range( 20 ) ]
+    assert  g.pop( ) is None
+
+
+def  test_channels_in_given_order ( g ) :
+
+    g[ 'ctl' ].append( 'c' , '1' )
+    g[ 'data' ].append( 'd' , '2' )
+
+    assert  g.pop( [ 'data' , 'ctl' ] )[ 0 ] == 'data'
+    assert  g.pop( [ 'data' ] ) is None
+    assert  g.pop( [ 'data' , 'ctl' ] )[ 0 ] == 'ctl'
+
+
+def  test_full_data_lane_leaves_control_room ( g ) :
+
+    with  pytest.raises( MemoryError ) :
+        while  True : g[ 'data' ].append( 'd' , 'x' * 100 )
+
+    assert  g[ 'ctl' ].append( 'c' , 'still room' )
+    assert  g.pop( )[ 0 ] == 'ctl'
+
+
+def  test_blocking_pop_woken ( g ) :
+
+    # A message on the low priority lane wakes a blocked pop
+    threading.Timer( 0.05 , g[ 'data' ].append , ( 'd' , 'late' ) ).start( )
+
+    t = time.time( )
+    assert  g.pop( block = True , timer = 5 ) == \
+            ( 'data' , ( 'w' , 'd' , 'late' ) )
+    assert  time.time( ) - t < 1
+
+
+def  test_one_size_per_channel ( name ) :
+
+    with  pytest.raises( ValueError ) :
+        pq.PySyncMultiQ( [ 'a' , 'b' ] , name = name , size = [ 256 ] )
+
@@ -0,0 +1,92 @@
+
+'''
+Tests of reaping, which frees the reader slots and reservations of processes
+that ended without calling close( ), and detaches idle ones.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import os , time
+import multiprocessing as mp
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Helpers ---#
+
+def  crash ( q ) :
+
+    '''
+    Registers with q, leaves a reservation open, and ends without closing.
+    '''
+
+    q.open( 'crash' )
+    q.reserve( 'x' , 10 )
+    os._exit( 0 )
+
+
+#--- Tests ---#
+
+@pytest.mark.skipif( 'fork' not in mp.get_all_start_methods( ) ,
+                     reason = 'Needs the fork start method' )
+def  test_reap_ended_process ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        p = mp.get_context( 'fork' ).Process( target = crash , args = ( q , ) )
+        p.start( )
+        p.join( )
+
+        # The crashed process holds the message, and its reservation holds
+        # back publishing
+        q.append( 't' , 'stuck' )
+        assert  q.drain( ) == [ ]  and  len( q.readers( ) ) == 2
+
+        assert  q.reap( ) == 1
+        assert  len( q.readers( ) ) == 1
+
+        # The void reservation is skipped, and memory is freed once read
+        assert  q.pop( )[ 2 ] == 'stuck'
+        assert  q.h[ hdr.ifree ] == len( q.b )  and  not q.h[ hdr.inres ]
+
+    finally :
+        q.close( )
+
+
+def  test_reap_idle_detaches ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+
+        # r has been idle for longer than the timeout, and q has not
+        time.sleep( 0.05 )
+        q.heartbeat( )
+        assert  q.reap( timeout = 0.02 ) == 1
+
+        # Messages are no longer held for r, once q has passed them by
+        q.append( 't' , 'x' )
+        assert  q.drain( ) == [ ]  and  q.h[ hdr.ifree ] == len( q.b )
+
+        with  pytest.raises( hdr.Detached ) : r.pop( )
+
+        # A busy reader is left alone
+        r.open( 'r' )
+        assert  q.reap( timeout = 10 ) == 0
+
+    finally :
+        r.close( )
+        q.close( )
+
@@ -0,0 +1,95 @@
+
+'''
+Tests of reservations, whose message bodies are written in place in the
+queue's shared memory, and published once they are committed.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import struct
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  q ( name ) :
+
+    q = pq.PySyncQ( name , size = 256 )
+    q.open( 'w' , filtself = False )
+    yield  q
+    q.close( )
+
+
+#--- Tests ---#
+
+def  test_write_in_place ( q ) :
+
+    with  q.reserve( 'data' , 8 ) as buf :
+        struct.pack_into( 'd' , buf , 0 , 2.5 )
+        assert  q.pop( ) is None
+
+    ( _ , msgtype , body ) = q.pop( decode = False )
+    assert  msgtype == b'data'  and  struct.unpack( 'd' , body ) == ( 2.5 , )
+
+
+def  test_abort_on_exception ( q ) :
+
+    # The space of the last reservation goes straight back to the queue
+    with  pytest.raises( RuntimeError ) :
+        with  q.reserve( 't' , 4 ) as buf :
+            buf[ : ] = b'lost'
+            raise  RuntimeError
+
+    assert  q.pop( ) is None
+    assert  q.h[ hdr.ifree ] == len( q.b )  and  not q.h[ hdr.inres ]
+
+
+def  test_abort_before_later_reservation ( q ) :
+
+    # An earlier reservation can't be withdrawn, so it is voided
+    a = q.reserve( 't' , 1 )
+    b = q.reserve( 't' , 1 )
+    a.abort( )
+    b.body[ : ] = b'b'
+    b.commit( )
+    b.commit( )
+
+    assert  q.drain( ) == [ ( 'w' , 't' , 'b' ) ]
+    assert  q.h[ hdr.ifree ] == len( q.b )
+
+
+def  test_reservation_wraps ( q ) :
+
+    # Move round the ring until a body wraps around the end of the queue
+    for  k in range( 50 ) :
+
+        body = chr( 97 + k % 26 ).encode( ) * 40
+        r = q.reserve( 't' , len( body ) )
+        wraps = type( r.body ) is tuple
+
+        if  wraps :
+            ( u , v ) = r.body
+            u[ : ] = body[ : len( u ) ]
+            v[ : ] = body[ len( u ) : ]
+        else :
+            r.body[ : ] = body
+
+        r.commit( )
+        assert  q.pop( decode = False )[ 2 ] == body
+        if  wraps : break
+
+    assert  wraps
+
+
+def  test_too_big ( q ) :
+
+    with  pytest.raises( MemoryError ) : q.reserve( 't' , 1000 )
+    assert  not q.h[ hdr.inres ]
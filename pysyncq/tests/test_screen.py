@@ -0,0 +1,80 @@
+
+'''
+Tests of screening by sender and type, which is done in place so that nothing
+is copied out of a screened message.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Tests ---#
+
+@pytest.mark.parametrize( 'intern' , [ 0 , 4 ] )
+@pytest.mark.parametrize( 'skip' , [ 0 , 7 , 13 ] )
+def  test_screened_across_wrap ( name , intern , skip ) :
+
+    # Moving the head round the ring first wraps some strings around the end
+    # of the queue body
+    q = pq.PySyncQ( name , size = 512 , intern = intern )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        for  _ in range( skip ) :
+            q.append( 'p' , 'x' * 11 )
+            q.pop( )
+
+        for  k in range( 40 ) :
+
+            q.scrntype.add( 'noise' )
+            q.append( 'noise' , 'n' * k )
+            q.append( 'noisy' , 'y' * k )
+            q.append( 'noise' , 'n' )
+            assert  q.pop( ) == ( 'w' , 'noisy' , 'y' * k )
+            assert  q.pop( ) is None
+
+            # The screened run was freed along with the message after it
+            assert  q.h[ hdr.ifree ] == len( q.b )
+
+            q.scrntype.clear( )
+
+    finally :
+        q.close( )
+
+
+def  test_screened_not_copied ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 )
+    q.open( 'me' )
+    w = pq.PySyncQ( name , create = False )
+    w.open( 'other' )
+
+    # Count reads of the queue body
+    reads = [ ]
+    read  = q._read
+    q._read = lambda b , db : reads.append( db )  or  read( b , db )
+
+    try :
+
+        for  _ in range( 5 ) : q.append( 't' , 'mine' )
+        w.append( 'skip' , 'theirs' )
+        w.append( 'keep' , 'wanted' )
+        q.scrntype.add( 'skip' )
+
+        assert  q.pop( ) == ( 'other' , 'keep' , 'wanted' )
+        assert  q.pop( ) is None
+
+        # Only the strings and body of the message that was popped
+        assert  reads == [ len( 'other' ) , len( 'keep' ) , len( 'wanted' ) ]
+
+    finally :
+        w.close( )
+        q.close( )
+
@@ -0,0 +1,56 @@
+
+'''
+Tests of the reader slots of PySyncQ, one per process that opens the queue.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Tests ---#
+
+def  test_default_slots ( name ) :
+
+    # A page sized queue takes as many processes as there are slots
+    q = pq.PySyncQ( name )
+    q.open( 'w' )
+    Q = [ pq.PySyncQ( name , create = False ) for _ in range( hdr.maxreaders ) ]
+
+    try :
+
+        assert  q.slots == hdr.maxreaders
+        for  ( k , r ) in enumerate( Q[ : -1 ] ) : r.open( str( k ) )
+        with  pytest.raises( MemoryError ) : Q[ -1 ].open( 'last' )
+
+    finally :
+        for  r in Q : r.close( )
+        q.close( )
+
+
+def  test_bad_slots ( name ) :
+
+    for  readers in ( 0 , hdr.maxreaders + 1 ) :
+        with  pytest.raises( ValueError ) :
+            pq.PySyncQ( name , readers = readers )
+
+
+def  test_all_slots_taken ( name ) :
+
+    # Every instance opened in this process takes a slot of its own
+    q = pq.PySyncQ( name , readers = 2 )
+    q.open( 'a' )
+    Q = [ pq.PySyncQ( name , create = False ) for _ in range( 2 ) ]
+    Q[ 0 ].open( 'b' )
+
+    try :
+        with  pytest.raises( MemoryError ) : Q[ 1 ].open( 'c' )
+        assert  len( q.readers( ) ) == 2
+    finally :
+        for  r in Q : r.close( )
+        q.close( )
@@ -0,0 +1,86 @@
+
+'''
+Tests of the snapshot of the queue header counters that readers take without
+the lock, on processors that keep memory accesses in order, and with it on
+those that don't.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import threading
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Tests ---#
+
+@pytest.mark.parametrize( 'tso' , [ True , False ] )
+def  test_pop_either_way ( name , monkeypatch , tso ) :
+
+    monkeypatch.setattr( hdr , 'tso' , tso )
+
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' , filtself = False )
+
+    try :
+        for  i in range( 20 ) :
+            q.append( 'm' , str( i ) )
+            assert  q.pop( )[ 2 ] == str( i )
+        for  i in range( 5 ) : q.append( 'm' , str( i ) )
+        assert  [ m[ 2 ] for m in q.pop_many( ) ] == list( '01234' )
+    finally :
+        q.close( )
+
+
+def  test_lock_without_tso ( name , monkeypatch ) :
+
+    monkeypatch.setattr( hdr , 'tso' , False )
+
+    q = pq.PySyncQ( name )
+    q.open( 'w' )
+    got = [ ]
+    t = threading.Thread( target = lambda : got.append( q._snapshot( ) ) )
+
+    try :
+
+        # The snapshot waits for the lock
+        with  q.cond :
+            t.start( )
+            t.join( 0.2 )
+            assert  t.is_alive( )  and  not got
+
+        t.join( )
+        assert  got == [ q._snapshot( ) ]
+
+    finally :
+        q.close( )
+
+
+def  test_sequence_even_after_raise ( name , monkeypatch ) :
+
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' , filtself = False )
+
+    def  interrupt ( *args ) : raise  KeyboardInterrupt
+
+    try :
+
+        # Freeing is interrupted half way through
+        q.append( 'm' , 'a' )
+        monkeypatch.setattr( q , '_holders' , interrupt )
+        with  pytest.raises( KeyboardInterrupt ) :
+            with  q.cond : q._free( )
+        monkeypatch.undo( )
+
+        # The sequence number is even again, so a snapshot does not spin
+        assert  q.h[ hdr.iseq ] % 2 == 0
+        assert  q.pop( )[ 2 ] == 'a'
+
+    finally :
+        q.close( )
@@ -0,0 +1,151 @@
+
+'''
+Tests of spilled messages, whose large bodies go into blocks of shared memory
+of their own, outside of the queue.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import os
+from multiprocessing import resource_tracker
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Globals ---#
+
+pytestmark = pytest.mark.skipif( not os.path.isdir( '/dev/shm' ) ,
+                                 reason = 'Needs POSIX shared memory' )
+
+
+#--- Helpers ---#
+
+def  blocks ( ) :
+
+    'The shared memory blocks that exist now.'
+
+    return  set( os.listdir( '/dev/shm' ) )
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  q ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 , spill = 100 )
+    q.open( 'w' , filtself = False )
+    yield  q
+    q.close( )
+
+
+#--- Tests ---#
+
+def  test_spill_bigger_than_queue ( q ) :
+
+    before = blocks( )
+    body   = 'b' * 5000
+
+    # Only a descriptor goes into the queue
+    free = q.h[ hdr.ifree ]
+    q.append( 't' , body )
+    assert  free - q.h[ hdr.ifree ] < 100
+    assert  len( blocks( ) - before ) == 1
+
+    # The block goes once the message is freed
+    assert  q.pop( ) == ( 'w' , 't' , body )
+    assert  blocks( ) == before
+
+
+def  test_small_not_spilled ( q ) :
+
+    before = blocks( )
+    q.append( 't' , 's' * 100 )
+    assert  blocks( ) == before
+    assert  q.pop( )[ 2 ] == 's' * 100
+
+
+def  test_lease_spilled ( q ) :
+
+    before = blocks( )
+    q.append( 't' , 'L' * 300 )
+
+    with  q.lease( ) as m :
+        assert  m.tobytes( ) == b'L' * 300
+        assert  len( blocks( ) - before ) == 1
+
+    assert  blocks( ) == before
+
+
+def  test_unread_spill_unlinked_on_close ( name ) :
+
+    before = blocks( )
+    q = pq.PySyncQ( name , size = 1024 , spill = 100 )
+    q.open( 'w' , filtself = False )
+    q.append( 't' , 'u' * 300 )
+    q.close( )
+
+    assert  blocks( ) == before
+
+
+def  test_reader_leaves_tracker_alone ( q , name , monkeypatch ) :
+
+    # Other processes that share the tracker may open the same block
+    calls = [ ]
+    for  f in ( 'register' , 'unregister' ) :
+        monkeypatch.setattr( resource_tracker , f ,
+                             lambda n , t , f = f : calls.append( ( f , n ) ) )
+
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+        q.append( 't' , 'T' * 300 )
+        assert  r.pop( )[ 2 ] == 'T' * 300
+        assert  q.pop( )[ 2 ] == 'T' * 300
+    finally :
+        r.close( )
+
+    assert  not [ c for c in calls  if  'psm_' in c[ 1 ] ]
+
+
+def  test_freed_while_read ( name , monkeypatch ) :
+
+    w = pq.PySyncQ( name , size = 1024 , spill = 100 , overflow = 'overwrite' )
+    w.open( 'w' )
+    w.subscribe( 'none' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    # The writer overwrites the spilled message while r reads its strings
+    strings = r._strings
+    def  overwrite ( h , b ) :
+        monkeypatch.undo( )
+        ret = strings( h , b )
+        for  _ in range( 20 ) : w.append( 'n' , 'n' * 90 )
+        return  ret
+
+    fetched = [ ]
+    fetch = r._fetch
+    def  spy ( d , copy = True ) :
+        fetched.append( d )
+        return  fetch( d , copy )
+
+    try :
+
+        w.append( 't' , 's' * 300 )
+        monkeypatch.setattr( r , '_strings' , overwrite )
+        r._fetch = spy
+
+        # The torn message is discarded without fetching its garbage
+        assert  r.pop( )[ 1 ] == 'n'
+        assert  fetched == [ ]
+
+    finally :
+        r.close( )
+        w.close( )
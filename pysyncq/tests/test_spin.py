@@ -0,0 +1,84 @@
+
+'''
+Tests of spinning, where a process polls the queue for a while before it
+sleeps on a condition variable. The other process is a thread, here.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import threading
+from time import sleep , time
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Tests ---#
+
+def  test_spin_releases_lock_in_full ( name ) :
+
+    q = pq.PySyncQ( name , spin = 1 )
+    q.open( 'w' )
+    took = [ ]
+
+    def  other ( ) :
+        with  q.cond : took.append( True )
+
+    try :
+
+        # Held twice, and released both times while spinning
+        with  q.cond , q.cond :
+            assert  q.lock.depth == 2
+            t = threading.Thread( target = other )
+            t.start( )
+            assert  q._spin( lambda : bool( took ) , time( ) + 5 , q.lock )
+            assert  q.lock.depth == 2
+
+        t.join( )
+        assert  q.lock.depth == 0
+
+    finally :
+        q.close( )
+
+
+def  test_spin_then_pop ( name ) :
+
+    q = pq.PySyncQ( name , spin = 0.5 , yields = 10 )
+    q.open( 'r' )
+    w = pq.PySyncQ( name , create = False )
+    w.open( 'w' )
+
+    def  writer ( ) :
+        sleep( 0.05 )
+        w.append( 'm' , 'late' )
+
+    t = threading.Thread( target = writer )
+
+    try :
+        t.start( )
+        assert  q.pop( block = True , timer = 5 ) == ( 'w' , 'm' , 'late' )
+        t.join( )
+    finally :
+        w.close( )
+        q.close( )
+
+
+def  test_full_queue_waits_for_space ( name ) :
+
+    # A writer that spins and then blocks is let in once its reader, which is
+    # itself, reads a message from another thread
+    q = pq.PySyncQ( name , size = 512 , spin = 0.01 )
+    q.open( 'w' , filtself = False )
+    while  q.h[ hdr.ifree ] >= q._msgsize( b'm' , 40 ) :
+        q.append( 'm' , 'x' * 40 )
+
+    t = threading.Timer( 0.1 , q.pop )
+
+    try :
+        t.start( )
+        assert  q.append( 'm' , 'y' * 40 , block = True , timer = 5 )
+        t.join( )
+    finally :
+        q.close( )
@@ -0,0 +1,67 @@
+
+'''
+Tests of subscriptions, which writers use to publish each message only to the
+readers that want its type.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  qr ( name ) :
+
+    # A writer that reads nothing, and a reader that will subscribe
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' )
+    q.subscribe( 'none' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+    yield  q , r
+    r.close( )
+    q.close( )
+
+
+#--- Tests ---#
+
+def  test_unsubscribed_freed_unread ( qr ) :
+
+    ( q , r ) = qr
+    r.subscribe( 'a' , 'b' )
+
+    # Far more than fits in the queue, if r held them. Under the block policy,
+    # append would raise MemoryError.
+    for  k in range( 100 ) : q.append( 'other' , 'x' * 40 )
+
+    q.append( 'b' , 'wanted' )
+    assert  r.drain( ) == [ ( 'w' , 'b' , 'wanted' ) ]
+    assert  r.missed( ) == 0  and  q.h[ hdr.ifree ] == len( q.b )
+
+
+def  test_subscribe_all_again ( qr ) :
+
+    ( q , r ) = qr
+    r.subscribe( 'a' )
+    q.append( 'b' , 'lost' )
+
+    # Only messages appended afterwards are affected
+    r.subscribe( )
+    q.append( 'b' , 'kept' )
+    assert  [ m[ 2 ] for m in r.drain( ) ] == [ 'kept' ]
+
+
+def  test_too_many_types ( qr ) :
+
+    ( q , r ) = qr
+
+    with  pytest.raises( ValueError ) :
+        r.subscribe( *( f't{ k }' for k in range( hdr.maxsubs + 1 ) ) )
+
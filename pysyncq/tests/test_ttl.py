@@ -0,0 +1,132 @@
+
+'''
+Tests of the time to live of messages, which are skipped by readers and freed
+at the head of the queue once they expire, whoever still holds them.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import time
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Tests ---#
+
+@pytest.mark.parametrize( 'bulk' , [ 0 , 1024 ] )
+def  test_expired_skipped ( name , bulk ) :
+
+    # A zero bulk size copies every body without the lock, so that the message
+    # is reserved and then published
+    q = pq.PySyncQ( name , size = 4096 , bulk = bulk , ttl = 0 )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        q.append( 'a' , 'old' , ttl = 0.01 )
+        q.append( 'b' , 'kept' )
+        q.append( 'c' , 'later' , ttl = 60 )
+        time.sleep( 0.05 )
+
+        assert  [ m[ 2 ] for m in q.drain( ) ] == [ 'kept' , 'later' ]
+        assert  q.missed( ) == 0
+
+    finally :
+        q.close( )
+
+
+def  test_ttl_counts_from_publish ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 , ttl = 0 )
+    q.open( 'w' , filtself = False )
+
+    try :
+
+        # The reservation outlives its time to live before it is published
+        with  q.reserve( 't' , 4 , ttl = 0.05 ) as buf :
+            buf[:] = b'body'
+            time.sleep( 0.1 )
+
+        assert  q.pop( decode = False ) == ( b'w' , b't' , b'body' )
+
+    finally :
+        q.close( )
+
+
+def  test_expired_head_freed ( name ) :
+
+    # r holds every message, and never reads until the end
+    q = pq.PySyncQ( name , size = 1024 , ttl = 0 )
+    q.open( 'w' )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+
+        n = 0
+        while  q.h[ hdr.ifree ] >= q._msgsize( b'm' , 60 ) :
+            q.append( 'm' , 'y' * 60 , ttl = 0.01 )
+            n += 1
+
+        # Full under the block policy, until the messages expire
+        with  pytest.raises( MemoryError ) : q.append( 'm' , 'y' * 60 )
+        time.sleep( 0.05 )
+        assert  q.append( 'm' , 'fresh' )
+
+        assert  [ m[ 2 ] for m in r.drain( ) ] == [ 'fresh' ]
+        assert  r.missed( ) == 0
+
+    finally :
+        r.close( )
+        q.close( )
+
+
+@pytest.mark.parametrize( 'ttl' , [ -1 , 2 ** 32 ] )
+def  test_ttl_out_of_range ( name , ttl ) :
+
+    q = pq.PySyncQ( name , size = 1024 , ttl = 0 )
+
+    try :
+        with  pytest.raises( ValueError ) : q.append( 'm' , 'x' , ttl = ttl )
+    finally :
+        q.close( )
+
+
+def  test_untimed_short_header ( name ) :
+
+    # A queue made without a time to live has no time counters, and neither
+    # does any process that attaches to it
+    q = pq.PySyncQ( name , size = 1024 )
+    q.open( 'w' , filtself = False )
+    r = pq.PySyncQ( name , create = False , ttl = 60 )
+
+    try :
+
+        assert  q.sizemsg == r.sizemsg == hdr.sizemsghead
+        assert  not q.timed  and  not r.timed
+        with  pytest.raises( ValueError ) : q.append( 'm' , 'x' , ttl = 1 )
+
+        q.append( 'm' , 'x' )
+        with  q.lease( ) as m : assert  m.time is None
+
+    finally :
+        r.close( )
+        q.close( )
+
+
+def  test_timed_long_header ( name ) :
+
+    q = pq.PySyncQ( name , size = 1024 , ttl = 0 )
+    r = pq.PySyncQ( name , create = False )
+
+    try :
+        assert  r.timed  and  r.sizemsg == hdr.sizemsghead + hdr.sizemsgtime
+    finally :
+        r.close( )
+        q.close( )
@@ -0,0 +1,93 @@
+
+'''
+Tests of which waiting processes are woken. Readers wait on the cond
+condition variable for new messages, and writers wait on space for free bytes.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Standard library
+import threading , time
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+
+
+#--- Helpers ---#
+
+def  spy ( q , monkeypatch ) :
+
+    '''
+    Counts the calls to notify_all of q's condition variables. Returns a dict
+    of call counts, by attribute name.
+    '''
+
+    calls = { 'cond' : 0 , 'space' : 0 }
+
+    for  c in calls :
+        notify = getattr( q , c ).notify_all
+        def  count ( c = c , notify = notify ) :
+            calls[ c ] += 1
+            notify( )
+        monkeypatch.setattr( getattr( q , c ) , 'notify_all' , count )
+
+    return  calls
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  wr ( name ) :
+
+    # Both w and r read every message
+    w = pq.PySyncQ( name , size = 1024 )
+    w.open( 'w' , filtself = False )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+    yield  w , r
+    r.close( )
+    w.close( )
+
+
+#--- Tests ---#
+
+def  test_append_wakes_readers_only ( wr , monkeypatch ) :
+
+    ( w , r ) = wr
+    calls = spy( w , monkeypatch )
+
+    w.append( 't' , 'x' )
+    assert  calls == { 'cond' : 1 , 'space' : 0 }
+
+
+def  test_last_read_wakes_writers_only ( wr , monkeypatch ) :
+
+    ( w , r ) = wr
+    w.append( 't' , 'x' )
+    ( wcalls , rcalls ) = ( spy( w , monkeypatch ) , spy( r , monkeypatch ) )
+
+    # w still holds the message, so nothing is freed
+    assert  r.pop( )[ 2 ] == 'x'
+    assert  rcalls == { 'cond' : 0 , 'space' : 0 }
+
+    # The last reader frees it
+    assert  w.pop( )[ 2 ] == 'x'
+    assert  wcalls == { 'cond' : 0 , 'space' : 1 }
+
+
+def  test_blocked_writer_woken ( wr ) :
+
+    ( w , r ) = wr
+    with  pytest.raises( MemoryError ) :
+        while  True : w.append( 't' , 'y' * 60 )
+
+    # Space is freed once both readers are done with the head
+    r.drain( )
+    threading.Timer( 0.05 , w.drain ).start( )
+
+    t = time.time( )
+    assert  w.append( 't' , 'y' * 60 , block = True , timer = 5 )
+    assert  time.time( ) - t < 1
@@ -0,0 +1,94 @@
+
+'''
+Tests of work messages, which are each read by the first process to claim
+them, rather than by every process.
+'''
+
+#--- IMPORT BLOCK ---#
+
+# Third party
+import pytest
+
+# pysyncq
+from pysyncq import pysyncq as pq
+from pysyncq import header  as hdr
+
+
+#--- Fixtures ---#
+
+@pytest.fixture
+def  wab ( name ) :
+
+    # A writer of tasks that reads nothing, and two workers
+    w = pq.PySyncQ( name , size = 4096 , work = [ 'task' ] )
+    w.open( 'w' )
+    w.subscribe( 'none' )
+    a = pq.PySyncQ( name , create = False )
+    a.open( 'a' )
+    b = pq.PySyncQ( name , create = False )
+    b.open( 'b' )
+    yield  w , a , b
+    b.close( )
+    a.close( )
+    w.close( )
+
+
+#--- Tests ---#
+
+def  test_each_task_read_once ( wab ) :
+
+    ( w , a , b ) = wab
+
+    for  k in range( 10 ) :
+        w.append( 'task' , str( k ) )
+        if  k % 5 == 0 : w.append( 'note' , str( k ) )
+
+    # a takes the first few tasks, and b the rest. Both see every note.
+    A = [ a.pop( ) for _ in range( 4 ) ]
+    B = b.drain( )
+    A += a.drain( )
+
+    tasks = [ m[ 2 ] for m in A + B  if  m[ 1 ] == 'task' ]
+    assert  sorted( tasks , key = int ) == [ str( k ) for k in range( 10 ) ]
+    assert  [ m[ 2 ] for m in A  if  m[ 1 ] == 'note' ] == [ '0' , '5' ]
+    assert  [ m[ 2 ] for m in B  if  m[ 1 ] == 'note' ] == [ '0' , '5' ]
+
+    assert  w.h[ hdr.ifree ] == len( w.b )
+
+
+def  test_claimed_task_freed_at_once ( wab ) :
+
+    ( w , a , b ) = wab
+
+    # b never reads, but does not hold up a claimed task
+    w.append( 'task' , 'only' )
+    assert  a.pop( ) == ( 'w' , 'task' , 'only' )
+    assert  w.h[ hdr.ifree ] == len( w.b )
+    assert  b.pop( ) is None
+
+
+def  test_screened_task_left_for_others ( wab ) :
+
+    ( w , a , b ) = wab
+
+    a.scrntype.add( 'task' )
+    w.append( 'task' , 'x' )
+    assert  a.pop( ) is None
+    assert  b.pop( ) == ( 'w' , 'task' , 'x' )
+
+
+def  test_work_for_every_type ( name ) :
+
+    q = pq.PySyncQ( name , size = 4096 , work = True )
+    q.open( 'w' , filtself = False )
+    r = pq.PySyncQ( name , create = False )
+    r.open( 'r' )
+
+    try :
+        q.append( 'any' , '1' )
+        q.append( 'other' , '2' )
+        assert  len( q.drain( ) ) == 2  and  r.drain( ) == [ ]
+    finally :
+        r.close( )
+        q.close( )
+